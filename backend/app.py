@@ -1,20 +1,68 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from datetime import datetime
-import pandas as pd
+from datetime import date, datetime, timedelta
+import numpy as np
+import io
 import os
 import sys
 
 # Add model directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'model'))
-from crop_model import predict_crop, train_crop_model
-from aiprediction_model import predict_prices, train_price_model
+from crop_model import predict_crop_batch
+from aiprediction_model import MAX_BATCH_ROWS
+from price_store import get_price_store
+from price_ingest import RowErrors, date_label, ingest, read_rows
+from model_registry import registry
+from training_jobs import training_jobs
+from demand_forecast import forecast_demand_rollups
+from price_rollups import GRANULARITIES
+from serializers import (
+    MARKET_PRICE_FIELDS, market_price_fields, market_price_records, price_field, rollup_price_stats,
+    rollup_records, trend_price_fields, trend_records
+)
+from price_export import EXPORT_FORMATS, export_rows, generate_export
+from crop_batch import MAX_CROP_BATCH_ROWS, samples_from_csv, samples_from_records, validate_samples, batch_results
+from metrics import METRICS_ENABLED, finish_request, metrics, server_timing, start_request, timed
+from prediction_cache import (
+    cache_stats, predict_prices_batch_cached, warm_up
+)
+from crop_lookup import lookup_stats, recommend_crop
+from response_cache import cached_response, mtime_datetime, response_cache
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['Server-Timing'])
 
-# Path to the Excel file
-EXCEL_FILE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'crop_price1.xlsx')
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider that records jsonify time as the serialize stage"""
+    
+    def response(self, *args, **kwargs):
+        with timed('serialize'):
+            return super().response(*args, **kwargs)
+
+if METRICS_ENABLED:
+    app.json = TimedJSONProvider(app)
+    
+    @app.before_request
+    def start_timing():
+        start_request(request.url_rule.rule if request.url_rule else 'unmatched')
+    
+    @app.after_request
+    def record_timing(response):
+        total, timings = finish_request(request.method, response.status_code)
+        if total is not None:
+            response.headers['Server-Timing'] = server_timing(total, timings)
+        return response
+
+# Price workbook, loaded once per process and reloaded when the file changes
+price_store = get_price_store()
+
+def price_data_version():
+    """Version and last-modified time of the price data, for the response cache"""
+    prices = price_store.snapshot()
+    if prices is None:
+        return None
+    return (prices.mtime, prices.size), mtime_datetime(*prices.mtime)
 
 # Mock price data - replace with actual ML model predictions later
 BASE_PRICES = {
@@ -25,53 +73,52 @@ BASE_PRICES = {
     'Cabbage': 60,
 }
 
+def warming_up(model_name):
+    """503 response while a model is trained in the background"""
+    job = training_jobs.submit(model_name)
+    response = jsonify({
+        "error": f"The {model_name} model is warming up, try again shortly",
+        "status": "warming_up",
+        "job": job.to_dict()
+    })
+    response.headers['Retry-After'] = '30'
+    return response, 503
+
 @app.route("/api/hello", methods=["GET"])
 def hello():
     return jsonify({"message": "Hello from Flask backend!"})
 
 @app.route("/api/market-prices", methods=["GET"])
+@cached_response(price_data_version)
 def get_market_prices():
     try:
         # Get query parameters
         date_filter = request.args.get('date')  # Format: YYYY-MM-DD
         vegetable_filter = request.args.get('vegetable')  # Specific vegetable name
         
-        # Read Excel file
-        if not os.path.exists(EXCEL_FILE_PATH):
+        # Load price data
+        prices = price_store.snapshot()
+        if prices is None:
             return jsonify({"error": "Data file not found"}), 404
         
-        df = pd.read_excel(EXCEL_FILE_PATH)
-        
-        # Rename columns for easier access
-        df.columns = df.columns.str.strip()
+        year = month = day = None
         
         # Filter by date if provided
         if date_filter:
             try:
                 filter_date = datetime.strptime(date_filter, '%Y-%m-%d')
-                df = df[
-                    (df['Year'] == filter_date.year) &
-                    (df['Month'] == filter_date.month) &
-                    (df['date'] == filter_date.day)
-                ]
+                year, month, day = filter_date.year, filter_date.month, filter_date.day
             except ValueError:
                 return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
         
-        # Filter by vegetable if provided
-        if vegetable_filter:
-            df = df[df['vegetable name'].str.lower() == vegetable_filter.lower()]
-        
         # If no filters, get the latest data (most recent date)
         if not date_filter and not vegetable_filter:
-            # Get the most recent date
-            latest_year = df['Year'].max()
-            latest_month = df[df['Year'] == latest_year]['Month'].max()
-            latest_date = df[(df['Year'] == latest_year) & (df['Month'] == latest_month)]['date'].max()
-            df = df[
-                (df['Year'] == latest_year) &
-                (df['Month'] == latest_month) &
-                (df['date'] == latest_date)
-            ]
+            latest = prices.latest_date()
+            if latest:
+                year, month, day = latest
+        
+        with timed('filter'):
+            df = prices.market_prices(year, month, day, vegetable_filter or None)
         
         if df.empty:
             return jsonify({
@@ -81,18 +128,9 @@ def get_market_prices():
                 "message": "No data found for the specified filters"
             })
         
-        # Group by vegetable and get the latest entry for each (in case of duplicates)
-        result_data = []
-        for vegetable in df['vegetable name'].unique():
-            veg_data = df[df['vegetable name'] == vegetable].iloc[-1]  # Get last entry
-            
-            result_data.append({
-                "vegetable": str(veg_data['vegetable name']).strip(),
-                "wholesale_pettah": float(veg_data['Wholesale_Pettah(RS)']) if pd.notna(veg_data['Wholesale_Pettah(RS)']) else None,
-                "wholesale_dambulla": float(veg_data['Wholesale_Dambulla(RS)']) if pd.notna(veg_data['Wholesale_Dambulla(RS)']) else None,
-                "retail_pettah": float(veg_data['Retail_Pettah(RS)']) if pd.notna(veg_data['Retail_Pettah(RS)']) else None,
-                "retail_dambulla": float(veg_data['Retail_Dambulla(RS)']) if pd.notna(veg_data['Retail_Dambulla(RS)']) else None,
-            })
+        # Latest entry for each vegetable (in case of duplicates)
+        with timed('serialize'):
+            result_data = market_price_records(df)
         
         # Get the date of the returned data
         data_date = f"{int(df.iloc[0]['Year'])}-{int(df.iloc[0]['Month']):02d}-{int(df.iloc[0]['date']):02d}"
@@ -108,6 +146,7 @@ def get_market_prices():
         return jsonify({"error": str(e)}), 500
 
 @app.route("/api/price-trend", methods=["GET"])
+@cached_response(price_data_version)
 def get_price_trend():
     try:
         # Get query parameters
@@ -128,17 +167,12 @@ def get_price_trend():
         except (ValueError, AttributeError):
             return jsonify({"error": "Invalid month format. Use YYYY-MM"}), 400
         
-        # Read Excel file
-        if not os.path.exists(EXCEL_FILE_PATH):
+        # Load price data
+        prices = price_store.snapshot()
+        if prices is None:
             return jsonify({"error": "Data file not found"}), 404
         
-        df = pd.read_excel(EXCEL_FILE_PATH)
-        df.columns = df.columns.str.strip()
-        
-        # Filter by vegetable
-        df = df[df['vegetable name'].str.lower() == vegetable_filter.lower()]
-        
-        if df.empty:
+        if not prices.has_vegetable(vegetable_filter):
             return jsonify({
                 "success": True,
                 "vegetable": vegetable_filter,
@@ -147,13 +181,11 @@ def get_price_trend():
                 "message": "No data found for the specified vegetable"
             })
         
-        # Filter by selected month and year
-        df_filtered = df[
-            (df['Year'] == year) &
-            (df['Month'] == month)
-        ].copy()
+        # Filter by vegetable, month and year
+        with timed('filter'):
+            rows = prices.select(year=year, month=month, vegetable=vegetable_filter, order='date')
         
-        if df_filtered.empty:
+        if len(rows) == 0:
             return jsonify({
                 "success": True,
                 "vegetable": vegetable_filter,
@@ -162,16 +194,9 @@ def get_price_trend():
                 "message": "No data found for the specified month"
             })
         
-        # Create date column for sorting with error handling
-        # Use errors='coerce' to handle invalid dates (e.g., day 31 in February)
-        df_filtered['full_date'] = pd.to_datetime({
-            'year': df_filtered['Year'],
-            'month': df_filtered['Month'],
-            'day': df_filtered['date']
-        }, errors='coerce')
-        
-        # Remove rows with invalid dates (NaT values)
-        df_filtered = df_filtered.dropna(subset=['full_date'])
+        # Keep rows with a valid date (e.g. not day 31 in February), sorted by date
+        with timed('filter'):
+            df_filtered = prices.frame(rows, valid_dates_only=True)
         
         if df_filtered.empty:
             return jsonify({
@@ -182,29 +207,9 @@ def get_price_trend():
                 "message": "No valid date data found for the specified month"
             })
         
-        if df_filtered.empty:
-            return jsonify({
-                "success": True,
-                "vegetable": vegetable_filter,
-                "date": date_filter,
-                "data": [],
-                "message": "No data found for the specified date range"
-            })
-        
-        # Sort by date
-        df_filtered = df_filtered.sort_values('full_date')
-        
         # Prepare trend data
-        trend_data = []
-        for _, row in df_filtered.iterrows():
-            trend_data.append({
-                "date": row['full_date'].strftime('%Y-%m-%d'),
-                "day": f"Day {len(trend_data) + 1}",
-                "pettah_wholesale": float(row['Wholesale_Pettah(RS)']) if pd.notna(row['Wholesale_Pettah(RS)']) else None,
-                "dambulla_wholesale": float(row['Wholesale_Dambulla(RS)']) if pd.notna(row['Wholesale_Dambulla(RS)']) else None,
-                "pettah_retail": float(row['Retail_Pettah(RS)']) if pd.notna(row['Retail_Pettah(RS)']) else None,
-                "dambulla_retail": float(row['Retail_Dambulla(RS)']) if pd.notna(row['Retail_Dambulla(RS)']) else None,
-            })
+        with timed('serialize'):
+            trend_data = trend_records(df_filtered)
         
         # Calculate percentage change if we have data
         percentage_change = None
@@ -214,134 +219,131 @@ def get_price_trend():
             if first_price and last_price:
                 percentage_change = round(((last_price - first_price) / first_price) * 100, 1)
         
+        # Min/max/mean/first/last of the month per market, from the monthly rollup
+        with timed('filter'):
+            rollups = prices.rollups()
+            _, _, stats = rollups.summary(*month_days(year, month), prices.vegetable_codes(vegetable_filter))
+            summary = rollup_price_stats(stats, 0, rollups.series, trend_price_fields(prices.price_columns)) \
+                if len(stats['rows']) else {}
+        
         return jsonify({
             "success": True,
             "vegetable": vegetable_filter,
             "month": month_filter,
             "data": trend_data,
             "count": len(trend_data),
-            "percentage_change": percentage_change
+            "percentage_change": percentage_change,
+            "summary": summary
         })
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def month_days(year, month):
+    """First and last day of a month, as days since 1970-01-01"""
+    first = np.datetime64(f"{year:04d}-{month:02d}", 'M')
+    return first.astype('datetime64[D]').astype(np.int64), (first + 1).astype('datetime64[D]').astype(np.int64) - 1
+
+def parse_day(value):
+    """Parse YYYY-MM-DD into days since 1970-01-01, raising ValueError with a user-facing message"""
+    try:
+        return np.datetime64(datetime.strptime(value, '%Y-%m-%d').date(), 'D').astype(np.int64)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+
+def parse_month(value):
+    """Parse YYYY-MM into (year, month), raising ValueError with a user-facing message"""
+    try:
+        year, month = map(int, value.split('-'))
+    except (ValueError, AttributeError):
+        raise ValueError("Invalid month format. Use YYYY-MM")
+    if month < 1 or month > 12:
+        raise ValueError("Invalid month. Month must be between 1 and 12")
+    return year, month
+
 @app.route("/api/demand-forecast", methods=["GET"])
+@cached_response(price_data_version)
 def get_demand_forecast():
     try:
         # Get query parameters
         month_filter = request.args.get('month')  # Format: YYYY-MM
+        start_month = request.args.get('start_month')  # Optional range: YYYY-MM
+        end_month = request.args.get('end_month')  # Optional range: YYYY-MM
+        window = request.args.get('window')  # Optional: trailing number of days
+        period = request.args.get('period')  # Optional: 'month' to classify each month separately
         vegetable_filter = request.args.get('vegetable')  # Optional: specific vegetable
         
-        # Read Excel file
-        if not os.path.exists(EXCEL_FILE_PATH):
+        if period not in (None, 'month'):
+            return jsonify({"error": "Invalid period. Use 'month'"}), 400
+        
+        # Load price data
+        prices = price_store.snapshot()
+        if prices is None:
             return jsonify({"error": "Data file not found"}), 404
         
-        df = pd.read_excel(EXCEL_FILE_PATH)
-        df.columns = df.columns.str.strip()
+        vegetable = vegetable_filter or None
+        date_format = '%b %d, %Y'
         
-        # Filter by month if provided
-        if month_filter:
+        if window:
+            # Trailing window ending at the latest date
             try:
-                year, month = map(int, month_filter.split('-'))
-                if month < 1 or month > 12:
-                    return jsonify({"error": "Invalid month. Month must be between 1 and 12"}), 400
-                df = df[(df['Year'] == year) & (df['Month'] == month)]
-            except (ValueError, AttributeError):
-                return jsonify({"error": "Invalid month format. Use YYYY-MM"}), 400
+                window = int(window)
+            except ValueError:
+                return jsonify({"error": "Window must be a whole number of days"}), 400
+            if not (2 <= window <= 366):
+                return jsonify({"error": "Window must be between 2 and 366 days"}), 400
+            
+            latest = prices.latest_date()
+            end_date = date(*latest) if latest else date.today()
+            start_date = end_date - timedelta(days=window - 1)
+            rows = prices.select_range(start_date, end_date, vegetable)
+            span = (start_date, end_date)
+            meta = {"window": window, "start_date": start_date.isoformat(), "end_date": end_date.isoformat()}
+        elif start_month or end_month:
+            # Month range, e.g. a whole year
+            try:
+                start_year, start_mon = parse_month(start_month or end_month)
+                end_year, end_mon = parse_month(end_month or start_month)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            if (end_year, end_mon) < (start_year, start_mon):
+                return jsonify({"error": "End month must not be before start month"}), 400
+            
+            rows = prices.select_range((start_year, start_mon, 1), (end_year, end_mon, 31), vegetable)
+            span = (month_days(start_year, start_mon)[0], month_days(end_year, end_mon)[1])
+            meta = {"start_month": f"{start_year}-{start_mon:02d}", "end_month": f"{end_year}-{end_mon:02d}"}
         else:
-            # Get latest month if not provided
-            latest_year = df['Year'].max()
-            latest_month = df[df['Year'] == latest_year]['Month'].max()
-            df = df[(df['Year'] == latest_year) & (df['Month'] == latest_month)]
-        
-        # Filter by vegetable if provided
-        if vegetable_filter:
-            df = df[df['vegetable name'].str.lower() == vegetable_filter.lower()]
+            # Filter by month if provided
+            if month_filter:
+                try:
+                    year, month = parse_month(month_filter)
+                except ValueError as e:
+                    return jsonify({"error": str(e)}), 400
+            else:
+                # Get latest month if not provided
+                year, month = prices.latest_month() or (0, 0)
+            
+            rows = prices.select(year=year, month=month, vegetable=vegetable, order='date')
+            span = month_days(year, month) if len(rows) else None
+            meta = {"month": month_filter or f"{year}-{month:02d}"}
+            date_format = '%b %d'
         
-        if df.empty:
+        if len(rows) == 0:
             return jsonify({
                 "success": True,
-                "month": month_filter or f"{latest_year}-{latest_month:02d}",
+                **meta,
                 "data": [],
                 "message": "No data found"
             })
         
-        # Calculate demand levels based on price trends
-        # High demand = prices increasing (scarcity)
-        # Medium demand = stable prices
-        # Low demand = prices decreasing (surplus)
-        
-        demand_data = []
-        for vegetable in df['vegetable name'].unique():
-            veg_df = df[df['vegetable name'] == vegetable].copy()
-            
-            # Create date column for sorting
-            veg_df['full_date'] = pd.to_datetime({
-                'year': veg_df['Year'],
-                'month': veg_df['Month'],
-                'day': veg_df['date']
-            }, errors='coerce')
-            veg_df = veg_df.dropna(subset=['full_date'])
-            veg_df = veg_df.sort_values('full_date')
-            
-            if len(veg_df) < 2:
-                continue
-            
-            # Calculate average price change trend
-            prices = veg_df['Wholesale_Pettah(RS)'].fillna(veg_df['Wholesale_Dambulla(RS)'])
-            prices = prices.dropna()
-            
-            if len(prices) < 2:
-                continue
-            
-            # Calculate price trend (percentage change)
-            first_price = prices.iloc[0]
-            last_price = prices.iloc[-1]
-            
-            if first_price > 0:
-                price_change = ((last_price - first_price) / first_price) * 100
-            else:
-                price_change = 0
-            
-            # Determine demand level based on price trend
-            # High demand: prices increasing > 5%
-            # Medium demand: prices stable (-5% to 5%)
-            # Low demand: prices decreasing < -5%
-            if price_change > 5:
-                demand_level = "High"
-                color = "#22c55e"  # Green
-            elif price_change < -5:
-                demand_level = "Low"
-                color = "#ef4444"  # Red
-            else:
-                demand_level = "Medium"
-                color = "#eab308"  # Yellow
-            
-            # Get week number or day range
-            week_num = len(demand_data) + 1
-            date_range = f"Week {week_num}"
-            if len(veg_df) > 0:
-                start_date = veg_df.iloc[0]['full_date']
-                end_date = veg_df.iloc[-1]['full_date']
-                date_range = f"{start_date.strftime('%b %d')} - {end_date.strftime('%b %d')}"
-            
-            demand_data.append({
-                "vegetable": str(vegetable).strip(),
-                "demand_level": demand_level,
-                "color": color,
-                "price_change": round(price_change, 1),
-                "date_range": date_range,
-                "current_price": round(float(last_price), 2) if pd.notna(last_price) else None
-            })
-        
-        # Sort by demand level (High, Medium, Low)
-        demand_order = {"High": 0, "Medium": 1, "Low": 2}
-        demand_data.sort(key=lambda x: (demand_order.get(x['demand_level'], 3), x['vegetable']))
+        # Calculate demand levels based on price trends, from the pre-aggregated rollups
+        with timed('forecast'):
+            codes = prices.vegetable_codes(vegetable) if vegetable else None
+            demand_data = forecast_demand_rollups(prices, *span, codes, period=period, date_format=date_format)
         
         return jsonify({
             "success": True,
-            "month": month_filter or f"{latest_year}-{latest_month:02d}",
+            **meta,
             "data": demand_data,
             "count": len(demand_data)
         })
@@ -349,6 +351,99 @@ def get_demand_forecast():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/price-rollups", methods=["GET"])
+@cached_response(price_data_version)
+def get_price_rollups():
+    try:
+        # Get query parameters
+        vegetable_filter = request.args.get('vegetable')  # Required
+        granularity = request.args.get('granularity', 'month')  # day, week, month or year
+        start_filter = request.args.get('start')  # Optional: YYYY-MM-DD
+        end_filter = request.args.get('end')  # Optional: YYYY-MM-DD
+        
+        if not vegetable_filter:
+            return jsonify({"error": "Vegetable is required"}), 400
+        if granularity not in GRANULARITIES:
+            return jsonify({"error": f"Invalid granularity. Use {', '.join(GRANULARITIES)}"}), 400
+        try:
+            start_day = parse_day(start_filter) if start_filter else None
+            end_day = parse_day(end_filter) if end_filter else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if start_day is not None and end_day is not None and end_day < start_day:
+            return jsonify({"error": "End date must not be before start date"}), 400
+        
+        # Load price data
+        prices = price_store.snapshot()
+        if prices is None:
+            return jsonify({"error": "Data file not found"}), 404
+        
+        # Every period overlapping the range, read from the pre-aggregated buckets
+        with timed('filter'):
+            rollups = prices.rollups()
+            periods, stats = rollups.buckets(granularity, prices.vegetable_codes(vegetable_filter), start_day, end_day)
+        
+        with timed('serialize'):
+            data = rollup_records(periods, stats, granularity, rollups.series)
+        
+        return jsonify({
+            "success": True,
+            "vegetable": vegetable_filter,
+            "granularity": granularity,
+            "data": data,
+            "count": len(data)
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/export/prices", methods=["GET"])
+def export_prices():
+    try:
+        # Get query parameters
+        fmt = request.args.get('format', 'ndjson')  # ndjson or csv
+        start_filter = request.args.get('start')  # Optional: YYYY-MM-DD
+        end_filter = request.args.get('end')  # Optional: YYYY-MM-DD
+        vegetable_filter = request.args.get('vegetable')  # Optional: comma-separated names
+        columns_filter = request.args.get('columns')  # Optional: comma-separated price columns
+        
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({"error": f"Invalid format. Use {' or '.join(EXPORT_FORMATS)}"}), 400
+        
+        try:
+            start = datetime.strptime(start_filter, '%Y-%m-%d').date() if start_filter else None
+            end = datetime.strptime(end_filter, '%Y-%m-%d').date() if end_filter else None
+        except ValueError:
+            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+        
+        vegetables = [v.strip() for v in vegetable_filter.split(',') if v.strip()] if vegetable_filter else None
+        
+        # Load price data; the whole export reads from this one snapshot
+        prices = price_store.snapshot()
+        if prices is None:
+            return jsonify({"error": "Data file not found"}), 404
+        
+        # Every market in the data can be exported
+        available = market_price_fields(prices.price_columns)
+        fields = list(available)
+        if columns_filter:
+            fields = [column.strip() for column in columns_filter.split(',') if column.strip()]
+            unknown = [column for column in fields if column not in available]
+            if unknown or not fields:
+                return jsonify({"error": f"Invalid columns. Use any of: {', '.join(available)}"}), 400
+        
+        rows = export_rows(prices, start, end, vegetables)
+        
+        response = Response(
+            stream_with_context(generate_export(prices, rows, fields, fmt)),
+            mimetype=EXPORT_FORMATS[fmt]
+        )
+        response.headers['Content-Disposition'] = f'attachment; filename="price_history.{fmt}"'
+        return response
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/api/predict", methods=["POST"])
 def predict():
     try:
@@ -367,31 +462,32 @@ def predict():
         if not vegetables or len(vegetables) == 0:
             return jsonify({"error": "At least one vegetable must be selected"}), 400
         
+        if not isinstance(vegetables, list) or not all(isinstance(veg, str) for veg in vegetables):
+            return jsonify({"error": "Vegetables must be a list of names"}), 400
+        
         # Validate date format
         try:
             datetime.strptime(date, '%Y-%m-%d')
-        except ValueError:
+        except (TypeError, ValueError):
             return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
         
-        # Predict prices using ML model
+        # Serve a clear status instead of training inside the request
+        if registry.get('price') is None:
+            return warming_up('price')
+        
+        # Predict prices for all vegetables in one pass
+        result = predict_prices_batch_cached(date, date, vegetables)
+        
         predicted_prices = {}
-        for veg in vegetables:
-            predictions = predict_prices(date, veg)
-            if predictions:
+        for i, veg in enumerate(vegetables):
+            if result:
                 predicted_prices[veg] = {
-                    'wholesale_pettah': predictions.get('Wholesale_Pettah(RS)', 0),
-                    'wholesale_dambulla': predictions.get('Wholesale_Dambulla(RS)', 0),
-                    'retail_pettah': predictions.get('Retail_Pettah(RS)', 0),
-                    'retail_dambulla': predictions.get('Retail_Dambulla(RS)', 0)
+                    price_field(target): float(result['prices'][0, i, j])
+                    for j, target in enumerate(result['targets'])
                 }
             else:
                 # Fallback if prediction fails
-                predicted_prices[veg] = {
-                    'wholesale_pettah': 0,
-                    'wholesale_dambulla': 0,
-                    'retail_pettah': 0,
-                    'retail_dambulla': 0
-                }
+                predicted_prices[veg] = {key: 0 for key in MARKET_PRICE_FIELDS}
         
         return jsonify({
             "success": True,
@@ -404,6 +500,64 @@ def predict():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/predict/batch", methods=["POST"])
+def predict_batch():
+    try:
+        data = request.json
+        
+        # Validate input
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+        
+        start_date = data.get('start_date')
+        end_date = data.get('end_date') or start_date
+        vegetables = data.get('vegetables', [])
+        
+        if not start_date:
+            return jsonify({"error": "Start date is required"}), 400
+        
+        if not vegetables or len(vegetables) == 0:
+            return jsonify({"error": "At least one vegetable must be selected"}), 400
+        
+        if not isinstance(vegetables, list) or not all(isinstance(veg, str) for veg in vegetables):
+            return jsonify({"error": "Vegetables must be a list of names"}), 400
+        
+        # Validate date format
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d')
+            end = datetime.strptime(end_date, '%Y-%m-%d')
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+        
+        if end < start:
+            return jsonify({"error": "End date must not be before start date"}), 400
+        
+        rows = ((end - start).days + 1) * len(vegetables)
+        if rows > MAX_BATCH_ROWS:
+            return jsonify({"error": f"Too many predictions ({rows}); days x vegetables must be at most {MAX_BATCH_ROWS}"}), 400
+        
+        if registry.get('price') is None:
+            return warming_up('price')
+        
+        result = predict_prices_batch_cached(start_date, end_date, vegetables)
+        
+        if result is None:
+            return jsonify({"error": "Failed to predict prices"}), 500
+        
+        return jsonify({
+            "success": True,
+            "start_date": start_date,
+            "end_date": end_date,
+            "dates": result['dates'],
+            "vegetables": result['vegetables'],
+            "markets": [price_field(target) for target in result['targets']],
+            "prices": result['prices'].tolist(),
+            "message": f"Price prediction for {len(result['vegetables'])} vegetable(s) over {len(result['dates'])} day(s)"
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/api/crop-recommendation", methods=["POST"])
 def get_crop_recommendation():
     try:
@@ -461,8 +615,11 @@ def get_crop_recommendation():
         if rainfall < 0:
             return jsonify({"error": "Rainfall must be a positive number"}), 400
         
+        if registry.get('crop') is None:
+            return warming_up('crop')
+        
         # Get crop recommendation
-        prediction, recommendations = predict_crop(N, P, K, temperature, humidity, ph, rainfall)
+        prediction, recommendations = recommend_crop(N, P, K, temperature, humidity, ph, rainfall)
         
         if prediction is None:
             return jsonify({"error": recommendations if isinstance(recommendations, str) else "Failed to get crop recommendation"}), 500
@@ -485,5 +642,164 @@ def get_crop_recommendation():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/crop-recommendation/batch", methods=["POST"])
+def get_crop_recommendation_batch():
+    try:
+        # A JSON array of samples, or a CSV upload in the Crop_recommendation.csv layout
+        try:
+            upload = request.files.get('file')
+            if upload is not None:
+                frame, not_object = samples_from_csv(upload.stream)
+            elif request.mimetype == 'text/csv':
+                frame, not_object = samples_from_csv(request.get_data(as_text=True))
+            else:
+                data = request.get_json(silent=True)
+                if not isinstance(data, list):
+                    return jsonify({"error": "Send a JSON array of samples or a CSV file"}), 400
+                frame, not_object = samples_from_records(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if len(frame) == 0:
+            return jsonify({"error": "No samples provided"}), 400
+        if len(frame) > MAX_CROP_BATCH_ROWS:
+            return jsonify({"error": f"At most {MAX_CROP_BATCH_ROWS} samples per request"}), 400
+        
+        if registry.get('crop') is None:
+            return warming_up('crop')
+        
+        # Row-level errors are reported per row; the valid rows are scored together
+        values, errors, valid = validate_samples(frame, not_object)
+        scored = None
+        if valid.any():
+            scored = predict_crop_batch(values[valid])
+            if scored is None:
+                return warming_up('crop')
+        
+        results = batch_results(errors, valid, scored)
+        
+        return jsonify({
+            "success": True,
+            "count": len(results),
+            "scored": int(valid.sum()),
+            "failed": int((~valid).sum()),
+            "results": results
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/prices/ingest", methods=["POST"])
+def ingest_prices():
+    import pandas as pd
+    try:
+        # A JSON array of rows or a CSV/Excel upload, in the crop_price1.xlsx layout
+        try:
+            upload = request.files.get('file')
+            if upload is not None:
+                rows = read_rows(upload)
+            elif request.mimetype == 'text/csv':
+                rows = read_rows(io.StringIO(request.get_data(as_text=True)))
+            else:
+                data = request.get_json(silent=True)
+                if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+                    return jsonify({"error": "Send a JSON array of rows or a CSV/Excel file"}), 400
+                rows = pd.DataFrame(data)
+            if len(rows) == 0:
+                return jsonify({"error": "No rows provided"}), 400
+            snapshot, added = ingest(rows)
+        except RowErrors as e:
+            return jsonify({"error": str(e), "rows": e.errors}), 400
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        result = {
+            "success": True,
+            "added": added,
+            "skipped": len(rows) - added,
+            "data_through": date_label(snapshot.latest_date())
+        }
+        
+        # Extend the price models with the new rows unless ?update=false
+        if added and request.args.get('update', 'true').lower() != 'false':
+            result["job"] = training_jobs.submit('price_update').to_dict()
+        
+        return jsonify(result), 201 if added else 200
+    
+    except FileNotFoundError:
+        return jsonify({"error": "Data file not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/cache/stats", methods=["GET"])
+def get_cache_stats():
+    return jsonify({
+        "success": True,
+        "caches": cache_stats(),
+        "responses": response_cache.stats(),
+        "crop_lookup": lookup_stats()
+    })
+
+@app.route("/api/cache/warm-up", methods=["POST"])
+def warm_up_cache():
+    try:
+        data = request.json or {}
+        
+        try:
+            days = int(data.get('days', 7))
+        except (ValueError, TypeError):
+            return jsonify({"error": "Days must be a whole number"}), 400
+        
+        if not (1 <= days <= 366):
+            return jsonify({"error": "Days must be between 1 and 366"}), 400
+        
+        cached = warm_up(days)
+        
+        return jsonify({
+            "success": True,
+            "days": days,
+            "cached": cached,
+            "caches": cache_stats()
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route("/api/training/jobs", methods=["GET"])
+def get_training_jobs():
+    jobs = training_jobs.jobs()
+    return jsonify({
+        "success": True,
+        "jobs": [job.to_dict() for job in jobs],
+        "count": len(jobs)
+    })
+
+@app.route("/api/training/jobs/<job_id>", methods=["GET"])
+def get_training_job(job_id):
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"success": True, "job": job.to_dict()})
+
+@app.route("/api/training/<model_name>", methods=["POST"])
+def start_training(model_name):
+    if model_name not in ('price', 'price_update', 'crop', 'crop_lookup'):
+        return jsonify({"error": "Unknown model. Use 'price', 'price_update', 'crop' or 'crop_lookup'"}), 404
+    
+    # Returns the running job if this model is already being trained; an
+    # explicit request retries a failed model without waiting
+    job = training_jobs.submit(model_name, force=True)
+    return jsonify({"success": True, "job": job.to_dict()}), 202
+
+# Optionally precompute the next N days of predictions when the server starts
+if os.environ.get('PREDICTION_CACHE_WARM_DAYS'):
+    warm_up(int(os.environ['PREDICTION_CACHE_WARM_DAYS']))
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,147 @@
+"""Scaling benchmark for the price pipeline on synthetic data
+
+For each size, synthetic rows (see synthetic_prices.py) are generated into
+a columnar copy and the main code paths are timed on them: loading the
+snapshot, filtering, the market-price table, the month trend, building
+the price rollups and the demand forecast from them (one month and a year
+by month), preparing training data and
+fitting the price models. Each size runs in its own process, so the peak
+memory is per size and a crash or timeout is reported instead of ending
+the run.
+
+    python bench_scaling.py --sizes 100000,1000000,10000000 --output scaling.json
+
+Paths that get too slow are capped: Excel parsing runs up to --max-xlsx-rows
+and training up to --max-train-rows.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'model'))
+
+STAGES = [
+    'generate', 'xlsx_load', 'load', 'filter_month', 'filter_vegetable', 'market_prices',
+    'trend', 'rollups', 'demand_month', 'demand_year', 'prepare_data', 'train'
+]
+
+
+def timed(results, stage, func):
+    start = time.perf_counter()
+    value = func()
+    results[stage] = round(time.perf_counter() - start, 4)
+    return value
+
+
+def run_size(rows, data_dir, max_xlsx_rows, max_train_rows):
+    """Time every stage on `rows` synthetic rows; returns {stage: seconds}"""
+    from datetime import date, timedelta
+    from synthetic_prices import PriceGenerator, write_price_columns, write_workbook
+    from columnar_cache import load_columns
+    from price_store import PriceSnapshot, build_price_columns
+    from demand_forecast import forecast_demand_rollups
+    from serializers import market_price_records, trend_records
+
+    results = {}
+    generator = PriceGenerator(rows)
+    target = os.path.join(data_dir, f"prices-{rows}")
+    if load_columns(target) is None:
+        timed(results, 'generate', lambda: write_price_columns(generator, target))
+
+    if rows <= max_xlsx_rows:
+        path = os.path.join(data_dir, f"prices-{rows}.xlsx")
+        if not os.path.exists(path):
+            write_workbook(generator, path)
+        timed(results, 'xlsx_load', lambda: build_price_columns(path))
+
+    prices = timed(results, 'load', lambda: PriceSnapshot(*load_columns(target), 0))
+    year, month, day = prices.latest_date()
+    vegetable = prices.vegetable_names[0]
+
+    timed(results, 'filter_month', lambda: prices.frame(prices.select(year, month, order='date')))
+    timed(results, 'filter_vegetable', lambda: prices.frame(prices.select(vegetable=vegetable, order='date')))
+    timed(results, 'market_prices', lambda: market_price_records(prices.market_prices(year, month, day)))
+    timed(results, 'trend', lambda: trend_records(prices.month_prices(year, month, vegetable)))
+    # Demand is served from the rollups, built once per snapshot
+    timed(results, 'rollups', prices.rollups)
+    end = date(year, month, day)
+    timed(results, 'demand_month', lambda: forecast_demand_rollups(prices, date(year, month, 1), end))
+    timed(results, 'demand_year', lambda: forecast_demand_rollups(
+        prices, end - timedelta(days=364), end, period='month'))
+
+    if rows <= max_train_rows:
+        from aiprediction_model import prepare_data, fit_price_models
+        X, y, le, feature_columns, target_columns = timed(results, 'prepare_data', lambda: prepare_data(prices))
+        timed(results, 'train', lambda: fit_price_models(X, y, target_columns))
+
+    results['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return results
+
+
+def run_in_process(rows, args, data_dir):
+    command = [sys.executable, __file__, '--run-size', str(rows), '--data-dir', data_dir,
+               '--max-xlsx-rows', str(args.max_xlsx_rows), '--max-train-rows', str(args.max_train_rows)]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=args.timeout)
+    except subprocess.TimeoutExpired:
+        return {'error': f"timed out after {args.timeout}s"}
+    if completed.returncode != 0:
+        lines = (completed.stderr or '').strip().splitlines()
+        return {'error': lines[-1] if lines else f"exit status {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_table(report):
+    sizes = list(report)
+    print(f"{'stage':<18}" + ''.join(f"{size:>14}" for size in sizes))
+    for stage in STAGES + ['peak_rss_mb']:
+        cells = []
+        for size in sizes:
+            value = report[size].get(stage)
+            cells.append(f"{'-' if value is None else value:>14}")
+        print(f"{stage:<18}" + ''.join(cells))
+    for size in sizes:
+        if 'error' in report[size]:
+            print(f"{size}: {report[size]['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='100000,1000000,10000000', help='Comma-separated row counts')
+    parser.add_argument('--data-dir', help='Keep generated data here for reuse (default: a temporary directory)')
+    parser.add_argument('--max-xlsx-rows', type=int, default=100000, help='Largest size parsed from .xlsx')
+    parser.add_argument('--max-train-rows', type=int, default=200000, help='Largest size trained on')
+    parser.add_argument('--timeout', type=int, default=3600, help='Seconds allowed per size')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size:
+        print(json.dumps(run_size(args.run_size, args.data_dir, args.max_xlsx_rows, args.max_train_rows)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        report = {}
+        for rows in [int(size) for size in args.sizes.split(',')]:
+            report[rows] = run_in_process(rows, args, data_dir)
+            print(f"{rows} rows done", file=sys.stderr)
+
+    print_table(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
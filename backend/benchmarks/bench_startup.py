@@ -0,0 +1,132 @@
+"""Startup benchmark for the Flask app
+
+Measures, in fresh interpreter processes, how long `import app` takes and
+how long it takes from process start to the first response of the main
+endpoints. It also fails if importing the app pulls in training-only
+modules (sklearn, scipy) or the data and model loaders (pandas, joblib).
+The prediction endpoints are only probed when their model files exist,
+so a run never starts background training.
+
+    python bench_startup.py                  # compare against startup_baseline.json
+    python bench_startup.py --save-baseline  # record the current numbers as the baseline
+
+Exits with status 1 on a regression.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'startup_baseline.json')
+
+# Modules only training needs; the serving path must not import them
+TRAINING_ONLY_MODULES = ['sklearn', 'scipy']
+
+# Loaded on the first data or model access, not when the app is imported
+LAZY_MODULES = ['pandas', 'joblib']
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {backend!r})
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'import_seconds': elapsed,
+    'loaded': [m for m in {modules!r} if m in sys.modules]
+}}))
+"""
+
+FIRST_RESPONSE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {backend!r})
+import app
+client = app.app.test_client()
+timings = {{}}
+response = client.get('/api/market-prices')
+timings['first_market_prices_seconds'] = time.perf_counter() - start
+assert response.status_code == 200, response.status_code
+# A missing model would be trained in the background; skip its endpoint instead
+if app.registry.is_available('price'):
+    response = client.post('/api/predict', json={{'date': '2025-01-15', 'vegetables': ['carrot']}})
+    timings['first_predict_seconds'] = time.perf_counter() - start
+if app.registry.is_available('crop'):
+    response = client.post('/api/crop-recommendation', json={{
+        'N': 90, 'P': 42, 'K': 43, 'temperature': 20.9, 'humidity': 82, 'ph': 6.5, 'rainfall': 203
+    }})
+    timings['first_crop_recommendation_seconds'] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+
+
+def run_script(script):
+    output = subprocess.run(
+        [sys.executable, '-c', script],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    # The app may print while loading; the result is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(runs):
+    """Median of each metric over `runs` fresh processes"""
+    samples = {}
+    loaded = set()
+    for _ in range(runs):
+        result = run_script(IMPORT_SCRIPT.format(backend=BACKEND_DIR, modules=TRAINING_ONLY_MODULES + LAZY_MODULES))
+        samples.setdefault('import_seconds', []).append(result['import_seconds'])
+        loaded.update(result['loaded'])
+        for key, value in run_script(FIRST_RESPONSE_SCRIPT.format(backend=BACKEND_DIR)).items():
+            samples.setdefault(key, []).append(value)
+    metrics = {key: round(statistics.median(values), 4) for key, values in samples.items()}
+    return metrics, sorted(loaded)
+
+
+def compare(metrics, baseline, threshold):
+    """Names of metrics slower than baseline by more than `threshold` (a fraction)"""
+    regressions = []
+    for key, value in metrics.items():
+        if key in baseline and value > baseline[key] * (1 + threshold):
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes per metric')
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help='Allowed slowdown over the baseline, as a fraction (default 0.5)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the measured numbers as the baseline')
+    args = parser.parse_args()
+
+    metrics, loaded = measure(args.runs)
+    print(json.dumps(metrics, indent=2))
+
+    failed = False
+    if loaded:
+        print(f"FAIL: importing app loaded {', '.join(loaded)}")
+        failed = True
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(metrics, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in compare(metrics, baseline, args.threshold):
+            print(f"FAIL: {key} {metrics[key]}s vs baseline {baseline[key]}s")
+            failed = True
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Compare the per-target, multi-output and long-format price models
+
+Fits every mode on the same train/test split and reports fit time, pickle
+size, load time, prediction latency and MAE/RMSE/R² per target.
+
+    python compare_price_model_modes.py [--output results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+
+# Add model directory to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'model'))
+from aiprediction_model import LONG, MULTI_OUTPUT, PER_TARGET, fit_price_models, predict_targets, prepare_data
+
+
+def time_call(func, repeat):
+    """Median wall time of func() in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def benchmark_mode(mode, X_train, X_test, y_train, y_test, target_columns, repeat):
+    start = time.perf_counter()
+    models = fit_price_models(X_train, y_train, target_columns, mode)
+    fit_seconds = time.perf_counter() - start
+
+    # Pickle size and load time
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'models.pkl')
+        joblib.dump(models, path)
+        pickle_bytes = os.path.getsize(path)
+        load_ms = time_call(lambda: joblib.load(path), max(1, repeat // 5))
+
+    one_row = X_test.iloc[:1]
+    result = {
+        'mode': mode,
+        'fit_seconds': round(fit_seconds, 3),
+        'pickle_bytes': pickle_bytes,
+        'load_ms': round(load_ms, 2),
+        'predict_one_row_ms': round(time_call(
+            lambda: predict_targets(models, one_row, target_columns, mode), repeat), 3),
+        'predict_test_set_ms': round(time_call(
+            lambda: predict_targets(models, X_test, target_columns, mode), repeat), 3),
+        'test_rows': len(X_test),
+        'scores': {}
+    }
+
+    y_pred = predict_targets(models, X_test, target_columns, mode)
+    for i, target in enumerate(target_columns):
+        result['scores'][target] = {
+            'mae': float(mean_absolute_error(y_test[target], y_pred[:, i])),
+            'rmse': float(np.sqrt(mean_squared_error(y_test[target], y_pred[:, i]))),
+            'r2': float(r2_score(y_test[target], y_pred[:, i]))
+        }
+    return result
+
+
+def print_report(results):
+    print(f"{'':24}" + ''.join(f"{r['mode']:>16}" for r in results))
+    for key, label in [('fit_seconds', 'fit (s)'), ('pickle_bytes', 'pickle (bytes)'),
+                       ('load_ms', 'load (ms)'), ('predict_one_row_ms', 'predict 1 row (ms)'),
+                       ('predict_test_set_ms', 'predict test set (ms)')]:
+        print(f"{label:24}" + ''.join(f"{r[key]:>16}" for r in results))
+    for target in results[0]['scores']:
+        print(target)
+        for metric in ('mae', 'rmse', 'r2'):
+            print(f"  {metric:22}" + ''.join(f"{r['scores'][target][metric]:>16.4f}" for r in results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--repeat', type=int, default=20, help='Timing repetitions')
+    args = parser.parse_args()
+
+    X, y, le, feature_columns, target_columns = prepare_data()
+    if X is None:
+        sys.exit("Failed to prepare data")
+
+    # Same split as train_price_model
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    results = [
+        benchmark_mode(mode, X_train, X_test, y_train, y_test, target_columns, args.repeat)
+        for mode in (PER_TARGET, MULTI_OUTPUT, LONG)
+    ]
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
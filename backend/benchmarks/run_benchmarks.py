@@ -0,0 +1,233 @@
+"""Benchmark suite for the API endpoints and model functions
+
+Endpoints are called through Flask's test client (no server or network),
+and the model functions are called directly. For each case the suite
+records latency percentiles and throughput, writes everything as JSON and
+compares the median latencies against a stored baseline.
+
+    python run_benchmarks.py                        # compare against benchmark_baseline.json
+    python run_benchmarks.py --save-baseline        # record the current numbers as the baseline
+    python run_benchmarks.py --skip-training --output results.json
+
+Prediction endpoints and the price trend and yearly demand queries are
+measured twice: as served (with the prediction and response caches) and
+with the caches cleared before every call. Training writes its
+models to a temporary directory, never over the served ones.
+
+Exits with status 1 on a regression.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'model'))
+import app as flask_app
+import aiprediction_model
+import crop_model
+from model_registry import registry
+from prediction_cache import price_cache, crop_cache
+from price_store import get_price_store
+from response_cache import response_cache
+
+CROP_SAMPLE = {'N': 90, 'P': 42, 'K': 43, 'temperature': 20.9, 'humidity': 82, 'ph': 6.5, 'rainfall': 203}
+
+def latest_day():
+    """The most recent date in the price data, as YYYY-MM-DD"""
+    year, month, day = get_price_store().snapshot().latest_date()
+    return f"{year}-{month:02d}-{day:02d}"
+
+
+def endpoint_cases():
+    """(name, method, path, body, model needed, clear the caches first) per endpoint case
+
+    The price queries use the latest date, month and year in the data, the
+    "current" views most traffic asks for.
+    """
+    today = latest_day()
+    year, current_month = today[:4], today[:7]
+    prediction = {'date': today, 'vegetables': ['carrot', 'bean', 'tomato']}
+    return [
+        ('market_prices', 'GET', '/api/market-prices', None, None, False),
+        ('price_trend', 'GET', f'/api/price-trend?month={current_month}&vegetable=carrot', None, None, False),
+        ('price_trend_uncached', 'GET', f'/api/price-trend?month={current_month}&vegetable=carrot', None, None, True),
+        ('demand_forecast', 'GET', '/api/demand-forecast', None, None, False),
+        ('demand_forecast_window', 'GET', '/api/demand-forecast?window=30', None, None, False),
+        ('demand_forecast_year', 'GET', f'/api/demand-forecast?start_month={year}-01&end_month={current_month}&period=month', None, None, False),
+        ('demand_forecast_year_uncached', 'GET', f'/api/demand-forecast?start_month={year}-01&end_month={current_month}&period=month', None, None, True),
+        ('predict', 'POST', '/api/predict', prediction, 'price', False),
+        ('predict_uncached', 'POST', '/api/predict', prediction, 'price', True),
+        ('crop_recommendation', 'POST', '/api/crop-recommendation', CROP_SAMPLE, 'crop', False),
+        ('crop_recommendation_uncached', 'POST', '/api/crop-recommendation', CROP_SAMPLE, 'crop', True),
+    ]
+
+
+def summarize(timings):
+    """Percentiles (ms) and throughput (calls/s) of a list of durations in seconds"""
+    timings = np.asarray(timings)
+    return {
+        'calls': len(timings),
+        'mean_ms': round(float(timings.mean() * 1000), 3),
+        'p50_ms': round(float(np.percentile(timings, 50) * 1000), 3),
+        'p90_ms': round(float(np.percentile(timings, 90) * 1000), 3),
+        'p99_ms': round(float(np.percentile(timings, 99) * 1000), 3),
+        'max_ms': round(float(timings.max() * 1000), 3),
+        'throughput_per_s': round(float(len(timings) / timings.sum()), 1)
+    }
+
+
+def time_calls(func, iterations, warmup=3, before=None):
+    """Durations of `iterations` calls of func(), after `warmup` untimed calls"""
+    for _ in range(warmup):
+        if before:
+            before()
+        func()
+    timings = []
+    for _ in range(iterations):
+        if before:
+            before()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def clear_caches():
+    price_cache.clear()
+    crop_cache.clear()
+    response_cache.clear()
+
+
+def bench_endpoints(iterations):
+    client = flask_app.app.test_client()
+    results = {}
+    for name, method, path, body, model, uncached in endpoint_cases():
+        if model and not registry.is_available(model):
+            print(f"skip {name}: the {model} model is not trained")
+            continue
+
+        def call():
+            response = client.open(path, method=method, json=body)
+            if response.status_code != 200:
+                raise RuntimeError(f"{method} {path} returned {response.status_code}")
+
+        results[name] = summarize(time_calls(call, iterations, before=clear_caches if uncached else None))
+        print(f"{name:<32}p50 {results[name]['p50_ms']:>9.3f} ms   {results[name]['throughput_per_s']:>8.1f}/s")
+    return results
+
+
+@contextlib.contextmanager
+def artifacts_in(directory):
+    """Point the training functions' output paths at a scratch directory"""
+    saved = {
+        (aiprediction_model, 'MODELS_PATH'): aiprediction_model.MODELS_PATH,
+        (aiprediction_model, 'ENCODER_PATH'): aiprediction_model.ENCODER_PATH,
+        (aiprediction_model, 'SCHEMA_PATH'): aiprediction_model.SCHEMA_PATH,
+        (crop_model, 'MODEL_PATH'): crop_model.MODEL_PATH,
+    }
+    try:
+        for (module, name), path in saved.items():
+            setattr(module, name, os.path.join(directory, os.path.basename(path)))
+        yield
+    finally:
+        for (module, name), path in saved.items():
+            setattr(module, name, path)
+
+
+def bench_functions(iterations, training_runs):
+    today = latest_day()
+    cases = [
+        ('prepare_data', aiprediction_model.prepare_data, max(1, iterations // 10), None),
+        ('predict_prices', lambda: aiprediction_model.predict_prices(today, 'carrot'), iterations, 'price'),
+        ('predict_crop', lambda: crop_model.predict_crop(**CROP_SAMPLE), iterations, 'crop'),
+    ]
+    if training_runs:
+        cases += [
+            ('train_price_model', aiprediction_model.train_price_model, training_runs, None),
+            ('train_crop_model', crop_model.train_crop_model, training_runs, None),
+        ]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, artifacts_in(tmp), contextlib.redirect_stdout(sys.stderr):
+        for name, func, calls, model in cases:
+            if model and not registry.is_available(model):
+                print(f"skip {name}: the {model} model is not trained")
+                continue
+            warmup = 0 if name.startswith('train_') else 1
+            results[name] = summarize(time_calls(func, calls, warmup=warmup))
+    for name, result in results.items():
+        print(f"{name:<32}p50 {result['p50_ms']:>9.3f} ms   {result['throughput_per_s']:>8.1f}/s")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """(group, name, value, baseline value) for medians slower than baseline by more than threshold"""
+    regressions = []
+    for group in ('endpoints', 'functions'):
+        for name, result in results.get(group, {}).items():
+            reference = baseline.get(group, {}).get(name)
+            if reference and result['p50_ms'] > reference['p50_ms'] * (1 + threshold):
+                regressions.append((group, name, result['p50_ms'], reference['p50_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200, help='Timed calls per endpoint and function')
+    parser.add_argument('--training-runs', type=int, default=1, help='Timed runs of each training function')
+    parser.add_argument('--skip-training', action='store_true', help='Do not benchmark the training functions')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed median slowdown over the baseline, as a fraction (default 0.25)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the baseline')
+    args = parser.parse_args()
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': args.iterations
+        },
+        'endpoints': bench_endpoints(args.iterations),
+        'functions': bench_functions(args.iterations, 0 if args.skip_training else args.training_runs)
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    failed = False
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for group, name, value, reference in compare(results, baseline, args.threshold):
+            print(f"FAIL: {group}/{name} p50 {value} ms vs baseline {reference} ms")
+            failed = True
+        if not failed:
+            print(f"No regressions over {args.threshold:.0%} against {args.baseline}")
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
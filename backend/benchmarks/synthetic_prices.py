@@ -0,0 +1,201 @@
+"""Synthetic price data in the crop_price1.xlsx schema, for scale testing
+
+Rows follow the workbook layout (Year, Month, date, vegetable name and the
+four Wholesale_/Retail_ price columns): one row per vegetable per day.
+Prices have a per-vegetable base level, yearly seasonality, slow inflation
+and daily noise, Dambulla trades below Pettah and retail sits above
+wholesale. Cells go missing at random and markets close for whole days.
+
+Large sizes are written straight into the columnar cache layout the price
+store reads (one .npy per column plus manifest.json), chunk by chunk, so
+10^8 rows never have to fit in memory at once. Small sizes can also be
+written as an .xlsx workbook to exercise the Excel import.
+
+    python synthetic_prices.py --rows 1000000 --output /tmp/prices-1m
+    python synthetic_prices.py --rows 100000 --xlsx /tmp/prices.xlsx
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'model'))
+from columnar_cache import load_columns, write_manifest
+from price_store import PRICE_COLUMNS, build_indexes
+
+# Names used for the first vegetables; the rest are numbered commodities
+VEGETABLE_NAMES = [
+    'Beans', 'Carrot', 'Cabbage', 'Tomato', 'Brinjal', 'Pumpkin', 'Snake gourd',
+    'Green chilli', 'Lime', 'Leeks', 'Beetroot', 'Potato', 'Red onion', 'Big onion',
+    'Knolkhol', 'Capsicum', 'Ladies fingers', 'Bitter gourd', 'Cucumber', 'Radish'
+]
+
+# Days generated per chunk when writing columns
+CHUNK_DAYS = 256
+
+# Excel's sheet limit (minus the header row)
+MAX_XLSX_ROWS = 1048575
+
+
+def default_vegetables(rows):
+    """About ten years of daily data, between 20 and 5000 vegetables"""
+    return int(np.clip(rows // 3650, 20, 5000))
+
+
+def vegetable_names(count):
+    return [VEGETABLE_NAMES[i] if i < len(VEGETABLE_NAMES) else f"Commodity {i + 1:04d}"
+            for i in range(count)]
+
+
+class PriceGenerator:
+    """Deterministic generator of synthetic price rows"""
+
+    def __init__(self, rows, vegetables=None, start='2000-01-01', missing_rate=0.03,
+                 closure_rate=0.01, seed=42):
+        self.rows = int(rows)
+        self.vegetables = int(vegetables or default_vegetables(self.rows))
+        self.days = -(-self.rows // self.vegetables)
+        self.start = np.datetime64(start, 'D')
+        self.missing_rate = missing_rate
+        self.closure_rate = closure_rate
+        self.seed = seed
+
+        # Per-vegetable price profile
+        rng = np.random.default_rng(seed)
+        v = self.vegetables
+        self.base = np.exp(rng.normal(np.log(150), 0.6, v))
+        self.amplitude = rng.uniform(0.1, 0.45, v)
+        self.phase = rng.uniform(0, 1, v)
+        self.dambulla_ratio = rng.uniform(0.82, 0.95, v)
+        self.retail_markup = rng.uniform(1.15, 1.45, v)
+
+    def chunk(self, first_day, last_day):
+        """Columns for days [first_day, last_day), at most self.rows in total"""
+        rng = np.random.default_rng([self.seed, first_day])
+        v = self.vegetables
+        dates = self.start + np.arange(first_day, last_day)
+        count = min(len(dates) * v, self.rows - first_day * v)
+
+        day_index = np.repeat(np.arange(len(dates)), v)[:count]
+        codes = np.tile(np.arange(v, dtype=np.int16), len(dates))[:count]
+        full_date = dates[day_index]
+
+        # Calendar parts from datetime64
+        years = full_date.astype('datetime64[Y]')
+        months = full_date.astype('datetime64[M]')
+        year = years.astype(np.int64) + 1970
+        month = (months - years).astype(np.int64) + 1
+        day = (full_date - months).astype(np.int64) + 1
+        day_of_year = (full_date - years).astype(np.float64)
+        elapsed_years = (full_date - self.start).astype(np.float64) / 365.25
+
+        season = 1 + self.amplitude[codes] * np.sin(2 * np.pi * (day_of_year / 365.25 + self.phase[codes]))
+        inflation = 1.06 ** elapsed_years
+        noise = np.exp(rng.normal(0, 0.08, count))
+        pettah = self.base[codes] * season * inflation * noise
+        dambulla = pettah * self.dambulla_ratio[codes] * np.exp(rng.normal(0, 0.04, count))
+
+        prices = [
+            pettah,
+            dambulla,
+            pettah * self.retail_markup[codes] * np.exp(rng.normal(0, 0.03, count)),
+            dambulla * self.retail_markup[codes] * np.exp(rng.normal(0, 0.03, count)),
+        ]
+
+        # Whole-day closures for each market, then scattered missing cells
+        for market in ((0, 2), (1, 3)):
+            closed = (rng.random(len(dates)) < self.closure_rate)[day_index]
+            for i in market:
+                prices[i][closed] = np.nan
+        for values in prices:
+            values[rng.random(count) < self.missing_rate] = np.nan
+
+        return {
+            'year': year.astype(np.int16),
+            'month': month.astype(np.int8),
+            'day': day.astype(np.int8),
+            'full_date': full_date,
+            'vegetable_code': codes,
+            **{f'price_{i}': np.round(values) for i, values in enumerate(prices)}
+        }
+
+    def chunks(self):
+        for first_day in range(0, self.days, CHUNK_DAYS):
+            yield first_day, self.chunk(first_day, min(first_day + CHUNK_DAYS, self.days))
+
+    def meta(self):
+        return {
+            'vegetable_names': vegetable_names(self.vegetables),
+            'price_columns': list(PRICE_COLUMNS)
+        }
+
+
+def write_price_columns(generator, target):
+    """Write the generated rows and their indexes as memory-mappable columns"""
+    os.makedirs(target, exist_ok=True)
+    columns = {}
+    for first_day, chunk in generator.chunks():
+        start = first_day * generator.vegetables
+        for column, values in chunk.items():
+            if column not in columns:
+                columns[column] = np.lib.format.open_memmap(
+                    os.path.join(target, f"{column}.npy"), mode='w+',
+                    dtype=values.dtype, shape=(generator.rows,))
+            columns[column][start:start + len(values)] = values
+
+    indexes = build_indexes(columns['year'], columns['month'], columns['day'], columns['vegetable_code'])
+    for column, values in indexes.items():
+        np.save(os.path.join(target, f"{column}.npy"), values)
+    for values in columns.values():
+        values.flush()
+
+    write_manifest(target, list(columns) + list(indexes), generator.meta())
+    return load_columns(target)
+
+
+def write_workbook(generator, path):
+    """Write the generated rows as an .xlsx workbook with the original column names"""
+    if generator.rows > MAX_XLSX_ROWS:
+        raise ValueError(f"An .xlsx sheet holds at most {MAX_XLSX_ROWS} rows")
+    names = np.asarray(generator.meta()['vegetable_names'], dtype=object)
+    frames = []
+    for _, chunk in generator.chunks():
+        frame = pd.DataFrame({
+            'Year': chunk['year'],
+            'Month': chunk['month'],
+            'date': chunk['day'],
+            'vegetable name': names[chunk['vegetable_code']],
+        })
+        for i, column in enumerate(PRICE_COLUMNS):
+            frame[column] = chunk[f'price_{i}']
+        frames.append(frame)
+    pd.concat(frames, ignore_index=True).to_excel(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--vegetables', type=int, help='Number of vegetables (default: about ten years of data)')
+    parser.add_argument('--start', default='2000-01-01', help='First date (YYYY-MM-DD)')
+    parser.add_argument('--missing-rate', type=float, default=0.03, help='Fraction of missing price cells')
+    parser.add_argument('--closure-rate', type=float, default=0.01, help='Fraction of days a market is closed')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Directory for the columnar copy')
+    parser.add_argument('--xlsx', help='Also write an .xlsx workbook')
+    args = parser.parse_args()
+
+    generator = PriceGenerator(args.rows, args.vegetables, args.start, args.missing_rate,
+                               args.closure_rate, args.seed)
+    print(f"{generator.rows} rows: {generator.vegetables} vegetables over {generator.days} days")
+    if args.output:
+        write_price_columns(generator, args.output)
+        print(f"Columns written to {args.output}")
+    if args.xlsx:
+        write_workbook(generator, args.xlsx)
+        print(f"Workbook written to {args.xlsx}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import io
+import numpy as np
+from crop_model import FEATURE_COLUMNS
+
+# Largest survey scored in one request
+MAX_CROP_BATCH_ROWS = 100000
+
+# Range checks in the order /api/crop-recommendation applies them, with its messages
+RANGE_CHECKS = [
+    (['N', 'P', 'K'], 0, 200, "N, P, K must be between 0 and 200"),
+    (['temperature'], 0, 50, "Temperature must be between 0 and 50°C"),
+    (['humidity'], 0, 100, "Humidity must be between 0 and 100%"),
+    (['ph'], 0, 14, "pH must be between 0 and 14"),
+    (['rainfall'], 0, np.inf, "Rainfall must be a positive number"),
+]
+
+
+def samples_from_records(records):
+    """Samples frame from a JSON array of objects with the feature fields"""
+    import pandas as pd
+    not_object = np.array([not isinstance(record, dict) for record in records], dtype=bool)
+    frame = pd.DataFrame([record if isinstance(record, dict) else {} for record in records],
+                         index=range(len(records)))
+    for column in FEATURE_COLUMNS:
+        if column not in frame:
+            frame[column] = None
+    return frame, not_object
+
+
+def samples_from_csv(file):
+    """Samples frame from CSV text or a file in the Crop_recommendation.csv layout
+
+    Extra columns (such as label) are ignored; a missing feature column
+    raises ValueError.
+    """
+    import pandas as pd
+    if isinstance(file, str):
+        file = io.StringIO(file)
+    frame = pd.read_csv(file, dtype=str, skipinitialspace=True, keep_default_na=False, na_values=[''])
+    frame.columns = [str(column).strip() for column in frame.columns]
+    missing = [column for column in FEATURE_COLUMNS if column not in frame]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    return frame.reset_index(drop=True), np.zeros(len(frame), dtype=bool)
+
+
+def validate_samples(frame, not_object=None):
+    """Feature matrix, per-row error messages (None if valid) and the valid-row mask
+
+    Every check is a vectorized mask over the whole batch; when a row fails
+    several, the first message wins, like the single-sample endpoint.
+    """
+    import pandas as pd
+    raw = frame[FEATURE_COLUMNS]
+    values = raw.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    absent = raw.isna().to_numpy()
+    invalid = np.isnan(values) & ~absent
+
+    errors = np.full(len(values), None, dtype=object)
+    # Later assignments take precedence, so apply the checks in reverse order
+    for columns, low, high, message in reversed(RANGE_CHECKS):
+        block = values[:, [FEATURE_COLUMNS.index(column) for column in columns]]
+        errors[((block < low) | (block > high)).any(axis=1)] = message
+    errors[invalid.any(axis=1)] = "All fields must be valid numbers"
+    for i in np.flatnonzero(absent.any(axis=1)):
+        fields = [column for column, flag in zip(FEATURE_COLUMNS, absent[i]) if flag]
+        errors[i] = f"Missing required fields: {', '.join(fields)}"
+    if not_object is not None:
+        errors[not_object] = "Each sample must be an object"
+    valid = np.array([error is None for error in errors], dtype=bool)
+    return values, errors, valid
+
+
+def batch_results(errors, valid, scored):
+    """Per-row results in input order
+
+    scored is predict_crop_batch's output for the valid rows.
+    """
+    results = [{"row": i, "error": error} for i, error in enumerate(errors.tolist())]
+    if not valid.any():
+        return results
+
+    predictions, top_indices, probabilities, classes = scored
+    crops = classes[top_indices].tolist()
+    confidences = (probabilities * 100).tolist()
+    for i, prediction, row_crops, row_confidences in zip(np.flatnonzero(valid).tolist(), predictions.tolist(), crops, confidences):
+        results[i] = {
+            "row": i,
+            "recommended_crop": prediction,
+            "recommendations": [
+                {'crop': crop, 'confidence': confidence}
+                for crop, confidence in zip(row_crops, row_confidences)
+            ]
+        }
+    return results
@@ -1,103 +1,260 @@
-import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-import joblib
+import json
 import os
-from datetime import datetime
+from model_registry import atomic_dump, atomic_write_json, registry
+from training_jobs import training_jobs
+from price_store import EXCEL_FILE_PATH, get_price_store, parse_price_column
+from metrics import timed
+from price_features import (
+    FEATURE_COLUMNS, FEATURE_VERSION, SUPPORTED_FEATURE_VERSIONS, build_features, encode_vegetables, vegetable_codes
+)
 
-# Path to the Excel file
-EXCEL_FILE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'crop_price1.xlsx')
+# Saved model artifacts
+MODEL_DIR = os.path.join(os.path.dirname(__file__))
+MODELS_PATH = os.path.join(MODEL_DIR, 'price_prediction_models.pkl')
+ENCODER_PATH = os.path.join(MODEL_DIR, 'vegetable_encoder.pkl')
+SCHEMA_PATH = os.path.join(MODEL_DIR, 'price_prediction_models.json')
 
-def prepare_data():
-    """Load and prepare the dataset for training"""
+# Held while a process trains or updates the price models (see training_jobs.py)
+TRAINING_LOCK_PATH = os.path.join(MODEL_DIR, 'price_prediction_models.lock')
+
+# When the models were last fully retrained and how they have grown since (see price_ingest.py)
+UPDATE_STATE_PATH = os.path.join(MODEL_DIR, 'price_model_updates.json')
+
+# Target columns of models saved without a schema; new models use every price column in the data
+TARGET_COLUMNS = [
+    'Wholesale_Pettah(RS)',
+    'Wholesale_Dambulla(RS)',
+    'Retail_Pettah(RS)',
+    'Retail_Dambulla(RS)'
+]
+
+# Model modes: one forest per target column, one forest for all targets, or
+# one forest over long-format rows with the market and price type as features
+PER_TARGET = 'per_target'
+MULTI_OUTPUT = 'multi_output'
+LONG = 'long'
+PRICE_MODEL_MODE = os.environ.get('PRICE_MODEL_MODE', PER_TARGET)
+
+# Features added to each row in long mode, identifying its price series
+SERIES_FEATURE_COLUMNS = ['market_encoded', 'price_type_encoded']
+
+# Forest hyperparameters
+PRICE_MODEL_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 20,
+    'random_state': 42,
+    'n_jobs': -1
+}
+
+def prepare_data(prices=None, mode=PER_TARGET, le=None, start=None, target_columns=None):
+    """Load and prepare the dataset for training
+    
+    prices is a PriceSnapshot to train on, by default the price store's.
+    The targets are all price columns that have data. Long mode keeps rows
+    with some prices missing (each known price becomes a training row);
+    the other modes need every target on a row.
+    
+    To extend existing models, pass their encoder (rows for vegetables it
+    does not know are dropped), the first date to use and their targets.
+    """
+    import pandas as pd
+    # Training-only dependency, imported here to keep the serving path light
+    from sklearn.preprocessing import LabelEncoder
+    
     try:
-        # Load dataset
-        df = pd.read_excel(EXCEL_FILE_PATH)
-        df.columns = df.columns.str.strip()
-        
-        # Create full date from Year, Month, date
-        df['full_date'] = pd.to_datetime({
-            'year': df['Year'],
-            'month': df['Month'],
-            'day': df['date']
-        }, errors='coerce')
+        # Rows straight from the price store's binary columns, in workbook order
+        if prices is None:
+            prices = get_price_store().snapshot()
+        if prices is None:
+            raise FileNotFoundError(EXCEL_FILE_PATH)
+        rows = prices.select_range(start, None) if start is not None else np.arange(prices.size)
         
         # Remove rows with invalid dates
-        df = df.dropna(subset=['full_date'])
-        
-        # Extract date features
-        df['year'] = df['full_date'].dt.year
-        df['month'] = df['full_date'].dt.month
-        df['day'] = df['full_date'].dt.day
-        df['day_of_week'] = df['full_date'].dt.dayofweek
-        df['day_of_year'] = df['full_date'].dt.dayofyear
+        rows = rows[~np.isnat(prices.full_date[rows])]
         
         # Encode vegetable names
-        le = LabelEncoder()
-        df['vegetable_encoded'] = le.fit_transform(df['vegetable name'])
-        
-        # Select features
-        feature_columns = ['year', 'month', 'day', 'day_of_week', 'day_of_year', 'vegetable_encoded']
-        X = df[feature_columns]
+        names = prices.vegetable_names[prices.vegetable_code[rows]]
+        if le is None:
+            le = LabelEncoder().fit(names)
+        codes, known = vegetable_codes(le.classes_, names)
+        rows, codes = rows[known], codes[known]
         
-        # Target columns (all 4 price types)
-        target_columns = [
-            'Wholesale_Pettah(RS)',
-            'Wholesale_Dambulla(RS)',
-            'Retail_Pettah(RS)',
-            'Retail_Dambulla(RS)'
-        ]
+        # Targets
+        if target_columns is None:
+            target_columns = [column for column in prices.price_columns
+                              if not np.isnan(prices.prices[column][rows]).all()]
+        y = pd.DataFrame({column: prices.prices[column][rows] for column in target_columns}, index=rows)
         
         # Remove rows with missing target values
-        df_clean = df.dropna(subset=target_columns)
-        X_clean = df_clean[feature_columns]
+        keep = (y.notna().any(axis=1) if mode == LONG else y.notna().all(axis=1)).to_numpy()
         
-        # Prepare targets
-        y = df_clean[target_columns]
+        # Features from the shared pipeline
+        feature_columns = list(FEATURE_COLUMNS)
+        X = pd.DataFrame(build_features(prices.full_date[rows[keep]], codes[keep], feature_columns),
+                         columns=feature_columns, index=rows[keep])
         
-        return X_clean, y, le, feature_columns, target_columns
+        return X, y[keep], le, feature_columns, target_columns
         
     except Exception as e:
         print(f"Error preparing data: {str(e)}")
         return None, None, None, None, None
 
-def train_price_model():
+def fit_price_models(X_train, y_train, target_columns, mode=PER_TARGET, params=None):
+    """Fit the price models
+    
+    per_target fits one forest per target column, multi_output fits a
+    single forest that predicts all target columns together. params
+    overrides PRICE_MODEL_PARAMS (e.g. a smaller n_estimators or max_depth).
+    """
+    from sklearn.ensemble import RandomForestRegressor
+    
+    params = {**PRICE_MODEL_PARAMS, **(params or {})}
+    
+    if mode == LONG:
+        # One row per known price, so markets add rows instead of forests
+        X_long, y_long = to_long_format(X_train, y_train, target_columns)
+        model = RandomForestRegressor(**params)
+        model.fit(X_long, y_long)
+        return {LONG: model}
+    
+    if mode == MULTI_OUTPUT:
+        model = RandomForestRegressor(**params)
+        model.fit(X_train, y_train[target_columns])
+        return {MULTI_OUTPUT: model}
+    
+    # Train separate models for each price type
+    models = {}
+    for target in target_columns:
+        model = RandomForestRegressor(**params)
+        model.fit(X_train, y_train[target])
+        models[target] = model
+    return models
+
+def series_codes(target_columns):
+    """Market and price type codes of each target column
+    
+    Codes follow the order of first appearance, so adding a market column
+    at the end keeps the codes of the existing series.
+    """
+    parsed = [parse_price_column(column) or ('', column) for column in target_columns]
+    markets = list(dict.fromkeys(market for _, market in parsed))
+    price_types = list(dict.fromkeys(price_type for price_type, _ in parsed))
+    return (np.array([markets.index(market) for _, market in parsed]),
+            np.array([price_types.index(price_type) for price_type, _ in parsed]))
+
+def long_features(features, target_columns, rows, series):
+    """Feature rows `rows` extended with the codes of target series `series`"""
+    import pandas as pd
+    markets, price_types = series_codes(target_columns)
+    if isinstance(features, pd.DataFrame):
+        X_long = features.iloc[rows].reset_index(drop=True)
+        X_long[SERIES_FEATURE_COLUMNS[0]] = markets[series]
+        X_long[SERIES_FEATURE_COLUMNS[1]] = price_types[series]
+        return X_long
+    features = np.asarray(features)
+    return np.column_stack([features[rows], markets[series], price_types[series]])
+
+def to_long_format(X, y, target_columns):
+    """One (features, market, price type) -> price row per known price"""
+    values = y[target_columns].to_numpy(dtype=np.float64)
+    rows, series = np.nonzero(~np.isnan(values))
+    return long_features(X, target_columns, rows, series), values[rows, series]
+
+def predict_targets(models, features, target_columns, mode=PER_TARGET):
+    """Predict every target column, returning an (n_rows, n_targets) array"""
+    if mode == LONG:
+        # Every row for every series in one predict call
+        n_rows, n_targets = len(features), len(target_columns)
+        rows = np.repeat(np.arange(n_rows), n_targets)
+        series = np.tile(np.arange(n_targets), n_rows)
+        pred = models[LONG].predict(long_features(features, target_columns, rows, series))
+        return np.asarray(pred).reshape(n_rows, n_targets)
+    if mode == MULTI_OUTPUT:
+        pred = models[MULTI_OUTPUT].predict(features)
+        return np.asarray(pred).reshape(len(features), len(target_columns))
+    return np.column_stack([models[target].predict(features) for target in target_columns])
+
+def date_label(parts):
+    """(year, month, day) as YYYY-MM-DD"""
+    return '-'.join(f"{part:02d}" for part in parts)
+
+
+def forest_size(models):
+    """Trees per forest of a price model bundle"""
+    model = next(iter(models.values()))
+    return getattr(model, 'n_estimators', None) or model.n_trees
+
+
+def retrained_state(models):
+    """Update state for models that were just trained from scratch"""
+    from datetime import datetime
+    now = datetime.now().isoformat(timespec='seconds')
+    prices = get_price_store().snapshot()
+    trees = forest_size(models)
+    return {
+        'full_retrain_at': now,
+        'updated_at': now,
+        'base_trees': trees,
+        'trees': trees,
+        'updates': 0,
+        'data_through': date_label(prices.latest_date()) if prices is not None else None
+    }
+
+
+def save_price_models(models, le, feature_columns, target_columns, mode=PER_TARGET, state=None):
+    """Publish price models, encoder and schema for the model registry
+
+    The update state is written with them: state for models extended in
+    place (price_ingest.warm_start), otherwise that of a full retrain, so
+    every way of publishing models (training, the orchestrator,
+    compaction) resets the warm-start schedule.
+    """
+    # Save the schema first so it is in place when the new models are picked up
+    atomic_write_json({
+        'feature_columns': feature_columns,
+        'feature_version': FEATURE_VERSION,
+        'target_columns': target_columns,
+        'mode': mode
+    }, SCHEMA_PATH)
+    
+    # Save models (each file is replaced atomically, models last)
+    atomic_dump(le, ENCODER_PATH)
+    atomic_dump(models, MODELS_PATH)
+    atomic_write_json(state or retrained_state(models), UPDATE_STATE_PATH)
+    
+    print(f"\nModels ({mode}) saved to {MODEL_DIR}")
+
+def train_price_model(mode=None):
     """Train the price prediction model"""
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    
     try:
-        X, y, le, feature_columns, target_columns = prepare_data()
+        mode = mode or PRICE_MODEL_MODE
+        X, y, le, feature_columns, target_columns = prepare_data(mode=mode)
         
         if X is None:
-            return None, None, None, None
+            return None, None, None, None, None
         
         # Train-test split (80-20)
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=0.2, random_state=42
         )
         
-        # Train separate models for each price type
-        models = {}
+        models = fit_price_models(X_train, y_train, target_columns, mode)
+        
+        # Evaluate
+        y_pred = predict_targets(models, X_test, target_columns, mode)
         scores = {}
         
-        for target in target_columns:
-            model = RandomForestRegressor(
-                n_estimators=100,
-                max_depth=20,
-                random_state=42,
-                n_jobs=-1
-            )
+        for i, target in enumerate(target_columns):
+            # Long mode trains on rows with some prices missing; score the known ones
+            known = y_test[target].notna().to_numpy()
+            mae = mean_absolute_error(y_test[target][known], y_pred[known, i])
+            rmse = np.sqrt(mean_squared_error(y_test[target][known], y_pred[known, i]))
+            r2 = r2_score(y_test[target][known], y_pred[known, i])
             
-            model.fit(X_train, y_train[target])
-            
-            # Evaluate
-            y_pred = model.predict(X_test)
-            mae = mean_absolute_error(y_test[target], y_pred)
-            rmse = np.sqrt(mean_squared_error(y_test[target], y_pred))
-            r2 = r2_score(y_test[target], y_pred)
-            
-            models[target] = model
             scores[target] = {
                 'mae': mae,
                 'rmse': rmse,
@@ -109,63 +266,81 @@ def train_price_model():
             print(f"  RMSE: {rmse:.2f}")
             print(f"  R²: {r2:.4f}")
         
-        # Save models
-        model_dir = os.path.join(os.path.dirname(__file__))
-        joblib.dump(models, os.path.join(model_dir, 'price_prediction_models.pkl'))
-        joblib.dump(le, os.path.join(model_dir, 'vegetable_encoder.pkl'))
-        
-        print(f"\nModels saved to {model_dir}")
+        save_price_models(models, le, feature_columns, target_columns, mode)
         return models, le, feature_columns, target_columns, scores
         
     except Exception as e:
         print(f"Error training model: {str(e)}")
         return None, None, None, None, None
 
+def load_price_bundle(paths):
+    """Load the price models, vegetable encoder and feature/target schema"""
+    import joblib
+    bundle = {
+        'models': joblib.load(paths['models']),
+        'encoder': joblib.load(paths['encoder']),
+        'feature_columns': list(FEATURE_COLUMNS),
+        'target_columns': list(TARGET_COLUMNS),
+        'mode': PER_TARGET,
+        'feature_version': 1
+    }
+    
+    # Models saved before the schema file existed use the default columns
+    if os.path.exists(SCHEMA_PATH):
+        with open(SCHEMA_PATH) as f:
+            bundle.update(json.load(f))
+    
+    if bundle['feature_version'] not in SUPPORTED_FEATURE_VERSIONS:
+        raise ValueError(f"Unsupported feature version {bundle['feature_version']}, retrain the price models")
+    
+    return bundle
+
+registry.register('price', {'models': MODELS_PATH, 'encoder': ENCODER_PATH}, load_price_bundle)
+training_jobs.register('price', train_price_model, TRAINING_LOCK_PATH)
+
+# Upper bound on dates x vegetables in one batch prediction
+MAX_BATCH_ROWS = 100000
+
+def get_price_bundle():
+    """Loaded price models, or None while they are being trained"""
+    artifact = registry.get('price')
+    
+    if artifact is None:
+        # Train in the background instead of blocking this request
+        print("Models not found. Training new models in the background...")
+        training_jobs.submit('price')
+        return None
+    
+    return artifact.value
+
+def price_features(bundle, dates, codes):
+    """Feature frame for the bundle's models (named like the columns they were fitted on)"""
+    import pandas as pd
+    feature_columns = bundle['feature_columns']
+    return pd.DataFrame(build_features(dates, codes, feature_columns), columns=feature_columns)
+
 def predict_prices(date_str, vegetable_name):
     """Predict prices for a given date and vegetable"""
     try:
-        model_dir = os.path.join(os.path.dirname(__file__))
-        models_path = os.path.join(model_dir, 'price_prediction_models.pkl')
-        encoder_path = os.path.join(model_dir, 'vegetable_encoder.pkl')
-        
-        if not os.path.exists(models_path) or not os.path.exists(encoder_path):
-            print("Models not found. Training new models...")
-            result = train_price_model()
-            if result[0] is None:
-                return None
-            models, le, feature_columns, target_columns, _ = result
-        else:
-            models = joblib.load(models_path)
-            le = joblib.load(encoder_path)
-            X, y, le_temp, feature_columns, target_columns = prepare_data()
-        
-        # Parse date
-        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-        
-        # Encode vegetable
-        try:
-            vegetable_encoded = le.transform([vegetable_name])[0]
-        except ValueError:
-            # If vegetable not in training data, use average encoding
-            vegetable_encoded = len(le.classes_) // 2
-        
-        # Prepare features
-        features = pd.DataFrame({
-            'year': [date_obj.year],
-            'month': [date_obj.month],
-            'day': [date_obj.day],
-            'day_of_week': [date_obj.weekday()],
-            'day_of_year': [date_obj.timetuple().tm_yday],
-            'vegetable_encoded': [vegetable_encoded]
-        })
+        bundle = get_price_bundle()
+        if bundle is None:
+            return None
+        
+        models = bundle['models']
+        target_columns = bundle['target_columns']
+        
+        with timed('features'):
+            # Vegetables not in the training data get the middle encoding
+            codes = encode_vegetables(bundle['encoder'], [vegetable_name])
+            features = price_features(bundle, [np.datetime64(date_str, 'D')], codes)
         
         # Predict all prices
+        with timed('predict'):
+            pred = predict_targets(models, features, target_columns, bundle['mode'])[0]
         predictions = {}
-        for target in target_columns:
-            model = models[target]
-            pred = model.predict(features)[0]
+        for i, target in enumerate(target_columns):
             # Ensure non-negative prices and convert to float
-            predictions[target] = float(max(0, round(pred, 2)))
+            predictions[target] = float(max(0, round(pred[i], 2)))
         
         return predictions
         
@@ -173,6 +348,59 @@ def predict_prices(date_str, vegetable_name):
         print(f"Error predicting prices: {str(e)}")
         return None
 
+def predict_prices_batch(start_date, end_date, vegetable_names, bundle=None):
+    """Predict prices for every date in a range and every vegetable in one pass
+    
+    Returns a dict with the dates, vegetables and target columns plus a
+    (dates x vegetables x targets) array of prices, or None on failure.
+    """
+    try:
+        bundle = bundle or get_price_bundle()
+        if bundle is None:
+            return None
+        
+        models = bundle['models']
+        target_columns = bundle['target_columns']
+        
+        # Date x vegetable grid, dates vary slowest
+        start = np.datetime64(start_date, 'D')
+        end = np.datetime64(end_date, 'D')
+        dates = np.arange(start, end + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+        vegetable_names = list(vegetable_names)
+        n_dates, n_vegetables = len(dates), len(vegetable_names)
+        
+        if n_dates == 0 or n_vegetables == 0:
+            return None
+        if n_dates * n_vegetables > MAX_BATCH_ROWS:
+            print(f"Batch of {n_dates * n_vegetables} rows exceeds {MAX_BATCH_ROWS}")
+            return None
+        
+        # Build the whole feature matrix at once
+        with timed('features'):
+            codes = encode_vegetables(bundle['encoder'], vegetable_names)
+            features = price_features(bundle, np.repeat(dates, n_vegetables), np.tile(codes, n_dates))
+        
+        # One predict call per model over every row
+        with timed('predict'):
+            pred = predict_targets(models, features, target_columns, bundle['mode'])
+        # Ensure non-negative prices
+        prices = np.maximum(0, np.round(pred, 2)).reshape(n_dates, n_vegetables, len(target_columns))
+        
+        return {
+            'dates': [str(d) for d in dates],
+            'vegetables': vegetable_names,
+            'targets': list(target_columns),
+            'prices': prices
+        }
+        
+    except Exception as e:
+        print(f"Error predicting prices: {str(e)}")
+        return None
+
 if __name__ == "__main__":
     # Train the model when script is run directly
-    train_price_model()
+    import sys
+    if '--long' in sys.argv:
+        train_price_model(LONG)
+    else:
+        train_price_model(MULTI_OUTPUT if '--multi-output' in sys.argv else None)
@@ -0,0 +1,103 @@
+import numpy as np
+import hashlib
+import shutil
+import json
+import os
+
+# Binary copies of the data files, one directory per source file content
+CACHE_DIR = os.environ.get(
+    'PRICE_CACHE_DIR',
+    os.path.join(os.path.dirname(__file__), '..', 'data', '.cache')
+)
+
+MANIFEST = 'manifest.json'
+
+
+def file_hash(path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_or_build(source_path, build, layout_version=1):
+    """Load the binary columns converted from source_path
+
+    The columns live in CACHE_DIR under a directory named after the source
+    file and the hash of its contents, one .npy file per column. They are
+    opened memory-mapped, so worker processes share the same pages. When no
+    conversion exists for the current contents, build(source_path) is called
+    to produce (arrays, meta) and the result is written for the next reader.
+    """
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    key = f"{file_hash(source_path)[:16]}-v{layout_version}"
+    target = os.path.join(CACHE_DIR, f"{name}-{key}")
+
+    cached = load_columns(target)
+    if cached is not None:
+        return cached
+
+    arrays, meta = build(source_path)
+    try:
+        _save(target, arrays, meta)
+        _remove_stale(name, target)
+        return load_columns(target)
+    except OSError as e:
+        # Read-only deployments still work, just without the binary copy
+        print(f"Error writing columnar cache: {str(e)}")
+        return arrays, meta
+
+
+def load_columns(target):
+    """Memory-map the columns in a cache directory; None if it is missing or incomplete"""
+    manifest_path = os.path.join(target, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        arrays = {
+            column: np.load(os.path.join(target, f"{column}.npy"), mmap_mode='r')
+            for column in manifest['columns']
+        }
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error reading columnar cache: {str(e)}")
+        return None
+    return arrays, manifest['meta']
+
+
+def _save(target, arrays, meta):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    for column, values in arrays.items():
+        np.save(os.path.join(tmp, f"{column}.npy"), np.ascontiguousarray(values))
+
+    # The manifest is written last, so a directory without one is incomplete
+    write_manifest(tmp, list(arrays), meta)
+
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        # Another process published the same conversion first
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.exists(os.path.join(target, MANIFEST)):
+            raise
+
+
+def write_manifest(directory, columns, meta):
+    """Mark a directory of <column>.npy files as a complete set of columns"""
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump({'columns': list(columns), 'meta': meta}, f)
+
+
+def _remove_stale(name, keep):
+    """Delete conversions of older versions of the same source file"""
+    for entry in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, entry)
+        if entry.startswith(f"{name}-") and path != keep and '.tmp-' not in entry:
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,391 @@
+"""Precomputed crop recommendations over a quantized input grid
+
+The seven inputs are bounded, so the crop forest can be evaluated once at
+the centre of every cell of a grid over them and the best crop stored in a
+memory-mapped .npy table, one byte per cell.
+
+The forest's answer only changes at its split thresholds, so the cell
+edges along each input are placed at quantiles of that input's thresholds,
+each split weighted by the dataset rows that reach it: cells are narrow
+where the forest decides between crops for typical inputs and wide
+elsewhere; an evenly spaced grid of the same size puts most cells on a
+decision boundary.
+
+Cells whose answer might not hold across the whole cell are marked for the
+exact model: those where the best crop leads the second by less than
+CROP_LOOKUP_MIN_MARGIN, and those where a neighbouring cell along any input
+has a different best crop (a decision boundary runs through or near them).
+Inputs outside the grid (e.g. rainfall above its range) also go to the
+exact model. The build measures the share of requests served from the
+table and how often their crop agrees with the exact model, and stores
+that report with the table.
+
+Only the crop is served from the table. The ranked recommendations and
+their confidences always come from the exact model: the crops after the
+best one mostly have confidences near zero that change within a cell, so
+a table's top 3 matched the exact order for under a fifth of the served
+requests, and no margin on the lower ranks leaves cells to serve.
+
+Serving uses the table only with CROP_RECOMMENDATION_MODE=lookup, and only
+while it was built from the crop model currently on disk; otherwise (or
+while it is rebuilt, or after a failed build until training_jobs allows a
+retry) requests use the exact model. The metadata file names the table
+it belongs to, and a build writes a new table file before replacing the
+metadata, so a reader never pairs a table with another build's grid.
+
+    python crop_lookup.py --points N=10,P=10,K=10
+    python crop_lookup.py --report
+"""
+import argparse
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from crop_model import FEATURE_COLUMNS, CSV_FILE_PATH
+from model_registry import atomic_write_json, registry
+from prediction_cache import predict_crop_cached
+from training_jobs import training_jobs
+
+# 'exact' runs the forest for every request, 'lookup' reads the table first
+CROP_RECOMMENDATION_MODE = os.environ.get('CROP_RECOMMENDATION_MODE', 'exact')
+
+# Tables (crop_lookup-<build>.npy) and the metadata naming the current one,
+# with its grid, classes and agreement report
+TABLE_DIR = os.path.dirname(os.path.abspath(__file__))
+META_PATH = os.path.join(TABLE_DIR, 'crop_lookup.json')
+
+# Held while a process builds the table (see training_jobs.py)
+TRAINING_LOCK_PATH = os.path.join(os.path.dirname(__file__), 'crop_lookup.lock')
+
+# (low, high, cells) per input; the edges between the cells are placed at build time
+DEFAULT_GRID = {
+    'N': (0, 200, 8),
+    'P': (0, 200, 8),
+    'K': (0, 200, 8),
+    'temperature': (0, 50, 8),
+    'humidity': (0, 100, 8),
+    'ph': (0, 14, 8),
+    'rainfall': (0, 300, 8),
+}
+
+# Smallest lead of the best crop over the second (as a probability) the table answers
+CROP_LOOKUP_MIN_MARGIN = float(os.environ.get('CROP_LOOKUP_MIN_MARGIN', 0.2))
+
+# Random samples over the grid for the agreement report, besides the dataset rows
+REPORT_SAMPLES = 20000
+
+# Cells evaluated per forest pass while building
+BUILD_CHUNK_CELLS = 65536
+
+# Best crop of a cell that must be answered by the exact model
+EXACT = 255
+
+
+def grid_shape(edges):
+    """Cells along every input for the inner edges of each"""
+    return tuple(len(inner) + 1 for inner in edges)
+
+
+def parse_points(value):
+    """Grid from 'N=10,ph=14' (cells per input), the other inputs keep DEFAULT_GRID"""
+    grid = dict(DEFAULT_GRID)
+    for item in filter(None, (value or '').split(',')):
+        name, _, cells = item.partition('=')
+        name = name.strip()
+        if name not in grid:
+            raise ValueError(f"Unknown input {name}. Use {', '.join(FEATURE_COLUMNS)}")
+        low, high, _ = grid[name]
+        grid[name] = (low, high, int(cells))
+    return grid
+
+
+class CropLookup:
+    """The memory-mapped table plus its grid"""
+
+    def __init__(self, table, meta):
+        self.table = table
+        self.meta = meta
+        self.classes = np.asarray(meta['classes'], dtype=object)
+        grid = [meta['grid'][name] for name in FEATURE_COLUMNS]
+        self.low = np.array([low for low, _, _ in grid], dtype=np.float64)
+        self.high = np.array([high for _, high, _ in grid], dtype=np.float64)
+        self.edges = [np.asarray(meta['edges'][name], dtype=np.float64) for name in FEATURE_COLUMNS]
+        self.shape = grid_shape(self.edges)
+
+    def cells(self, X):
+        """Flat cell index of every row of raw features, -1 outside the grid"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        inside = ((X >= self.low) & (X <= self.high)).all(axis=1)
+        # A value on an edge belongs to the cell above it
+        index = np.stack([np.searchsorted(edges, X[:, i], side='right') for i, edges in enumerate(self.edges)],
+                         axis=1)
+        flat = np.ravel_multi_index(tuple(index.T), self.shape)
+        return np.where(inside, flat, -1)
+
+    def lookup(self, inputs):
+        """Best crop for one row of inputs, or None for the exact model"""
+        cell = self.cells([inputs])[0]
+        if cell < 0 or self.table[cell] == EXACT:
+            return None
+        return self.classes[self.table[cell]]
+
+
+def load_crop_lookup(paths):
+    with open(paths['meta']) as f:
+        meta = json.load(f)
+    table = np.load(os.path.join(TABLE_DIR, meta['table']), mmap_mode='r')
+    if len(table) != int(np.prod(grid_shape([meta['edges'][name] for name in FEATURE_COLUMNS]))):
+        raise ValueError("Lookup table does not match its grid")
+    return CropLookup(table, meta)
+
+
+registry.register('crop_lookup', {'meta': META_PATH}, load_crop_lookup)
+
+# Requests answered from the table and by the exact model in lookup mode
+lookup_counts = {'served': 0, 'exact': 0}
+_counts_lock = threading.Lock()
+
+
+def count_request(kind):
+    with _counts_lock:
+        lookup_counts[kind] += 1
+
+
+def current_lookup():
+    """The table if it was built from the crop model on disk, else None"""
+    artifact = registry.get('crop_lookup')
+    if artifact is None or artifact.value.meta['model_version'] != registry.version('crop'):
+        return None
+    return artifact.value
+
+
+def recommend_crop(N, P, K, temperature, humidity, ph, rainfall):
+    """predict_crop_cached, with the crop taken from the lookup table where it is reliable
+
+    The recommendations (ranked crops and confidences) are always the
+    exact model's.
+    """
+    inputs = (N, P, K, temperature, humidity, ph, rainfall)
+    if CROP_RECOMMENDATION_MODE != 'lookup':
+        return predict_crop_cached(*inputs)
+
+    lookup = current_lookup()
+    if lookup is None:
+        # Missing or built from an older model: rebuild it in the background
+        # (training_jobs holds off after a failed build)
+        if registry.get('crop') is not None:
+            training_jobs.submit('crop_lookup')
+        crop = None
+    else:
+        crop = lookup.lookup(inputs)
+
+    prediction, recommendations = predict_crop_cached(*inputs)
+    # A table crop the exact ranking disagrees with is not served
+    if crop is None or crop != prediction:
+        count_request('exact')
+        return prediction, recommendations
+    count_request('served')
+    return crop, recommendations
+
+
+def split_edges(model, grid, X):
+    """Inner cell edges per input at quantiles of the forest's split thresholds
+
+    Every split on an input is weighted by the rows of X passing through
+    it, and cells - 1 edges are placed at the weighted quantiles of the
+    thresholds inside (low, high). Repeated thresholds collapse, so an
+    input can get fewer cells than asked for.
+    """
+    counts = model.node_counts(X)
+    internal = model.left != np.arange(len(model.left))
+    edges = {}
+    for i, name in enumerate(FEATURE_COLUMNS):
+        low, high, cells = grid[name]
+        nodes = internal & (model.feature == i) & (counts > 0)
+        threshold = model.threshold[nodes].astype(np.float64)
+        weight = counts[nodes]
+        inside = (threshold > low) & (threshold < high)
+        threshold, weight = threshold[inside], weight[inside]
+        if cells < 2 or len(threshold) == 0:
+            edges[name] = []
+            continue
+        order = threshold.argsort()
+        cumulative = np.cumsum(weight[order]) / weight.sum()
+        picks = np.minimum(np.searchsorted(cumulative, np.arange(1, cells) / cells), len(order) - 1)
+        edges[name] = np.unique(threshold[order][picks]).tolist()
+    return edges
+
+
+def build_table(model, grid, edges, min_margin, path):
+    """Evaluate the model at every cell centre into a .npy table at path"""
+    bounds = [np.array([grid[name][0], *edges[name], grid[name][1]], dtype=np.float64) for name in FEATURE_COLUMNS]
+    shape = grid_shape([edges[name] for name in FEATURE_COLUMNS])
+    n_cells = int(np.prod(shape))
+
+    best = np.empty(n_cells, dtype=np.uint8)
+    uncertain = np.zeros(n_cells, dtype=bool)
+    for start in range(0, n_cells, BUILD_CHUNK_CELLS):
+        cells = np.arange(start, min(start + BUILD_CHUNK_CELLS, n_cells))
+        index = np.unravel_index(cells, shape)
+        centres = np.stack([(b[i] + b[i + 1]) / 2 for b, i in zip(bounds, index)], axis=1)
+        probabilities = model.predict_proba(centres)
+        top = probabilities.argsort(axis=1)[:, -2:][:, ::-1]
+        top_probabilities = np.take_along_axis(probabilities, top, axis=1)
+        best[cells] = top[:, 0]
+        uncertain[cells] = top_probabilities[:, 0] - top_probabilities[:, 1] < min_margin
+
+    # Cells next to a cell with another best crop, along any input
+    best = best.reshape(shape)
+    uncertain = uncertain.reshape(shape)
+    for axis in range(len(shape)):
+        before = [slice(None)] * len(shape)
+        after = [slice(None)] * len(shape)
+        before[axis], after[axis] = slice(None, -1), slice(1, None)
+        differs = best[tuple(before)] != best[tuple(after)]
+        uncertain[tuple(before)] |= differs
+        uncertain[tuple(after)] |= differs
+
+    best[uncertain] = EXACT
+    np.save(path, best.ravel())
+    return float(uncertain.mean())
+
+
+def agreement(lookup, model, X):
+    """How often the table's crop for rows X is served and agrees with the exact model
+
+    A served crop the exact model disagrees with is replaced by the exact
+    answer, so these are the requests the table answers and how often its
+    crop alone would have been right.
+    """
+    cells = lookup.cells(X)
+    exact_best = model.predict_proba(X).argmax(axis=1)
+
+    served = cells >= 0
+    served[served] = lookup.table[cells[served]] != EXACT
+    same_best = lookup.table[cells[served]] == exact_best[served]
+    return {
+        'samples': int(len(X)),
+        'served_from_table': round(float((same_best.sum()) / len(X)), 4),
+        'table_agreement': round(float(same_best.mean()), 4) if served.any() else None,
+    }
+
+
+def dataset_inputs():
+    """The crop dataset's features, in FEATURE_COLUMNS order"""
+    import pandas as pd
+    return pd.read_csv(CSV_FILE_PATH)[FEATURE_COLUMNS].to_numpy(np.float64)
+
+
+def agreement_report(lookup, model, samples=REPORT_SAMPLES, seed=0):
+    """Agreement on the dataset rows and on uniform random inputs over the grid"""
+    rng = np.random.default_rng(seed)
+    return {
+        'dataset': agreement(lookup, model, dataset_inputs()),
+        'uniform': agreement(lookup, model, rng.uniform(lookup.low, lookup.high, (samples, len(FEATURE_COLUMNS)))),
+    }
+
+
+def build_crop_lookup(grid=None, min_margin=CROP_LOOKUP_MIN_MARGIN):
+    """Build the lookup table for the current crop model
+
+    Returns (metadata with the agreement report, path of the table), or
+    (None, None) if the crop model is not available.
+    """
+    try:
+        grid = grid or parse_points(os.environ.get('CROP_LOOKUP_POINTS'))
+        artifact = registry.get('crop')
+        if artifact is None:
+            print("Crop model not found, train it first")
+            return None, None
+        model = artifact.value
+
+        edges = split_edges(model, grid, dataset_inputs())
+        built_at = datetime.now()
+        name = f"crop_lookup-{built_at:%Y%m%d%H%M%S}-{os.getpid()}.npy"
+        path = os.path.join(TABLE_DIR, name)
+        uncertain = build_table(model, grid, edges, min_margin, path)
+        meta = {
+            'model_version': artifact.version,
+            'built_at': built_at.isoformat(timespec='seconds'),
+            'table': name,
+            'grid': {name: list(grid[name]) for name in FEATURE_COLUMNS},
+            'edges': edges,
+            'classes': [str(crop) for crop in model.classes_],
+            'min_margin': min_margin,
+            'exact_cells': round(uncertain, 4),
+        }
+        meta['report'] = agreement_report(CropLookup(np.load(path, mmap_mode='r'), meta), model)
+
+        # The metadata switches readers to the new table in one rename
+        atomic_write_json(meta, META_PATH)
+        remove_old_tables(name)
+        print(f"Lookup table saved to {path}: {json.dumps(meta['report'])}")
+        return meta, path
+
+    except Exception as e:
+        print(f"Error building crop lookup table: {str(e)}")
+        return None, None
+
+
+def remove_old_tables(current):
+    """Delete the tables of earlier builds (open memory maps stay readable)"""
+    for name in os.listdir(TABLE_DIR):
+        if name.startswith('crop_lookup-') and name.endswith('.npy') and name != current:
+            try:
+                os.remove(os.path.join(TABLE_DIR, name))
+            except OSError:
+                # Still mapped on a platform that can't remove open files
+                pass
+
+
+training_jobs.register('crop_lookup', build_crop_lookup, TRAINING_LOCK_PATH)
+
+
+def lookup_stats():
+    """Serving mode, the table's grid and agreement report, the last build and request counts"""
+    artifact = registry.get('crop_lookup')
+    meta = artifact.value.meta if artifact else None
+    with _counts_lock:
+        counts = dict(lookup_counts)
+    build = training_jobs.latest('crop_lookup')
+    return {
+        'mode': CROP_RECOMMENDATION_MODE,
+        'current': current_lookup() is not None,
+        'build': build.to_dict() if build else None,
+        'cells': len(artifact.value.table) if artifact else 0,
+        'exact_cells': meta['exact_cells'] if meta else None,
+        'report': meta['report'] if meta else None,
+        **counts
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', help='Cells per input, e.g. N=10,P=10,ph=14 (default up to 8 each)')
+    parser.add_argument('--min-margin', type=float, default=CROP_LOOKUP_MIN_MARGIN,
+                        help='Smallest lead of the best crop the table answers (default %(default)s)')
+    parser.add_argument('--report', action='store_true', help='Measure the current table instead of building one')
+    parser.add_argument('--samples', type=int, default=REPORT_SAMPLES, help='Random inputs for the agreement report')
+    args = parser.parse_args()
+
+    if args.report:
+        artifact = registry.get('crop_lookup')
+        if artifact is None:
+            parser.error("No lookup table, build one first")
+        report = agreement_report(artifact.value, registry.get('crop').value, args.samples)
+        print(json.dumps(report, indent=2))
+        return
+
+    meta, path = build_crop_lookup(parse_points(args.points), args.min_margin)
+    if meta is not None:
+        dataset = meta['report']['dataset']
+        print(f"{len(np.load(path, mmap_mode='r'))} cells, {meta['exact_cells']:.1%} answered by the exact model")
+        print(f"Dataset rows served from the table: {dataset['served_from_table']:.1%}, "
+              f"crop agreement where the table answers {dataset['table_agreement']:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,62 @@
-import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, classification_report
-import joblib
 import os
+from model_registry import atomic_dump, registry
+from flat_forest import FlatForest
+from metrics import timed
+from training_jobs import training_jobs
 
 # Path to the CSV file
 CSV_FILE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'Crop_recommendation.csv')
 
+# Saved model artifact
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'crop_recommendation_model.pkl')
+
+# Held while a process trains the crop model (see training_jobs.py)
+TRAINING_LOCK_PATH = os.path.join(os.path.dirname(__file__), 'crop_recommendation_model.lock')
+
+# Model features
+FEATURE_COLUMNS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# Forest hyperparameters
+CROP_MODEL_PARAMS = {
+    'n_estimators': 100,
+    'random_state': 42,
+    'max_depth': 20,
+    'n_jobs': -1
+}
+
+def load_crop_data():
+    """Load the crop dataset and split it 80-20 into train and test sets"""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    
+    df = pd.read_csv(CSV_FILE_PATH)
+    
+    # Features and target
+    X = df[FEATURE_COLUMNS]
+    y = df['label']
+    
+    # Train-test split
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
+def fit_crop_model(X_train, y_train, params=None):
+    """Fit the Random Forest Classifier; params overrides CROP_MODEL_PARAMS"""
+    from sklearn.ensemble import RandomForestClassifier
+    
+    model = RandomForestClassifier(**{**CROP_MODEL_PARAMS, **(params or {})})
+    model.fit(X_train, y_train)
+    return model
+
 def train_crop_model():
     """Train the crop recommendation model"""
+    # Training-only dependency, imported here to keep the serving path light
+    from sklearn.metrics import accuracy_score
+    
     try:
-        # Load dataset
-        df = pd.read_csv(CSV_FILE_PATH)
-        
-        # Features and target
-        X = df[['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']]
-        y = df['label']
-        
-        # Train-test split
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
-        
-        # Model - Random Forest Classifier
-        model = RandomForestClassifier(
-            n_estimators=100,
-            random_state=42,
-            max_depth=20
-        )
+        X_train, X_test, y_train, y_test = load_crop_data()
         
         # Train the model
-        model.fit(X_train, y_train)
+        model = fit_crop_model(X_train, y_train)
         
         # Evaluate
         y_pred = model.predict(X_test)
@@ -40,46 +64,48 @@ def train_crop_model():
         print(f"Model Accuracy: {accuracy:.4f}")
         
         # Save model
-        model_path = os.path.join(os.path.dirname(__file__), 'crop_recommendation_model.pkl')
-        joblib.dump(model, model_path)
+        atomic_dump(model, MODEL_PATH)
         
-        print(f"Model trained and saved to {model_path}")
+        print(f"Model trained and saved to {MODEL_PATH}")
         return model, accuracy
         
     except Exception as e:
         print(f"Error training model: {str(e)}")
         return None, None
 
+def load_crop_forest(paths):
+    """Load the crop model as a FlatForest (pickled forests are flattened on load)"""
+    import joblib
+    model = joblib.load(paths['model'])
+    return model if isinstance(model, FlatForest) else FlatForest(model)
+
+registry.register('crop', {'model': MODEL_PATH}, load_crop_forest)
+training_jobs.register('crop', train_crop_model, TRAINING_LOCK_PATH)
+
 def predict_crop(N, P, K, temperature, humidity, ph, rainfall):
     """Predict crop recommendation based on soil and weather conditions"""
     try:
-        model_path = os.path.join(os.path.dirname(__file__), 'crop_recommendation_model.pkl')
+        artifact = registry.get('crop')
         
-        if not os.path.exists(model_path):
-            print("Model not found. Training new model...")
-            model, _ = train_crop_model()
-            if model is None:
-                return None, "Failed to train model"
-        else:
-            model = joblib.load(model_path)
+        if artifact is None:
+            # Train in the background instead of blocking this request
+            print("Model not found. Training new model in the background...")
+            training_jobs.submit('crop')
+            return None, "Model is warming up, try again shortly"
         
-        # Prepare input data as DataFrame to match training format
-        input_data = pd.DataFrame({
-            'N': [N],
-            'P': [P],
-            'K': [K],
-            'temperature': [temperature],
-            'humidity': [humidity],
-            'ph': [ph],
-            'rainfall': [rainfall]
-        })
+        model = artifact.value
         
-        # Predict
-        prediction = model.predict(input_data)[0]
-        probabilities = model.predict_proba(input_data)[0]
+        # One row of raw features, in FEATURE_COLUMNS order
+        with timed('features'):
+            input_data = np.array([[N, P, K, temperature, humidity, ph, rainfall]], dtype=np.float64)
         
-        # Get top 3 recommendations
+        # Single forest pass; predict is the argmax of the probabilities
+        with timed('predict'):
+            probabilities = model.predict_proba(input_data)[0]
         classes = model.classes_
+        prediction = classes[probabilities.argmax()]
+        
+        # Get top 3 recommendations
         top_indices = probabilities.argsort()[-3:][::-1]
         recommendations = [
             {
@@ -95,6 +121,31 @@ def predict_crop(N, P, K, temperature, humidity, ph, rainfall):
         print(f"Error predicting crop: {str(e)}")
         return None, str(e)
 
+def predict_crop_batch(X, k=3):
+    """Predict crops for many rows of raw features (FEATURE_COLUMNS order)
+    
+    Returns (predictions, top_indices, probabilities, classes) from a single
+    forest pass: the predicted crop per row, the indices into classes of the
+    k best crops and their probabilities, both shaped (n_rows, k). Returns
+    None if the model is not available yet.
+    """
+    artifact = registry.get('crop')
+    if artifact is None:
+        training_jobs.submit('crop')
+        return None
+    
+    model = artifact.value
+    with timed('predict'):
+        probabilities = model.predict_proba(np.asarray(X, dtype=np.float64))
+    classes = model.classes_
+    top_indices = probabilities.argsort(axis=1)[:, -k:][:, ::-1]
+    return (
+        classes[probabilities.argmax(axis=1)],
+        top_indices,
+        np.take_along_axis(probabilities, top_indices, axis=1),
+        classes
+    )
+
 if __name__ == "__main__":
     # Train the model when script is run directly
     train_crop_model()
@@ -0,0 +1,97 @@
+import numpy as np
+
+# Price change (%) above which demand is High and below minus which it is Low
+DEMAND_THRESHOLD = 5
+
+# Demand level colors
+DEMAND_COLORS = {
+    'High': '#22c55e',    # Green
+    'Medium': '#eab308',  # Yellow
+    'Low': '#ef4444',     # Red
+}
+
+DEMAND_ORDER = {'High': 0, 'Medium': 1, 'Low': 2}
+
+# Demand is measured on the Pettah wholesale price, falling back to Dambulla
+DEMAND_COLUMNS = ('Wholesale_Pettah(RS)', 'Wholesale_Dambulla(RS)')
+
+
+def demand_prices(pettah, dambulla):
+    """Price series demand is measured on: Pettah wholesale, else Dambulla"""
+    pettah = np.asarray(pettah, dtype=np.float64)
+    return np.where(np.isnan(pettah), dambulla, pettah)
+
+
+def forecast_demand_rollups(prices, start, end, codes=None, period=None, date_format='%b %d'):
+    """Classify demand per vegetable from its price change between start and end
+
+    High demand = prices increasing (scarcity), Medium = stable prices,
+    Low demand = prices decreasing (surplus). The change is measured from the
+    first to the last wholesale price (Pettah, falling back to Dambulla) of
+    the dated rows in the range, read from a few pre-aggregated buckets per
+    vegetable instead of the rows.
+
+    start and end are dates or day numbers; codes limits it to some
+    vegetable codes. With period='month' each vegetable is classified
+    separately per month.
+    """
+    rollups = prices.rollups()
+    if 'demand' not in rollups.series:
+        return []
+    if codes is None:
+        codes = np.arange(len(prices.vegetable_names))
+    start_day, end_day = (int(np.asarray(value, dtype='datetime64[D]').astype(np.int64)) for value in (start, end))
+    group_codes, months, stats = rollups.summary(start_day, end_day, codes, by='month' if period == 'month' else 'vegetable')
+
+    series = rollups.series.index('demand')
+    periods = None
+    if period == 'month':
+        periods = np.datetime_as_string(months.astype('datetime64[M]'))
+    return demand_records(
+        prices.vegetable_names[group_codes].astype(str), periods, stats['rows'], stats['count'][:, series],
+        stats['first_day'].astype('datetime64[D]'), stats['last_day'].astype('datetime64[D]'),
+        stats['first'][:, series], stats['last'][:, series], date_format
+    )
+
+
+def demand_records(vegetables, periods, rows, prices, start_dates, end_dates, first_price, last_price,
+                   date_format='%b %d'):
+    """Demand entries from per-group statistics, sorted by period, demand level and vegetable"""
+    import pandas as pd
+    # Need at least two dated rows and two prices to measure a trend
+    keep = (np.asarray(rows) >= 2) & (np.asarray(prices) >= 2)
+    if not keep.any():
+        return []
+    vegetables = np.asarray(vegetables)[keep]
+    start_dates = pd.DatetimeIndex(np.asarray(start_dates)[keep])
+    end_dates = pd.DatetimeIndex(np.asarray(end_dates)[keep])
+    first_price = np.asarray(first_price, dtype=np.float64)[keep]
+    last_price = np.asarray(last_price, dtype=np.float64)[keep]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_change = np.where(first_price > 0, (last_price - first_price) / first_price * 100, 0.0)
+
+    demand_level = np.select(
+        [price_change > DEMAND_THRESHOLD, price_change < -DEMAND_THRESHOLD],
+        ['High', 'Low'],
+        default='Medium'
+    )
+    date_range = start_dates.strftime(date_format) + ' - ' + end_dates.strftime(date_format)
+
+    columns = {}
+    if periods is not None:
+        columns['period'] = np.asarray(periods)[keep].tolist()
+    columns.update({
+        'vegetable': vegetables.tolist(),
+        'demand_level': demand_level.tolist(),
+        'color': [DEMAND_COLORS[level] for level in demand_level],
+        'price_change': np.round(price_change, 1).tolist(),
+        'date_range': date_range.tolist(),
+        'current_price': np.round(last_price, 2).tolist()
+    })
+    keys = list(columns)
+    demand_data = [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+    # Sort by period, then demand level (High, Medium, Low), then vegetable
+    demand_data.sort(key=lambda x: (x.get('period', ''), DEMAND_ORDER[x['demand_level']], x['vegetable']))
+    return demand_data
@@ -0,0 +1,127 @@
+import numpy as np
+
+# Rows evaluated together; bounds the (rows x trees) working arrays
+EVAL_CHUNK_ROWS = 2048
+
+
+class FlatForest:
+    """A fitted random forest stored as contiguous NumPy node arrays
+
+    All trees are concatenated into single feature/threshold/child/value
+    arrays and evaluated level by level for every row and tree at once, with
+    no per-call sklearn validation. Leaves point to themselves, so running
+    max_depth steps lands every row on its leaf.
+
+    threshold_dtype=np.float32 halves the threshold storage; comparisons can
+    then differ from sklearn for inputs within float32 rounding of a split.
+    """
+
+    def __init__(self, forest, threshold_dtype=np.float64, value_dtype=np.float64):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        index_dtype = np.int32 if sizes.sum() < 2 ** 31 else np.int64
+        feature, threshold, left, right = [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            nodes = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left == -1
+            left.append(np.where(is_leaf, nodes, tree.children_left + offset))
+            right.append(np.where(is_leaf, nodes, tree.children_right + offset))
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, 0, tree.threshold))
+
+        self.roots = offsets.astype(index_dtype)
+        self.left = np.concatenate(left).astype(index_dtype)
+        self.right = np.concatenate(right).astype(index_dtype)
+        self.feature = np.concatenate(feature).astype(np.int32)
+        self.threshold = np.concatenate(threshold).astype(threshold_dtype)
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.n_trees = len(trees)
+        self.n_features_in_ = forest.n_features_in_
+        if hasattr(forest, 'feature_names_in_'):
+            self.feature_names_in_ = forest.feature_names_in_
+
+        if hasattr(forest, 'classes_'):
+            if forest.n_outputs_ != 1:
+                raise ValueError("Only single-output classifiers can be flattened")
+            # Class probabilities per node, as DecisionTreeClassifier.predict_proba returns
+            # them: scikit-learn 1.4+ stores fractions and returns them unchanged, earlier
+            # versions store counts (a root holds every sample) and normalize them
+            self.classes_ = forest.classes_
+            value = np.concatenate([tree.value[:, 0, :] for tree in trees])
+            if not np.allclose(value[offsets].sum(axis=1), 1.0):
+                normalizer = value.sum(axis=1)
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer[:, None]
+            self.value = value.astype(value_dtype)
+        else:
+            # Regression leaf values: (nodes, n_outputs)
+            self.value = np.concatenate([tree.value[:, :, 0] for tree in trees]).astype(value_dtype)
+        self.n_outputs_ = self.value.shape[1]
+
+    def apply(self, X):
+        """Leaf node index for every row and tree, shape (n_rows, n_trees)"""
+        # sklearn evaluates splits on float32 inputs
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def node_counts(self, X):
+        """Number of rows of X that pass through every node, summed over trees"""
+        counts = np.zeros(len(self.left), dtype=np.int64)
+        for start in range(0, len(X), EVAL_CHUNK_ROWS):
+            chunk = np.asarray(X[start:start + EVAL_CHUNK_ROWS], dtype=np.float32)
+            rows = np.arange(len(chunk))[:, None]
+            node = np.broadcast_to(self.roots, (len(chunk), self.n_trees)).copy()
+            counts += np.bincount(node.ravel(), minlength=len(counts))
+            for _ in range(self.max_depth):
+                go_left = chunk[rows, self.feature[node]] <= self.threshold[node]
+                child = np.where(go_left, self.left[node], self.right[node])
+                # Leaves point to themselves; count only the rows that moved
+                moved = child != node
+                counts += np.bincount(child[moved], minlength=len(counts))
+                node = child
+        return counts
+
+    def mean_value(self, X):
+        """Mean of the tree leaf values, shape (n_rows, n_outputs or n_classes)"""
+        X = np.asarray(X, dtype=np.float32)
+        out = np.empty((len(X), self.n_outputs_))
+        for start in range(0, len(X), EVAL_CHUNK_ROWS):
+            leaves = self.apply(X[start:start + EVAL_CHUNK_ROWS])
+            total = np.zeros((len(leaves), self.n_outputs_))
+            # Add trees in order, as sklearn does, for identical rounding
+            for t in range(self.n_trees):
+                total += self.value[leaves[:, t]]
+            out[start:start + len(leaves)] = total / self.n_trees
+        return out
+
+    def predict(self, X):
+        """Like RandomForestRegressor.predict, or RandomForestClassifier.predict"""
+        if hasattr(self, 'classes_'):
+            return self.classes_[self.predict_proba(X).argmax(axis=1)]
+        out = self.mean_value(X)
+        return out[:, 0] if self.n_outputs_ == 1 else out
+
+    def predict_proba(self, X):
+        """Class probabilities, like RandomForestClassifier.predict_proba"""
+        return self.mean_value(X)
+
+    def top_k(self, X, k=3):
+        """Indices into classes_ and probabilities of the k most likely classes
+
+        Both arrays have shape (n_rows, k), most likely first, ordered as
+        probabilities.argsort()[-k:][::-1] orders each row.
+        """
+        proba = self.predict_proba(X)
+        indices = proba.argsort(axis=1)[:, -k:][:, ::-1]
+        return indices, np.take_along_axis(proba, indices, axis=1)
+
+    def nbytes(self):
+        """Memory used by the node arrays"""
+        return sum(a.nbytes for a in (self.roots, self.left, self.right, self.feature, self.threshold, self.value))
@@ -0,0 +1,153 @@
+import contextlib
+import os
+import threading
+import time
+
+# METRICS_ENABLED=0 turns instrumentation off; timed() is then a shared no-op
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no', 'off')
+
+# Histogram bucket upper bounds, in seconds
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NOOP = contextlib.nullcontext()
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """Request and stage histograms plus counters, keyed by label values"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.count, h.sum, h.buckets) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), (counts, count, total, buckets) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+# Process-wide metrics and the timings of the request handled by this thread
+metrics = MetricsRegistry()
+_request = threading.local()
+
+
+class _StageTimer:
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        timings = getattr(_request, 'timings', None)
+        endpoint = getattr(_request, 'endpoint', None) or 'background'
+        if timings is not None:
+            timings[self.stage] = timings.get(self.stage, 0.0) + elapsed
+        metrics.observe('smartagro_stage_duration_seconds', {'endpoint': endpoint, 'stage': self.stage}, elapsed)
+        return False
+
+
+def timed(stage):
+    """Context manager timing one stage (data_load, filter, model_load, features, predict, serialize)
+
+    The time is added to the current request's Server-Timing entry and to
+    the per-endpoint stage histogram.
+    """
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _StageTimer(stage)
+
+
+def start_request(endpoint):
+    """Begin collecting stage timings for the request on this thread"""
+    _request.endpoint = endpoint
+    _request.timings = {}
+    _request.start = time.perf_counter()
+
+
+def finish_request(method, status):
+    """Record the request and return (total seconds, {stage: seconds})"""
+    timings = getattr(_request, 'timings', None)
+    if timings is None:
+        return None, {}
+    total = time.perf_counter() - _request.start
+    labels = {'endpoint': _request.endpoint, 'method': method, 'status': str(status)}
+    metrics.observe('smartagro_request_duration_seconds', labels, total)
+    metrics.increment('smartagro_requests_total', labels)
+    _request.timings = None
+    _request.endpoint = None
+    return total, timings
+
+
+def server_timing(total, timings):
+    """Server-Timing header value, durations in milliseconds"""
+    entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(entries)
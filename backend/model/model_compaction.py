@@ -0,0 +1,218 @@
+"""Fit lighter variants of the price and crop forests and report size vs accuracy
+
+Each variant overrides some forest hyperparameters (fewer trees, a depth cap,
+a minimum leaf size) and can be stored as sklearn estimators or as flattened
+node arrays (FlatForest, optionally with float32 thresholds and values). For
+every variant the report lists pickle size, load time, per-row latency and
+MAE (price) or accuracy (crop). The smallest variant that meets the accuracy
+floor is selected and, with --export, published in place of the current model.
+
+    python model_compaction.py price --max-mae-increase 0.05 --output report.json
+    python model_compaction.py crop --min-accuracy 0.97 --export
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import joblib
+import numpy as np
+from flat_forest import FlatForest
+
+# Representations a fitted variant can be stored in
+SKLEARN = 'sklearn'
+FLAT = 'flat'
+FLAT32 = 'flat32'
+
+# Hyperparameter overrides tried by default ('current' is the production model)
+DEFAULT_VARIANTS = [
+    ('current', {}),
+    ('trees50', {'n_estimators': 50}),
+    ('trees50_depth14', {'n_estimators': 50, 'max_depth': 14}),
+    ('trees30_depth12_leaf2', {'n_estimators': 30, 'max_depth': 12, 'min_samples_leaf': 2}),
+    ('trees20_depth10_leaf4', {'n_estimators': 20, 'max_depth': 10, 'min_samples_leaf': 4}),
+]
+
+# Rows timed one at a time for the per-row latency
+LATENCY_ROWS = 200
+
+
+def flatten(forest, representation):
+    """Store a fitted forest in the given representation"""
+    if representation == FLAT:
+        return FlatForest(forest)
+    if representation == FLAT32:
+        return FlatForest(forest, threshold_dtype=np.float32, value_dtype=np.float32)
+    return forest
+
+
+def pickle_stats(value):
+    """Pickle size in bytes and load time in seconds"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.pkl')
+        joblib.dump(value, path)
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        joblib.load(path)
+        return size, time.perf_counter() - start
+
+
+def per_row_latency(predict, X):
+    """Median seconds to predict a single row"""
+    samples = []
+    for i in range(min(LATENCY_ROWS, len(X))):
+        row = X[i:i + 1]
+        start = time.perf_counter()
+        predict(row)
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+
+def price_variants(variants, representations):
+    """Fit and measure every price model variant"""
+    from sklearn.model_selection import train_test_split
+    from aiprediction_model import prepare_data, fit_price_models, predict_targets, PER_TARGET
+
+    X, y, le, feature_columns, target_columns = prepare_data()
+    if X is None:
+        raise RuntimeError("Could not prepare the price data")
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_rows = X_test.to_numpy()
+
+    results = []
+    for name, params in variants:
+        fitted = fit_price_models(X_train, y_train, target_columns, PER_TARGET, params)
+        for representation in representations:
+            models = {target: flatten(model, representation) for target, model in fitted.items()}
+            # sklearn gets the DataFrame it was fitted on, FlatForest raw rows
+            features = X_test if representation == SKLEARN else X_rows
+            pred = predict_targets(models, features, target_columns)
+            mae = np.abs(pred - y_test[target_columns].to_numpy()).mean(axis=0)
+            size, load_seconds = pickle_stats(models)
+            results.append({
+                'variant': name,
+                'representation': representation,
+                'params': params,
+                'pickle_bytes': size,
+                'load_seconds': load_seconds,
+                'row_seconds': per_row_latency(
+                    lambda rows: predict_targets(models, rows, target_columns),
+                    features),
+                'mae': float(mae.mean()),
+                'mae_by_target': dict(zip(target_columns, mae.tolist())),
+                'artifact': (models, le, feature_columns, target_columns)
+            })
+    return results
+
+
+def crop_variants(variants, representations):
+    """Fit and measure every crop model variant"""
+    from crop_model import load_crop_data, fit_crop_model
+
+    X_train, X_test, y_train, y_test = load_crop_data()
+    X_rows = X_test.to_numpy()
+
+    results = []
+    for name, params in variants:
+        fitted = fit_crop_model(X_train, y_train, params)
+        for representation in representations:
+            model = flatten(fitted, representation)
+            features = X_test if representation == SKLEARN else X_rows
+            size, load_seconds = pickle_stats(model)
+            results.append({
+                'variant': name,
+                'representation': representation,
+                'params': params,
+                'pickle_bytes': size,
+                'load_seconds': load_seconds,
+                'row_seconds': per_row_latency(model.predict_proba, features),
+                'accuracy': float((model.predict(features) == y_test.to_numpy()).mean()),
+                'artifact': model
+            })
+    return results
+
+
+def select_variant(results, model_name, max_mae_increase=0.05, min_accuracy=None):
+    """Smallest variant meeting the accuracy floor, or None
+
+    Price variants may be at most max_mae_increase (a fraction) worse in MAE
+    than the current sklearn model; crop variants need min_accuracy, by
+    default the accuracy of the current model.
+    """
+    reference = next(r for r in results if r['variant'] == 'current' and r['representation'] == SKLEARN)
+    if model_name == 'price':
+        floor = reference['mae'] * (1 + max_mae_increase)
+        passing = [r for r in results if r['mae'] <= floor]
+    else:
+        floor = reference['accuracy'] if min_accuracy is None else min_accuracy
+        passing = [r for r in results if r['accuracy'] >= floor]
+    return min(passing, key=lambda r: r['pickle_bytes']) if passing else None
+
+
+def export_variant(model_name, result):
+    """Publish a variant in place of the current model"""
+    if model_name == 'price':
+        from aiprediction_model import save_price_models
+        models, le, feature_columns, target_columns = result['artifact']
+        save_price_models(models, le, feature_columns, target_columns)
+    else:
+        from crop_model import MODEL_PATH
+        from model_registry import atomic_dump
+        atomic_dump(result['artifact'], MODEL_PATH)
+        print(f"Model saved to {MODEL_PATH}")
+
+
+def print_report(model_name, results, selected):
+    metric = 'mae' if model_name == 'price' else 'accuracy'
+    print(f"{'variant':<24}{'repr':<9}{'pickle MB':>10}{'load ms':>9}{'row ms':>8}{metric:>10}")
+    for r in results:
+        marker = '  <- selected' if r is selected else ''
+        print(f"{r['variant']:<24}{r['representation']:<9}{r['pickle_bytes'] / 1e6:>10.2f}"
+              f"{r['load_seconds'] * 1000:>9.1f}{r['row_seconds'] * 1000:>8.3f}{r[metric]:>10.4f}{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('model', choices=['price', 'crop'])
+    parser.add_argument('--representations', default=','.join([SKLEARN, FLAT, FLAT32]),
+                        help='Comma-separated representations to try (sklearn, flat, flat32)')
+    parser.add_argument('--max-mae-increase', type=float, default=0.05,
+                        help='Allowed price MAE increase over the current model, as a fraction (default 0.05)')
+    parser.add_argument('--min-accuracy', type=float, default=None,
+                        help='Required crop accuracy (default: the current model\'s accuracy)')
+    parser.add_argument('--output', help='Write the report as JSON to this file')
+    parser.add_argument('--export', action='store_true', help='Publish the selected variant')
+    args = parser.parse_args()
+
+    representations = args.representations.split(',')
+    if SKLEARN not in representations:
+        representations.insert(0, SKLEARN)
+
+    if args.model == 'price':
+        results = price_variants(DEFAULT_VARIANTS, representations)
+    else:
+        results = crop_variants(DEFAULT_VARIANTS, representations)
+
+    selected = select_variant(results, args.model, args.max_mae_increase, args.min_accuracy)
+    print_report(args.model, results, selected)
+
+    if args.output:
+        report = {
+            'model': args.model,
+            'selected': None if selected is None else [selected['variant'], selected['representation']],
+            'variants': [{k: v for k, v in r.items() if k != 'artifact'} for r in results]
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output}")
+
+    if selected is None:
+        print("No variant meets the accuracy floor")
+        sys.exit(1)
+    if args.export:
+        export_variant(args.model, selected)
+
+
+if __name__ == "__main__":
+    main()
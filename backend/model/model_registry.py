@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import json
+import os
+from metrics import timed
+
+
+class ModelArtifact:
+    """A loaded model plus the file signature it was loaded from"""
+
+    def __init__(self, name, value, signature):
+        self.name = name
+        self.value = value
+        self.signature = signature
+        # Short, stable identifier of the files on disk (used in cache keys)
+        self.version = hashlib.sha1(repr(signature).encode()).hexdigest()[:12]
+
+
+class ModelRegistry:
+    """Keeps each model artifact resident and swaps it when the files change"""
+
+    def __init__(self):
+        self._entries = {}
+        self._artifacts = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, paths, loader):
+        """Register an artifact made of one or more files
+
+        paths maps a role (e.g. 'models', 'encoder') to a file path and
+        loader(paths) builds the in-memory value from those files.
+        """
+        with self._lock:
+            self._entries[name] = (dict(paths), loader, threading.Lock())
+
+    def paths(self, name):
+        """File paths registered for an artifact"""
+        return dict(self._entries[name][0])
+
+    def is_available(self, name):
+        """Check whether every file of an artifact exists on disk"""
+        return self._signature(name) is not None
+
+    def get(self, name):
+        """Loaded artifact, or None if its files are missing
+
+        The files are stat'ed on every call; when they changed, the new
+        version is loaded and swapped in while callers holding the previous
+        artifact keep using it.
+        """
+        signature = self._signature(name)
+        if signature is None:
+            return self._artifacts.get(name)
+
+        artifact = self._artifacts.get(name)
+        if artifact is not None and artifact.signature == signature:
+            return artifact
+
+        paths, loader, load_lock = self._entries[name]
+        with load_lock:
+            artifact = self._artifacts.get(name)
+            if artifact is not None and artifact.signature == signature:
+                return artifact
+            try:
+                with timed('model_load'):
+                    value = loader(paths)
+            except Exception as e:
+                # Keep serving the previous version if the new files can't be read
+                print(f"Error loading {name} model: {str(e)}")
+                return artifact
+            artifact = ModelArtifact(name, value, signature)
+            self._artifacts[name] = artifact
+            return artifact
+
+    def version(self, name):
+        """Version of the loaded artifact, or None"""
+        artifact = self.get(name)
+        return artifact.version if artifact else None
+
+    def _signature(self, name):
+        paths = self._entries[name][0]
+        signature = []
+        for role, path in sorted(paths.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            signature.append((role, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+
+def atomic_dump(value, path):
+    """joblib.dump to a temporary file, then rename it over path
+
+    Readers see either the old file or the complete new one, never a
+    partially written pickle.
+    """
+    import joblib
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        joblib.dump(value, tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def atomic_write_json(value, path):
+    """Write JSON to a temporary file, then rename it over path"""
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(value, f, indent=2)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# Process-wide registry shared by the model modules
+registry = ModelRegistry()
@@ -0,0 +1,180 @@
+from collections import OrderedDict
+from datetime import date, timedelta
+import numpy as np
+import threading
+import os
+from model_registry import registry
+from aiprediction_model import MAX_BATCH_ROWS, predict_prices_batch
+from price_features import encode_vegetables
+from crop_model import predict_crop
+
+# Maximum number of cached predictions per model
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 50000))
+
+# Largest batch (days x vegetables) read from and written to the price cache;
+# bigger grids are predicted directly so they don't evict the hot entries
+PREDICTION_CACHE_MAX_GRID = int(os.environ.get('PREDICTION_CACHE_MAX_GRID', 1000))
+
+
+class LRUCache:
+    """Thread-safe, size-bounded cache that evicts the least recently used entry"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return (True, value) on a hit, (False, None) on a miss"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+price_cache = LRUCache(PREDICTION_CACHE_SIZE)
+crop_cache = LRUCache(PREDICTION_CACHE_SIZE)
+
+
+def _price_key(version, day, vegetable_code):
+    # The encoded vegetable is what the model sees, so names mapping to the
+    # same code (e.g. every unknown vegetable) share an entry
+    return version, str(day), int(vegetable_code)
+
+
+def predict_prices_batch_cached(start_date, end_date, vegetable_names):
+    """predict_prices_batch that answers from the cache when every cell is cached
+
+    Grids larger than PREDICTION_CACHE_MAX_GRID cells bypass the cache.
+    """
+    artifact = registry.get('price')
+    if artifact is None:
+        return predict_prices_batch(start_date, end_date, vegetable_names)
+
+    bundle = artifact.value
+    target_columns = bundle['target_columns']
+    vegetable_names = list(vegetable_names)
+    start = np.datetime64(start_date, 'D')
+    end = np.datetime64(end_date, 'D')
+    dates = np.arange(start, end + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+    if len(dates) * len(vegetable_names) > MAX_BATCH_ROWS:
+        # predict_prices_batch refuses it too; check before allocating the grid
+        return None
+    if len(dates) * len(vegetable_names) > PREDICTION_CACHE_MAX_GRID:
+        return predict_prices_batch(start_date, end_date, vegetable_names, bundle=bundle)
+    codes = encode_vegetables(bundle['encoder'], vegetable_names)
+
+    # Serve the whole grid from the cache if every cell is present; every
+    # cell is looked up so the hit/miss counts cover the whole grid
+    prices = np.empty((len(dates), len(vegetable_names), len(target_columns)))
+    complete = len(dates) > 0 and len(vegetable_names) > 0
+    for i, day in enumerate(dates):
+        for j, code in enumerate(codes):
+            found, value = price_cache.get(_price_key(artifact.version, day, code))
+            if found:
+                prices[i, j] = [value[target] for target in target_columns]
+            else:
+                complete = False
+
+    if complete:
+        return {
+            'dates': [str(d) for d in dates],
+            'vegetables': vegetable_names,
+            'targets': list(target_columns),
+            'prices': prices
+        }
+
+    # Otherwise predict the grid in one pass and cache every cell
+    result = predict_prices_batch(start_date, end_date, vegetable_names, bundle=bundle)
+    if result is not None:
+        _store_price_grid(artifact.version, dates, codes, target_columns, result['prices'])
+    return result
+
+
+def _store_price_grid(version, dates, codes, target_columns, prices):
+    for i, day in enumerate(dates):
+        for j, code in enumerate(codes):
+            price_cache.put(
+                _price_key(version, day, code),
+                {target: float(prices[i, j, k]) for k, target in enumerate(target_columns)}
+            )
+
+
+def predict_crop_cached(N, P, K, temperature, humidity, ph, rainfall):
+    """predict_crop with the result cached per model version and inputs"""
+    artifact = registry.get('crop')
+    if artifact is None:
+        return predict_crop(N, P, K, temperature, humidity, ph, rainfall)
+
+    inputs = tuple(float(value) for value in (N, P, K, temperature, humidity, ph, rainfall))
+    key = (artifact.version, inputs)
+    found, value = crop_cache.get(key)
+    if found:
+        prediction, recommendations = value
+        return prediction, [dict(r) for r in recommendations]
+
+    prediction, recommendations = predict_crop(*inputs)
+    if prediction is not None:
+        crop_cache.put(key, (prediction, [dict(r) for r in recommendations]))
+    return prediction, recommendations
+
+
+def warm_up(days=7, start=None):
+    """Precompute prices for the next `days` days for every known vegetable"""
+    artifact = registry.get('price')
+    if artifact is None or days <= 0:
+        return 0
+
+    bundle = artifact.value
+    vegetable_names = [str(name) for name in bundle['encoder'].classes_]
+    start = start or date.today()
+    end = start + timedelta(days=days - 1)
+
+    result = predict_prices_batch(start.isoformat(), end.isoformat(), vegetable_names, bundle=bundle)
+    if result is None:
+        return 0
+
+    dates = np.array(result['dates'], dtype='datetime64[D]')
+    codes = encode_vegetables(bundle['encoder'], vegetable_names)
+    _store_price_grid(artifact.version, dates, codes, result['targets'], result['prices'])
+    return len(dates) * len(vegetable_names)
+
+
+def cache_stats():
+    """Hit/miss counters for both prediction caches"""
+    return {
+        'price': price_cache.stats(),
+        'crop': crop_cache.stats()
+    }
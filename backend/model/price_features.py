@@ -0,0 +1,65 @@
+"""Price model features, shared by training and inference
+
+Dates and vegetable codes become a float32 matrix in one vectorized pass
+(the precision the forests split on anyway), so the rows a model is
+trained on and the rows it predicts are built by the same code.
+"""
+import numpy as np
+
+# Feature columns, in model order
+FEATURE_COLUMNS = ['year', 'month', 'day', 'day_of_week', 'day_of_year', 'vegetable_encoded']
+
+# Bump when the features change; saved in the model schema. Version 1 (pandas
+# .dt accessors, int64) has the same values, so its models are still served.
+FEATURE_VERSION = 2
+SUPPORTED_FEATURE_VERSIONS = (1, 2)
+
+
+def date_parts(dates):
+    """Calendar features of datetime64 dates, as int64 arrays"""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    years = dates.astype('datetime64[Y]')
+    months = dates.astype('datetime64[M]')
+    return {
+        'year': years.astype(np.int64) + 1970,
+        'month': (months - years).astype(np.int64) + 1,
+        'day': (dates - months).astype(np.int64) + 1,
+        # 1970-01-01 was a Thursday; Monday is 0 like pandas' dayofweek
+        'day_of_week': (dates.astype(np.int64) + 3) % 7,
+        'day_of_year': (dates - years).astype(np.int64) + 1,
+    }
+
+
+def vegetable_codes(classes, vegetable_names):
+    """LabelEncoder codes of vegetable names and a mask of the known ones
+
+    classes is the encoder's sorted classes_; unknown names get code -1.
+    """
+    classes = np.asarray(classes, dtype=object)
+    names = np.asarray(vegetable_names, dtype=object)
+    if len(classes) == 0:
+        return np.full(len(names), -1, dtype=np.int64), np.zeros(len(names), dtype=bool)
+    positions = np.minimum(np.searchsorted(classes, names), len(classes) - 1)
+    known = classes[positions] == names
+    return np.where(known, positions, -1).astype(np.int64), known
+
+
+def encode_vegetables(le, vegetable_names):
+    """Encode vegetable names for prediction, using the middle code for unknown ones
+
+    Training rows for vegetables an encoder does not know are dropped instead
+    (see vegetable_codes).
+    """
+    codes, known = vegetable_codes(le.classes_, vegetable_names)
+    codes[~known] = len(le.classes_) // 2
+    return codes
+
+
+def build_features(dates, codes, feature_columns=FEATURE_COLUMNS):
+    """(n_rows, n_features) float32 matrix for dates and encoded vegetables"""
+    values = date_parts(dates)
+    values['vegetable_encoded'] = np.asarray(codes)
+    features = np.empty((len(values['year']), len(feature_columns)), dtype=np.float32)
+    for i, column in enumerate(feature_columns):
+        features[:, i] = values[column]
+    return features
@@ -0,0 +1,240 @@
+"""Daily price ingestion with warm-start model updates
+
+New rows (in the crop_price1.xlsx layout) are appended to the price store,
+which merges them into its indexes and keeps them in the updates file.
+The price forests are then extended with trees fitted on the most recent
+days (scikit-learn's warm_start) instead of being refitted; a full
+retrain runs on a schedule, or when the update would leave the models
+out of step with the data (a new vegetable or market).
+
+    python price_ingest.py prices-2025-09-01.csv
+    python price_ingest.py prices-2025-09-01.xlsx --full
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from aiprediction_model import (
+    LONG, MULTI_OUTPUT, ENCODER_PATH, MODELS_PATH, TRAINING_LOCK_PATH, UPDATE_STATE_PATH,
+    date_label, load_price_bundle, prepare_data, save_price_models, to_long_format, train_price_model
+)
+from price_store import get_price_store, parse_price_column
+from training_jobs import training_jobs
+
+# Days of recent data the new trees are fitted on
+UPDATE_WINDOW_DAYS = int(os.environ.get('PRICE_UPDATE_WINDOW_DAYS', 30))
+
+# Trees added to each forest per update
+UPDATE_TREES = int(os.environ.get('PRICE_UPDATE_TREES', 10))
+
+# Full retrain once the last one is this old, or the forests have grown this much
+FULL_RETRAIN_DAYS = int(os.environ.get('PRICE_FULL_RETRAIN_DAYS', 7))
+MAX_TREE_GROWTH = float(os.environ.get('PRICE_MAX_TREE_GROWTH', 2.0))
+
+REQUIRED_COLUMNS = ['Year', 'Month', 'date', 'vegetable name']
+
+# Accepted range of each date column
+DATE_RANGES = {'Year': (1900, 2100), 'Month': (1, 12), 'date': (1, 31)}
+
+
+class RowErrors(ValueError):
+    """Rows that failed validation; errors lists {'row', 'errors'} per bad row"""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid rows, nothing was added")
+        self.errors = errors
+
+
+def load_state():
+    if not os.path.exists(UPDATE_STATE_PATH):
+        return None
+    with open(UPDATE_STATE_PATH) as f:
+        return json.load(f)
+
+
+def read_rows(file):
+    """Rows from a CSV or Excel file in the workbook layout"""
+    import pandas as pd
+    name = getattr(file, 'filename', None) or getattr(file, 'name', None) or str(file)
+    if str(name).lower().endswith(('.xlsx', '.xls')):
+        return pd.read_excel(file)
+    return pd.read_csv(file)
+
+
+def blank(values):
+    """Missing or whitespace-only cells"""
+    return values.isna() | values.astype(str).str.strip().eq('')
+
+
+def check_rows(df):
+    """Validate rows in the workbook layout; returns them with integer date columns
+
+    Raises ValueError unless df has the workbook's key columns and a price
+    column, and RowErrors (rows numbered from 1) unless every row has a
+    whole Year, Month and date forming a calendar date, a vegetable name,
+    and prices that are non-negative numbers or empty.
+    """
+    import pandas as pd
+    df = df.rename(columns=lambda column: str(column).strip())
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    price_columns = [column for column in df.columns if parse_price_column(column)]
+    if not price_columns:
+        raise ValueError("No price columns, e.g. Wholesale_Pettah(RS)")
+
+    problems = [[] for _ in range(len(df))]
+
+    def flag(bad, message):
+        for i in np.flatnonzero(np.asarray(bad)):
+            problems[i].append(message)
+
+    dates = {}
+    for column, (low, high) in DATE_RANGES.items():
+        values = pd.to_numeric(df[column], errors='coerce')
+        bad = values.isna() | (values % 1 != 0) | (values < low) | (values > high)
+        flag(bad, f"{column} must be a whole number from {low} to {high}")
+        dates[column] = values.where(~bad)
+    calendar = pd.to_datetime({'year': dates['Year'], 'month': dates['Month'], 'day': dates['date']},
+                              errors='coerce')
+    flag(calendar.isna() & pd.DataFrame(dates).notna().all(axis=1), "Year, Month and date are not a calendar date")
+
+    flag(blank(df['vegetable name']), "vegetable name is required")
+
+    for column in price_columns:
+        prices = pd.to_numeric(df[column], errors='coerce')
+        bad = ~blank(df[column]) & ~(np.isfinite(prices) & (prices >= 0))
+        flag(bad, f"{column} must be a non-negative number or empty")
+
+    errors = [{'row': i + 1, 'errors': messages} for i, messages in enumerate(problems) if messages]
+    if errors:
+        raise RowErrors(errors)
+    return df.assign(**{column: dates[column].astype(np.int64) for column in DATE_RANGES})
+
+
+def ingest(df):
+    """Validate rows and append them to the price store; returns (snapshot, rows added)
+
+    Nothing is added if any row is invalid (see check_rows).
+    """
+    return get_price_store().append(check_rows(df))
+
+
+def full_retrain_due(state, bundle, prices):
+    """Reason a full retrain is needed instead of an update, or None"""
+    import pandas as pd
+    from sklearn.ensemble import RandomForestRegressor
+    if state is None or bundle is None:
+        return "no models to update"
+    # Compacted exports (e.g. FlatForest) can't grow more trees
+    kinds = {type(model).__name__ for model in bundle['models'].values()
+             if not isinstance(model, RandomForestRegressor)}
+    if kinds:
+        return f"{', '.join(sorted(kinds))} models can't be extended with warm_start"
+    age = datetime.now() - datetime.fromisoformat(state['full_retrain_at'])
+    if age > timedelta(days=FULL_RETRAIN_DAYS):
+        return f"last full retrain {age.days} days ago"
+    if state['trees'] >= state['base_trees'] * MAX_TREE_GROWTH:
+        return "forests have grown too large"
+    if set(prices.vegetable_names) - set(bundle['encoder'].classes_):
+        return "new vegetables"
+    if any(column not in bundle['target_columns'] and pd.notna(prices.prices[column]).any()
+           for column in prices.price_columns):
+        return "new price columns"
+    return None
+
+
+def warm_start(bundle, prices, state, days=UPDATE_WINDOW_DAYS, trees=UPDATE_TREES):
+    """Add `trees` trees fitted on the last `days` days to every price forest
+
+    Returns the update state saved with the models, or None if there were
+    no rows to fit.
+    """
+    models, le, mode = bundle['models'], bundle['encoder'], bundle['mode']
+    target_columns = bundle['target_columns']
+    latest = prices.latest_date()
+    start = datetime(*latest) - timedelta(days=days - 1)
+
+    X, y, _, feature_columns, _ = prepare_data(prices, mode, le, start.date(), target_columns)
+    if X is None or len(X) == 0:
+        return None
+
+    if mode == LONG:
+        X, y = to_long_format(X, y, target_columns)
+        fits = {LONG: y}
+    elif mode == MULTI_OUTPUT:
+        fits = {MULTI_OUTPUT: y[target_columns]}
+    else:
+        fits = {target: y[target] for target in target_columns}
+
+    for key, targets in fits.items():
+        model = models[key]
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + trees)
+        model.fit(X, targets)
+        model.set_params(warm_start=False)
+
+    state = {
+        **state,
+        'trees': model.n_estimators,
+        'updates': state['updates'] + 1,
+        'updated_at': datetime.now().isoformat(timespec='seconds'),
+        'data_through': date_label(latest)
+    }
+    save_price_models(models, le, feature_columns, target_columns, mode, state)
+    return state
+
+
+def update_price_models(full=False):
+    """Extend the price models with recent data, or retrain them when due
+
+    Returns (state, 'updated' or 'retrained'), or (None, None) if training
+    failed.
+    """
+    prices = get_price_store().snapshot()
+    state = load_state()
+    bundle = None
+    if os.path.exists(MODELS_PATH) and os.path.exists(ENCODER_PATH):
+        bundle = load_price_bundle({'models': MODELS_PATH, 'encoder': ENCODER_PATH})
+
+    reason = "requested" if full else full_retrain_due(state, bundle, prices)
+    if reason is None:
+        updated = warm_start(bundle, prices, state)
+        if updated is not None:
+            print(f"Price models extended to {updated['trees']} trees")
+            return updated, 'updated'
+        reason = "no recent rows for the current models"
+
+    print(f"Retraining the price models: {reason}")
+    # save_price_models records the retrain in the update state
+    if train_price_model()[0] is None:
+        return None, None
+    return load_state(), 'retrained'
+
+
+training_jobs.register('price_update', update_price_models, TRAINING_LOCK_PATH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*', help='CSV or Excel files with new rows in the workbook layout')
+    parser.add_argument('--full', action='store_true', help='Retrain from scratch instead of extending the models')
+    parser.add_argument('--no-update', action='store_true', help='Only ingest the rows')
+    args = parser.parse_args()
+
+    for path in args.files:
+        try:
+            snapshot, added = ingest(read_rows(path))
+        except RowErrors as e:
+            details = '; '.join(f"row {error['row']}: {', '.join(error['errors'])}" for error in e.errors)
+            parser.exit(1, f"{path}: {e} ({details})\n")
+        print(f"{path}: {added} rows added, data through {date_label(snapshot.latest_date())}")
+
+    if not args.no_update:
+        update_price_models(full=args.full)
+
+
+if __name__ == "__main__":
+    main()
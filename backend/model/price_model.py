@@ -1,23 +1,17 @@
-import pandas as pd
-import numpy as np
+import os
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import mean_absolute_error
 import joblib
 
-# Load dataset
-df = pd.read_excel("../data/crop_price1.xlsx")
+from aiprediction_model import prepare_data
+from price_features import FEATURE_VERSION
 
-# Encode vegetable type
-le = LabelEncoder()
-df["vegetable_type_encoded"] = le.fit_transform(df["vegetable_type"])
+# Load dataset with the shared features (year, month, day, day_of_week, day_of_year, vegetable_encoded)
+X, y, le, feature_columns, target_columns = prepare_data()
 
 # Features & Target
-X = df[
-    ["year", "month", "date", "vegetable_type_encoded"]
-]
-y = df["wholesale_dambulla_price"]  # You can change target
+y = y["Wholesale_Dambulla(RS)"]  # You can change target
 
 # Train-test split
 X_train, X_test, y_train, y_test = train_test_split(
@@ -37,8 +31,12 @@ predictions = model.predict(X_test)
 mae = mean_absolute_error(y_test, predictions)
 print("Model MAE:", mae)
 
-# Save model & encoder
-joblib.dump(model, "vegetable_price_model.pkl")
-joblib.dump(le, "vegetable_encoder.pkl")
+# Save model with its encoder and feature version (vegetable_encoder.pkl belongs to the served models)
+joblib.dump({
+    "model": model,
+    "encoder": le,
+    "feature_columns": feature_columns,
+    "feature_version": FEATURE_VERSION
+}, os.path.join(os.path.dirname(__file__), "vegetable_price_model.pkl"))
 
 print("✅ Model trained and saved successfully")
@@ -0,0 +1,330 @@
+"""Pre-aggregated prices per vegetable and day, week, month and year
+
+Every bucket (one vegetable in one period) holds, for each price column and
+the demand price, the number of prices, their sum, min and max, and the
+first and last price with their dates, plus the number of dated rows and
+the first and last row date. Buckets are stored as NumPy arrays sorted by
+(vegetable code, period), one table per granularity.
+
+Buckets combine without the rows: sums and counts add, min and max combine, and the
+first/last price is the one with the earliest/latest date (ties go to the
+earlier row, like a stable sort by date). So a span of any length is
+answered from a handful of buckets (whole years, then months, then days at
+the edges), and appended rows are merged into the buckets they touch
+instead of rebuilding the tables.
+"""
+import numpy as np
+from demand_forecast import DEMAND_COLUMNS, demand_prices
+
+GRANULARITIES = ('day', 'week', 'month', 'year')
+
+# Extra series next to the price columns: the price demand is measured on
+DEMAND_SERIES = 'demand'
+
+_FIRST = np.iinfo(np.int32).max
+_LAST = np.iinfo(np.int32).min
+_PERIOD_OFFSET = 1 << 31
+
+
+def period_index(days, granularity):
+    """Period of each day (days since 1970-01-01) at a granularity"""
+    days = np.asarray(days, dtype=np.int64)
+    if granularity == 'day':
+        return days
+    if granularity == 'week':
+        # Weeks start on Monday; 1970-01-01 was a Thursday
+        return (days + 3) // 7
+    unit = 'datetime64[M]' if granularity == 'month' else 'datetime64[Y]'
+    return days.astype('datetime64[D]').astype(unit).astype(np.int64)
+
+
+def period_bounds(periods, granularity):
+    """First and last day (days since 1970-01-01) of each period"""
+    periods = np.asarray(periods, dtype=np.int64)
+    if granularity == 'day':
+        return periods, periods
+    if granularity == 'week':
+        return periods * 7 - 3, periods * 7 + 3
+    unit = 'datetime64[M]' if granularity == 'month' else 'datetime64[Y]'
+    starts = periods.astype(unit)
+    return (starts.astype('datetime64[D]').astype(np.int64),
+            (starts + 1).astype('datetime64[D]').astype(np.int64) - 1)
+
+
+def period_labels(periods, granularity):
+    """YYYY-MM-DD for days and weeks (their Monday), YYYY-MM for months, YYYY for years"""
+    if granularity in ('day', 'week'):
+        return np.datetime_as_string(period_bounds(periods, granularity)[0].astype('datetime64[D]')).tolist()
+    unit = 'datetime64[M]' if granularity == 'month' else 'datetime64[Y]'
+    return np.datetime_as_string(np.asarray(periods, dtype=np.int64).astype(unit)).tolist()
+
+
+def _keys(codes, periods):
+    return (np.asarray(codes, dtype=np.int64) << 32) + (np.asarray(periods, dtype=np.int64) + _PERIOD_OFFSET)
+
+
+def _split_keys(keys):
+    return keys >> 32, (keys & 0xFFFFFFFF) - _PERIOD_OFFSET
+
+
+def aggregate(days, codes, values, granularity):
+    """Bucket table for rows ordered by (vegetable code, date, row position)
+
+    days are days since 1970-01-01, values an (n_rows, n_series) array
+    with NaN for missing prices.
+    """
+    n, n_series = values.shape
+    keys = _keys(codes, period_index(days, granularity))
+    if n == 0:
+        return _empty(n_series)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], n]
+
+    known = ~np.isnan(values)
+    positions = np.arange(n)[:, None]
+    first = np.minimum.reduceat(np.where(known, positions, n), starts)
+    last = np.maximum.reduceat(np.where(known, positions, -1), starts)
+    has_first, has_last = first < n, last >= 0
+    first, last = np.minimum(first, n - 1), np.maximum(last, 0)
+    series = np.arange(n_series)
+
+    return {
+        'key': keys[starts],
+        'rows': (ends - starts).astype(np.int32),
+        'first_day': days[starts].astype(np.int32),
+        'last_day': days[ends - 1].astype(np.int32),
+        'count': np.add.reduceat(known.astype(np.int32), starts, axis=0),
+        'sum': np.add.reduceat(np.where(known, values, 0.0), starts, axis=0),
+        'min': np.fmin.reduceat(values, starts, axis=0),
+        'max': np.fmax.reduceat(values, starts, axis=0),
+        'first': np.where(has_first, values[first, series], np.nan),
+        'last': np.where(has_last, values[last, series], np.nan),
+        'first_price_day': np.where(has_first, days[first], _FIRST).astype(np.int32),
+        'last_price_day': np.where(has_last, days[last], _LAST).astype(np.int32),
+    }
+
+
+def _empty(n_series):
+    return {
+        'key': np.empty(0, dtype=np.int64),
+        **{name: np.empty(0, dtype=np.int32) for name in ('rows', 'first_day', 'last_day')},
+        'count': np.empty((0, n_series), dtype=np.int32),
+        **{name: np.empty((0, n_series)) for name in ('sum', 'min', 'max', 'first', 'last')},
+        **{name: np.empty((0, n_series), dtype=np.int32) for name in ('first_price_day', 'last_price_day')},
+    }
+
+
+def _take(table, index):
+    return {name: values[index] for name, values in table.items()}
+
+
+def _concat(tables):
+    return {name: np.concatenate([table[name] for table in tables]) for name in tables[0]}
+
+
+def reduce_buckets(table, groups):
+    """Merge the buckets of a table by group id; returns (group ids, merged table)
+
+    Buckets are taken in table order, so of two buckets with the same first
+    (last) price date the earlier (later) one supplies the first (last) price.
+    """
+    order = np.argsort(groups, kind='stable')
+    groups = np.asarray(groups)[order]
+    table = _take(table, order)
+    m = len(groups)
+    if m == 0:
+        return groups, table
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    ends = np.r_[starts[1:], m]
+
+    merged = {
+        'key': table['key'][starts],
+        'rows': np.add.reduceat(table['rows'], starts),
+        'first_day': np.minimum.reduceat(table['first_day'], starts),
+        'last_day': np.maximum.reduceat(table['last_day'], starts),
+        'count': np.add.reduceat(table['count'], starts, axis=0),
+        'sum': np.add.reduceat(table['sum'], starts, axis=0),
+        'min': np.fmin.reduceat(table['min'], starts, axis=0),
+        'max': np.fmax.reduceat(table['max'], starts, axis=0),
+    }
+
+    # Per series: bucket with the earliest first price / latest last price in each group
+    positions = np.arange(m)
+    n_series = table['count'].shape[1]
+    for name, day, pick in (('first', 'first_price_day', starts), ('last', 'last_price_day', ends - 1)):
+        values = np.empty((len(starts), n_series))
+        days = np.empty((len(starts), n_series), dtype=np.int32)
+        for s in range(n_series):
+            chosen = np.lexsort((positions, table[day][:, s], groups))[pick]
+            values[:, s] = table[name][chosen, s]
+            days[:, s] = table[day][chosen, s]
+        merged[name] = values
+        merged[day] = days
+    return groups[starts], merged
+
+
+def merge_tables(old, new):
+    """Bucket table with new's buckets merged into old's (new rows come after old rows)"""
+    if len(new['key']) == 0:
+        return old
+    positions = np.searchsorted(old['key'], new['key'])
+    matched = np.zeros(len(new['key']), dtype=bool)
+    if len(old['key']):
+        matched = old['key'][np.minimum(positions, len(old['key']) - 1)] == new['key']
+
+    table = {name: values.copy() for name, values in old.items()}
+    if matched.any():
+        targets = positions[matched]
+        pairs = _concat([_take(old, targets), _take(new, matched)])
+        ids = np.r_[np.arange(len(targets)), np.arange(len(targets))]
+        _, combined = reduce_buckets(pairs, ids)
+        for name in table:
+            table[name][targets] = combined[name]
+
+    fresh = ~matched
+    return {name: np.insert(table[name], positions[fresh], new[name][fresh], axis=0) for name in table}
+
+
+class PriceRollups:
+    """Bucket tables for every granularity over one price snapshot"""
+
+    def __init__(self, series, tables):
+        self.series = list(series)
+        self.tables = tables
+
+    @classmethod
+    def build(cls, snapshot):
+        """Aggregate every dated row of a snapshot"""
+        rows = snapshot._vegetable_order
+        return cls._from_rows(snapshot, rows[~np.isnat(snapshot.full_date[rows])])
+
+    @classmethod
+    def _from_rows(cls, snapshot, rows):
+        series = rollup_series(snapshot)
+        values = np.column_stack([series_values(snapshot, name, rows) for name in series]) \
+            if len(series) else np.empty((len(rows), 0))
+        days = snapshot.full_date[rows].astype(np.int64)
+        codes = snapshot.vegetable_code[rows]
+        return cls(series, {g: aggregate(days, codes, values, g) for g in GRANULARITIES})
+
+    def append(self, snapshot, first_row):
+        """Rollups of snapshot, whose rows from first_row on were appended after ours"""
+        if rollup_series(snapshot) != self.series:
+            # A new market column: every bucket gains a series
+            return PriceRollups.build(snapshot)
+        rows = np.arange(first_row, snapshot.size)
+        rows = rows[~np.isnat(snapshot.full_date[rows])]
+        rows = rows[np.lexsort((rows, snapshot.date_key[rows], snapshot.vegetable_code[rows]))]
+        new = PriceRollups._from_rows(snapshot, rows)
+        return PriceRollups(self.series, {
+            g: merge_tables(self.tables[g], new.tables[g]) for g in GRANULARITIES
+        })
+
+    def buckets(self, granularity, codes, start_day=None, end_day=None):
+        """Buckets of the given vegetable codes whose periods overlap a span of days
+
+        Returns (periods, table) sorted by period; buckets of several codes
+        for the same period are merged.
+        """
+        table = self.tables[granularity]
+        low = period_index([start_day], granularity)[0] if start_day is not None else -_PERIOD_OFFSET
+        high = period_index([end_day], granularity)[0] if end_day is not None else _PERIOD_OFFSET - 1
+        index = self._ranges(table, codes, [(low, high)])
+        picked = _take(table, index)
+        return reduce_buckets(picked, _split_keys(picked['key'])[1])
+
+    def summary(self, start_day, end_day, codes, by=None):
+        """Merged buckets over [start_day, end_day] (days since 1970-01-01)
+
+        by=None merges everything into one group, 'vegetable' gives one group
+        per code and 'month' one per (code, month). Returns (codes, months,
+        table) per group; months is None unless by='month'.
+        """
+        parts, groups = [], []
+        for granularity, low, high in _segments(start_day, end_day, split_months=by == 'month'):
+            table = self.tables[granularity]
+            index = self._ranges(table, codes, [(low, high)])
+            part = _take(table, index)
+            part_codes, part_periods = _split_keys(part['key'])
+            month = period_index(period_bounds(part_periods, granularity)[0], 'month')
+            parts.append(part)
+            groups.append((part_codes, month))
+
+        if not parts:
+            return np.empty(0, dtype=np.int64), None, _empty(len(self.series))
+        table = _concat(parts)
+        part_codes = np.concatenate([g[0] for g in groups])
+        months = np.concatenate([g[1] for g in groups])
+        if by == 'month':
+            ids = _keys(part_codes, months)
+        elif by == 'vegetable':
+            ids = part_codes
+        else:
+            ids = np.zeros(len(part_codes), dtype=np.int64)
+        ids, merged = reduce_buckets(table, ids)
+        if by == 'month':
+            group_codes, group_months = _split_keys(ids)
+            return group_codes, group_months, merged
+        return ids, None, merged
+
+    @staticmethod
+    def _ranges(table, codes, spans):
+        """Bucket positions for each code and (low, high) period span, in order"""
+        codes = np.asarray(codes, dtype=np.int64)
+        index = []
+        for low, high in spans:
+            first = np.searchsorted(table['key'], _keys(codes, low), side='left')
+            last = np.searchsorted(table['key'], _keys(codes, high), side='right')
+            index.extend(np.arange(a, b) for a, b in zip(first, last) if b > a)
+        return np.concatenate(index) if index else np.empty(0, dtype=np.int64)
+
+
+def rollup_series(snapshot):
+    """Series aggregated for a snapshot: its price columns, then the demand price"""
+    series = list(snapshot.price_columns)
+    if all(column in snapshot.prices for column in DEMAND_COLUMNS):
+        series.append(DEMAND_SERIES)
+    return series
+
+
+def series_values(snapshot, name, rows):
+    if name == DEMAND_SERIES:
+        return demand_prices(*(snapshot.prices[column][rows] for column in DEMAND_COLUMNS))
+    return snapshot.prices[name][rows]
+
+
+def _segments(start_day, end_day, split_months=False):
+    """Cover [start_day, end_day] with (granularity, first period, last period) spans
+
+    Whole years where possible, then whole months, then single days at the
+    edges. With split_months no span crosses a month boundary.
+    """
+    segments = []
+    day = int(start_day)
+    end_day = int(end_day)
+    while day <= end_day:
+        month = period_index([day], 'month')[0]
+        month_start, month_end = (int(v[0]) for v in period_bounds([month], 'month'))
+        year = period_index([day], 'year')[0]
+        year_start, _ = (int(v[0]) for v in period_bounds([year], 'year'))
+        if not split_months and day == year_start:
+            # Whole years from here
+            last_year = period_index([end_day + 1], 'year')[0] - 1
+            if last_year >= year:
+                segments.append(('year', year, last_year))
+                day = int(period_bounds([last_year], 'year')[1][0]) + 1
+                continue
+        if day == month_start and month_end <= end_day:
+            # Whole months up to the end of the year (or of the span)
+            last_month = period_index([end_day + 1], 'month')[0] - 1
+            if not split_months:
+                last_month = min(last_month, year * 12 + 11)
+            else:
+                last_month = month
+            segments.append(('month', month, last_month))
+            day = int(period_bounds([last_month], 'month')[1][0]) + 1
+            continue
+        last = min(month_end, end_day)
+        segments.append(('day', day, last))
+        day = last + 1
+    return segments
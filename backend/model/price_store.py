@@ -0,0 +1,457 @@
+import numpy as np
+import threading
+import os
+import re
+from columnar_cache import load_or_build
+from price_rollups import PriceRollups
+from metrics import timed
+
+# Path to the Excel file
+EXCEL_FILE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'crop_price1.xlsx')
+
+# Daily rows added after the workbook, in its layout; merged in when the data is loaded
+UPDATES_FILE_PATH = os.environ.get(
+    'PRICE_UPDATES_PATH',
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'crop_price_updates.csv')
+)
+
+# Price columns the app has always served; kept (empty if absent) in every snapshot
+PRICE_COLUMNS = [
+    'Wholesale_Pettah(RS)',
+    'Wholesale_Dambulla(RS)',
+    'Retail_Pettah(RS)',
+    'Retail_Dambulla(RS)'
+]
+
+# Any <price type>_<market>(RS) column is a price series, e.g. Retail_Narahenpita(RS)
+PRICE_COLUMN_PATTERN = re.compile(r'^(Wholesale|Retail)_(\w+)\(RS\)$')
+
+
+def parse_price_column(column):
+    """(price_type, market) of a price column in lower case, or None"""
+    match = PRICE_COLUMN_PATTERN.match(str(column).strip())
+    if match is None:
+        return None
+    return match.group(1).lower(), match.group(2).lower()
+
+
+def discover_price_columns(columns):
+    """PRICE_COLUMNS followed by any other price columns, in sheet order"""
+    extra = [column for column in columns
+             if parse_price_column(column) and column not in PRICE_COLUMNS]
+    return list(PRICE_COLUMNS) + extra
+
+
+def normalize_vegetable(name):
+    """Normalize a vegetable name to the key used for lookups"""
+    return str(name).strip().lower()
+
+
+# Bump when the cached column layout changes
+PRICE_LAYOUT_VERSION = 2
+
+
+def build_price_columns(path):
+    """Read the workbook into the typed columns and indexes a snapshot uses
+
+    Returns (arrays, meta): a dict of NumPy arrays and a JSON-serializable
+    dict with the vegetable names and price column names. Every market
+    column in the sheet is kept, as price_0, price_1, ...
+    """
+    import pandas as pd
+    arrays, meta = row_columns(pd.read_excel(path))
+    arrays.update(build_indexes(arrays['year'], arrays['month'], arrays['day'], arrays['vegetable_code']))
+    return arrays, meta
+
+
+def row_columns(df, vegetable_names=(), price_columns=()):
+    """Typed columns (without indexes) for rows in the workbook layout
+
+    Vegetables are coded against vegetable_names and price columns are
+    numbered after price_columns; names and columns not seen before are
+    appended to the returned meta.
+    """
+    import pandas as pd
+    df = df.rename(columns=lambda column: str(column).strip())
+
+    # Rows without a usable Year/Month/date can never match a filter
+    df = df.dropna(subset=['Year', 'Month', 'date'])
+
+    arrays = {
+        'year': df['Year'].to_numpy(dtype=np.int16),
+        'month': df['Month'].to_numpy(dtype=np.int8),
+        'day': df['date'].to_numpy(dtype=np.int8),
+        # Precomputed calendar date, NaT for invalid dates (e.g. day 31 in February)
+        'full_date': pd.to_datetime({
+            'year': df['Year'],
+            'month': df['Month'],
+            'day': df['date']
+        }, errors='coerce').to_numpy(dtype='datetime64[D]')
+    }
+
+    # Vegetable names stored once, rows hold a small integer code
+    names = df['vegetable name'].astype(str).str.strip()
+    vegetable_names = [str(name) for name in vegetable_names]
+    known = set(vegetable_names)
+    vegetable_names += [str(name) for name in pd.unique(names) if name not in known]
+    arrays['vegetable_code'] = pd.Index(vegetable_names).get_indexer(names).astype(np.int16)
+
+    price_columns = list(price_columns) or list(PRICE_COLUMNS)
+    price_columns += [column for column in discover_price_columns(df.columns) if column not in price_columns]
+    for i, column in enumerate(price_columns):
+        arrays[f'price_{i}'] = (pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+                                if column in df.columns else np.full(len(df), np.nan))
+
+    meta = {
+        'vegetable_names': vegetable_names,
+        'price_columns': price_columns
+    }
+    return arrays, meta
+
+
+def build_indexes(year, month, day, vegetable_code):
+    """Sorted index arrays over the date and vegetable columns"""
+    # Rows sorted by YYYYMMDD key; the stable sort keeps workbook order within a date
+    date_key = year.astype(np.int32) * 10000 + month.astype(np.int32) * 100 + day
+    date_order = np.argsort(date_key, kind='stable')
+
+    # Rows grouped by vegetable code, each group sorted by date
+    vegetable_order = date_order[np.argsort(vegetable_code[date_order], kind='stable')]
+
+    return {
+        'date_key': date_key,
+        'date_order': date_order,
+        'vegetable_order': vegetable_order
+    }
+
+
+class PriceSnapshot:
+    """Immutable, column-oriented copy of the price workbook"""
+
+    def __init__(self, arrays, meta, mtime):
+        self.mtime = mtime
+        self.year = arrays['year']
+        self.month = arrays['month']
+        self.day = arrays['day']
+        self.full_date = arrays['full_date']
+        self.vegetable_code = arrays['vegetable_code']
+        self.vegetable_names = np.asarray(meta['vegetable_names'], dtype=object)
+        self.vegetable_keys = {}
+        for code, name in enumerate(self.vegetable_names):
+            self.vegetable_keys.setdefault(normalize_vegetable(name), []).append(code)
+
+        self.price_columns = list(meta['price_columns'])
+        self.prices = {
+            column: arrays[f'price_{i}']
+            for i, column in enumerate(self.price_columns)
+        }
+
+        self.size = len(self.year)
+        self._build_indexes(arrays)
+        self._rollups = None
+
+    def _build_indexes(self, arrays):
+        """Set up the date, vegetable and latest-date indexes"""
+        self.date_key = arrays['date_key']
+        self._date_order = arrays['date_order']
+        self._sorted_keys = self.date_key[self._date_order]
+
+        # Per vegetable key: row positions sorted by date, plus their date keys
+        vegetable_order = self._vegetable_order = arrays['vegetable_order']
+        sorted_codes = self.vegetable_code[vegetable_order]
+        # Start of each code's block; one search for all codes, in the column's dtype
+        bounds = np.searchsorted(sorted_codes, np.arange(len(self.vegetable_names) + 1, dtype=sorted_codes.dtype))
+        self._vegetable_index = {}
+        for key, codes in self.vegetable_keys.items():
+            parts = [vegetable_order[bounds[code]:bounds[code + 1]] for code in codes]
+            rows = parts[0]
+            if len(parts) > 1:
+                # Names differing only in case/spacing share a key; merge by date
+                rows = np.concatenate(parts)
+                rows = rows[np.lexsort((rows, self.date_key[rows]))]
+            self._vegetable_index[key] = (rows, self.date_key[rows])
+
+        self._latest_key = int(self._sorted_keys[-1]) if self.size else None
+
+    def append(self, arrays, meta, mtime):
+        """New snapshot with rows from row_columns() added after these
+
+        Rows for a vegetable and date already present are skipped. The date
+        and vegetable indexes are merged with the new rows instead of being
+        re-sorted. Returns (snapshot, number of rows added).
+        """
+        n = self.size
+        codes = arrays['vegetable_code']
+        date_key = build_indexes(arrays['year'], arrays['month'], arrays['day'], codes)['date_key']
+
+        # (vegetable, date) keys in vegetable_order's order, to find duplicates and merge
+        vegetable_order = self._vegetable_order
+        existing = _vegetable_date_key(self.vegetable_code[vegetable_order], self.date_key[vegetable_order])
+        new = _vegetable_date_key(codes, date_key)
+        if n:
+            found = np.minimum(np.searchsorted(existing, new), n - 1)
+            duplicate = existing[found] == new
+        else:
+            duplicate = np.zeros(len(new), dtype=bool)
+        # Within the batch the first row for a vegetable and date wins
+        _, first = np.unique(new, return_index=True)
+        keep = np.zeros(len(new), dtype=bool)
+        keep[first] = True
+        keep &= ~duplicate
+        added = int(keep.sum())
+        if added == 0:
+            return self, 0
+
+        columns = {
+            'year': self.year, 'month': self.month, 'day': self.day,
+            'full_date': self.full_date, 'vegetable_code': self.vegetable_code
+        }
+        merged = {name: np.concatenate([column, arrays[name][keep]]) for name, column in columns.items()}
+        for i, column in enumerate(meta['price_columns']):
+            old = self.prices.get(column)
+            if old is None:
+                # A market first seen in the new rows has no earlier prices
+                old = np.full(n, np.nan)
+            merged[f'price_{i}'] = np.concatenate([old, arrays[f'price_{i}'][keep]])
+
+        date_key, new = date_key[keep], new[keep]
+        merged['date_key'] = np.concatenate([self.date_key, date_key])
+
+        # Insert the new rows after existing rows with the same key, as the stable sort would
+        order = np.argsort(date_key, kind='stable')
+        positions = np.searchsorted(self._sorted_keys, date_key[order], side='right')
+        merged['date_order'] = np.insert(self._date_order, positions, n + order)
+
+        order = np.argsort(new, kind='stable')
+        positions = np.searchsorted(existing, new[order], side='right')
+        merged['vegetable_order'] = np.insert(vegetable_order, positions, n + order)
+
+        snapshot = PriceSnapshot(merged, meta, mtime)
+        if self._rollups is not None:
+            snapshot._rollups = self._rollups.append(snapshot, n)
+        return snapshot, added
+
+    def rollups(self):
+        """Day/week/month/year aggregates per vegetable (see price_rollups), built on first use"""
+        if self._rollups is None:
+            self._rollups = PriceRollups.build(self)
+        return self._rollups
+
+    def vegetable_codes(self, vegetable):
+        """Codes of the names sharing a vegetable's lookup key (empty if unknown)"""
+        return self.vegetable_keys.get(normalize_vegetable(vegetable), [])
+
+    def has_vegetable(self, vegetable):
+        """Check whether any row belongs to the given vegetable"""
+        return normalize_vegetable(vegetable) in self.vegetable_keys
+
+    def latest_date(self):
+        """Most recent (year, month, day) in the data"""
+        if self._latest_key is None:
+            return None
+        return _split_key(self._latest_key)
+
+    def latest_month(self):
+        """Most recent (year, month) in the data"""
+        latest = self.latest_date()
+        return latest[:2] if latest else None
+
+    def select(self, year=None, month=None, day=None, vegetable=None, order='workbook'):
+        """Row positions matching the given filters
+
+        Rows come back in workbook order, or sorted by date with order='date'.
+        """
+        rows, keys = self._index_for(vegetable)
+
+        if year is not None:
+            # Binary search the date-sorted index for the year/month/day span
+            low, high = _key_range(year, month, day if month is not None else None)
+            start = np.searchsorted(keys, low, side='left')
+            stop = np.searchsorted(keys, high, side='right')
+            rows = rows[start:stop]
+
+        # Filters the index cannot answer (e.g. a month without a year)
+        if year is None and month is not None:
+            rows = rows[self.month[rows] == month]
+        if day is not None and (year is None or month is None):
+            rows = rows[self.day[rows] == day]
+
+        if order == 'workbook':
+            rows = np.sort(rows)
+        return rows
+
+    def select_range(self, start, end, vegetable=None):
+        """Row positions with start <= date <= end, sorted by date
+
+        start and end are (year, month, day) tuples or date objects.
+        """
+        rows, keys = self._index_for(vegetable)
+        low = _date_to_key(start) if start is not None else None
+        high = _date_to_key(end) if end is not None else None
+        first = np.searchsorted(keys, low, side='left') if low is not None else 0
+        last = np.searchsorted(keys, high, side='right') if high is not None else len(keys)
+        return rows[first:last]
+
+    def frame(self, rows, valid_dates_only=False, sort_by_date=False):
+        """Build a DataFrame with the workbook column names for the given rows"""
+        import pandas as pd
+        rows = np.asarray(rows, dtype=np.int64)
+        if valid_dates_only:
+            rows = rows[~np.isnat(self.full_date[rows])]
+        if sort_by_date:
+            rows = rows[np.argsort(self.full_date[rows], kind='stable')]
+
+        data = {
+            'Year': self.year[rows],
+            'Month': self.month[rows],
+            'date': self.day[rows],
+            'vegetable name': self.vegetable_names[self.vegetable_code[rows]],
+        }
+        for column in self.price_columns:
+            data[column] = self.prices[column][rows]
+        data['full_date'] = self.full_date[rows].astype('datetime64[ns]')
+        return pd.DataFrame(data)
+
+    def to_frame(self):
+        """All rows as a DataFrame"""
+        return self.frame(np.arange(self.size))
+
+    def market_prices(self, year=None, month=None, day=None, vegetable=None):
+        """Rows for the market price table"""
+        return self.frame(self.select(year, month, day, vegetable))
+
+    def month_prices(self, year, month, vegetable=None):
+        """Rows with a valid date for one month, sorted by date"""
+        rows = self.select(year, month, vegetable=vegetable, order='date')
+        return self.frame(rows, valid_dates_only=True)
+
+    def _index_for(self, vegetable):
+        """Date-sorted (rows, keys) for one vegetable, or for all rows"""
+        if vegetable is None:
+            return self._date_order, self._sorted_keys
+        empty = np.empty(0, dtype=np.int64)
+        return self._vegetable_index.get(normalize_vegetable(vegetable), (empty, empty))
+
+
+def _key_range(year, month=None, day=None):
+    """Smallest and largest YYYYMMDD key covered by a year, month or day"""
+    base = int(year) * 10000
+    if month is None:
+        return base, base + 9999
+    base += int(month) * 100
+    if day is None:
+        return base, base + 99
+    return base + int(day), base + int(day)
+
+
+def _date_to_key(value):
+    if isinstance(value, tuple):
+        year, month, day = value
+    else:
+        year, month, day = value.year, value.month, value.day
+    return int(year) * 10000 + int(month) * 100 + int(day)
+
+
+def _split_key(key):
+    return key // 10000, key // 100 % 100, key % 100
+
+
+def _vegetable_date_key(codes, date_key):
+    return codes.astype(np.int64) * 100000000 + date_key
+
+
+class PriceStore:
+    """Loads the price workbook once and reloads it when the file changes
+
+    Daily rows appended with append() are written to the updates file
+    (CSV in the workbook layout) and merged into the workbook data on load.
+    """
+
+    def __init__(self, path=EXCEL_FILE_PATH, updates_path=UPDATES_FILE_PATH):
+        self.path = path
+        self.updates_path = updates_path
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def _mtime(self):
+        """(workbook mtime, updates file mtime or None)"""
+        mtime = os.path.getmtime(self.path)
+        try:
+            return mtime, os.path.getmtime(self.updates_path)
+        except OSError:
+            return mtime, None
+
+    def snapshot(self):
+        """Current data, reloading first if the workbook's or updates file's mtime changed"""
+        try:
+            mtime = self._mtime()
+        except OSError:
+            return None
+
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.mtime == mtime:
+            return snapshot
+
+        with self._lock, timed('data_load'):
+            # Another thread may have reloaded while we waited for the lock
+            if self._snapshot is None or self._snapshot.mtime != mtime:
+                # Memory-mapped binary columns, converted from the workbook when it changes
+                arrays, meta = load_or_build(self.path, build_price_columns, PRICE_LAYOUT_VERSION)
+                snapshot = PriceSnapshot(arrays, meta, mtime)
+                if mtime[1] is not None:
+                    import pandas as pd
+                    updates = pd.read_csv(self.updates_path)
+                    snapshot, _ = snapshot.append(*row_columns(
+                        updates, snapshot.vegetable_names, snapshot.price_columns), mtime)
+                self._snapshot = snapshot
+            return self._snapshot
+
+    def append(self, df):
+        """Add rows in the workbook layout; returns (snapshot, number of rows added)
+
+        Rows for a vegetable and date already in the data are skipped. The
+        rest are appended to the updates file and merged into the current
+        snapshot without reloading it.
+        """
+        if self.snapshot() is None:
+            raise FileNotFoundError(self.path)
+
+        with self._lock:
+            snapshot = self._snapshot
+            arrays, meta = row_columns(df, snapshot.vegetable_names, snapshot.price_columns)
+            first = snapshot.size
+            snapshot, added = snapshot.append(arrays, meta, snapshot.mtime)
+            if added:
+                _write_updates(self.updates_path, snapshot.frame(np.arange(first, snapshot.size)))
+                snapshot.mtime = self._mtime()
+                self._snapshot = snapshot
+            return snapshot, added
+
+
+def _write_updates(path, frame):
+    """Append rows to the updates CSV, rewriting it if the new rows bring new columns"""
+    import pandas as pd
+    frame = frame.drop(columns=['full_date'])
+    if os.path.exists(path):
+        header = pd.read_csv(path, nrows=0).columns
+        if set(frame.columns) <= set(header):
+            frame.reindex(columns=header).to_csv(path, mode='a', header=False, index=False)
+            return
+        frame = pd.concat([pd.read_csv(path), frame], ignore_index=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    frame.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_price_store():
+    """Process-wide price store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PriceStore()
+    return _store
@@ -0,0 +1,160 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import os
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:
+    # No file locks on Windows: run a single worker process there
+    fcntl = None
+
+# Finished jobs kept for the status API
+MAX_JOB_HISTORY = 50
+
+# Seconds before a model whose job failed (or was skipped) is trained again on request
+TRAINING_RETRY_SECONDS = int(os.environ.get('TRAINING_RETRY_SECONDS', 300))
+
+
+class TrainingJob:
+    """One background training run"""
+
+    def __init__(self, model_name):
+        self.id = uuid.uuid4().hex[:12]
+        self.model = model_name
+        self.status = 'queued'
+        self.error = None
+        self.submitted_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    @property
+    def retry_after(self):
+        """When a failed or skipped job may be replaced by a new one, else None"""
+        if self.status not in ('failed', 'skipped') or self.finished_at is None:
+            return None
+        return self.finished_at + timedelta(seconds=TRAINING_RETRY_SECONDS)
+
+    def to_dict(self):
+        def iso(value):
+            return value.isoformat(timespec='seconds') if value else None
+
+        return {
+            'id': self.id,
+            'model': self.model,
+            'status': self.status,
+            'error': self.error,
+            'submitted_at': iso(self.submitted_at),
+            'started_at': iso(self.started_at),
+            'finished_at': iso(self.finished_at),
+            'retry_after': iso(self.retry_after)
+        }
+
+
+class TrainingJobManager:
+    """Runs model training in background threads, at most one job per model
+
+    Training functions publish their artifacts atomically, so the model
+    registry keeps serving the previous version until the new one is on disk.
+
+    A model whose last job failed is not trained again on request until
+    its retry_after time. With a lock file, a job holds an exclusive
+    fcntl lock on it while training and is skipped if another process
+    (e.g. another gunicorn worker) already holds it.
+    """
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='training')
+        self._trainers = {}
+        self._lock_paths = {}
+        self._jobs = []
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def register(self, model_name, train, lock_path=None):
+        """Register the function that trains and saves a model
+
+        train() returns a tuple whose first item is None on failure, like
+        train_price_model and train_crop_model. Models writing the same
+        artifacts share a lock_path, so only one process trains them at a
+        time.
+        """
+        self._trainers[model_name] = train
+        self._lock_paths[model_name] = lock_path
+
+    def submit(self, model_name, force=False):
+        """Start training a model, or return the job already training it
+
+        The last job is also returned if it failed or was skipped less than
+        TRAINING_RETRY_SECONDS ago, unless force is set.
+        """
+        with self._lock:
+            job = self._active.get(model_name)
+            if job is not None and job.active:
+                return job
+            if not force and job is not None and job.retry_after and datetime.now() < job.retry_after:
+                return job
+
+            job = TrainingJob(model_name)
+            self._active[model_name] = job
+            self._jobs.append(job)
+            del self._jobs[:-MAX_JOB_HISTORY]
+
+        self._executor.submit(self._run, job, self._trainers[model_name], self._lock_paths[model_name])
+        return job
+
+    def active(self, model_name):
+        """Queued or running job for a model, or None"""
+        job = self._active.get(model_name)
+        return job if job is not None and job.active else None
+
+    def latest(self, model_name):
+        """Most recent job for a model, or None"""
+        return self._active.get(model_name)
+
+    def get(self, job_id):
+        for job in self._jobs:
+            if job.id == job_id:
+                return job
+        return None
+
+    def jobs(self):
+        """All known jobs, most recent first"""
+        return list(reversed(self._jobs))
+
+    def _run(self, job, train, lock_path):
+        job.status = 'running'
+        job.started_at = datetime.now()
+        lock_file = None
+        try:
+            if lock_path is not None and fcntl is not None:
+                lock_file = open(lock_path, 'a')
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    job.status = 'skipped'
+                    job.error = "Another process is already training this model"
+                    return
+            result = train()
+            if result is None or result[0] is None:
+                job.status = 'failed'
+                job.error = "Training failed, see the server log for details"
+            else:
+                job.status = 'succeeded'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            # Closing the file releases the lock
+            if lock_file is not None:
+                lock_file.close()
+            job.finished_at = datetime.now()
+
+
+# Process-wide job manager shared by the model modules
+training_jobs = TrainingJobManager()
@@ -0,0 +1,275 @@
+"""Train the price and crop models in parallel
+
+Every fit is a task run in a process pool: one task per price target (or a
+single one in the multi-output and long modes) plus one for the crop
+model, and with a hyperparameter grid one task per configuration and
+cross-validation fold. The core budget is split between the pool and the
+forests: `workers` processes each fit with n_jobs = cores // workers.
+
+Cross-validation scores every grid configuration (or the default one
+without a grid) on k folds of the training split (MAE for prices,
+accuracy for crops); the final models are then fitted with the best
+configuration, scored on the same 20% test split
+as train_price_model / train_crop_model and, with --save, published.
+
+    python training_orchestrator.py --cores 8 --grid n_estimators=50,100 max_depth=10,20 --folds 5
+    python training_orchestrator.py --save --compare-sequential
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from aiprediction_model import (
+    PER_TARGET, PRICE_MODEL_MODE, fit_price_models, predict_targets, prepare_data, save_price_models
+)
+from crop_model import MODEL_PATH, fit_crop_model, load_crop_data
+from model_registry import atomic_dump
+
+# Cores training may use, by default all of them
+TRAINING_CORES = int(os.environ.get('TRAINING_CORES', os.cpu_count() or 1))
+
+# Training data, loaded once per worker process
+_data = {}
+
+
+def _load_data(mode):
+    """Train/test splits of the price and crop data for this process"""
+    if _data.get('mode') != mode:
+        from sklearn.model_selection import train_test_split
+        X, y, le, feature_columns, target_columns = prepare_data(mode=mode)
+        if X is None:
+            raise RuntimeError("Could not prepare the price data")
+        _data['price'] = train_test_split(X, y, test_size=0.2, random_state=42)
+        _data['crop'] = load_crop_data()
+        _data['mode'] = mode
+    return _data
+
+
+def _fold(X, y, folds, fold):
+    """Training and validation parts of fold `fold` out of `folds`"""
+    from sklearn.model_selection import KFold
+    train, valid = list(KFold(n_splits=folds, shuffle=True, random_state=42).split(X))[fold]
+    return X.iloc[train], X.iloc[valid], y.iloc[train], y.iloc[valid]
+
+
+def run_task(task):
+    """Fit one model described by task and score it
+
+    task is a dict with model ('price' or 'crop'), targets (price columns
+    fitted together), params, mode, n_jobs and fold (None for the final
+    fit on the whole training split). Final fits return the model as well.
+    """
+    start = time.perf_counter()
+    data = _load_data(task['mode'])
+    params = {**task['params'], 'n_jobs': task['n_jobs']}
+
+    X_train, X_test, y_train, y_test = data[task['model']]
+    if task['fold'] is not None:
+        X_train, X_test, y_train, y_test = _fold(X_train, y_train, task['folds'], task['fold'])
+
+    if task['model'] == 'price':
+        model = fit_price_models(X_train, y_train, task['targets'], task['mode'], params)
+        pred = predict_targets(model, X_test, task['targets'], task['mode'])
+        actual = y_test[task['targets']].to_numpy(dtype=np.float64)
+        known = ~np.isnan(actual)
+        score = float(np.abs(pred - actual)[known].mean())
+    else:
+        model = fit_crop_model(X_train, y_train, params)
+        score = float((model.predict(X_test) == y_test.to_numpy()).mean())
+
+    result = {key: task[key] for key in ('model', 'targets', 'params', 'fold')}
+    result.update({'score': score, 'seconds': time.perf_counter() - start})
+    if task['fold'] is None:
+        result['estimator'] = model
+    return result
+
+
+def grid_configs(grid):
+    """Every combination of a {param: [values]} grid, or [{}] without one"""
+    if not grid:
+        return [{}]
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def model_groups(models, mode, target_columns):
+    """(model, targets) for each independent fit"""
+    groups = []
+    if 'price' in models:
+        if mode == PER_TARGET:
+            groups += [('price', [target]) for target in target_columns]
+        else:
+            groups.append(('price', list(target_columns)))
+    if 'crop' in models:
+        groups.append(('crop', None))
+    return groups
+
+
+def run_tasks(tasks, workers):
+    """Run tasks in a pool of `workers` processes (in this process if 1)"""
+    if workers <= 1:
+        return [run_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_task, tasks))
+
+
+def budget(cores, tasks, workers=None):
+    """(workers, n_jobs per fit) within the core budget"""
+    workers = max(1, min(workers or cores, len(tasks), cores))
+    return workers, max(1, cores // workers)
+
+
+def orchestrate(models=('price', 'crop'), mode=None, grid=None, folds=0, cores=TRAINING_CORES, workers=None):
+    """Cross-validate the grid (if any), then fit the final models in parallel
+
+    Returns a report dict; report['estimators'] maps each model group to
+    its fitted final model.
+    """
+    mode = mode or PRICE_MODEL_MODE
+    X, y, le, feature_columns, target_columns = prepare_data(mode=mode)
+    if X is None:
+        raise RuntimeError("Could not prepare the price data")
+    groups = model_groups(models, mode, target_columns)
+    configs = grid_configs(grid)
+    report = {'mode': mode, 'cores': cores, 'phases': {}}
+
+    # Phase 1: k-fold scores of every configuration (a single one is scored
+    # as well, there is just nothing to choose from)
+    best = {}
+    if folds > 1:
+        tasks = [
+            {'model': model, 'targets': targets, 'params': config, 'mode': mode,
+             'fold': fold, 'folds': folds}
+            for model, targets in groups for config in configs for fold in range(folds)
+        ]
+        n_workers, n_jobs = budget(cores, tasks, workers)
+        for task in tasks:
+            task['n_jobs'] = n_jobs
+        start = time.perf_counter()
+        results = run_tasks(tasks, n_workers)
+        report['phases']['cross_validation'] = {
+            'tasks': len(tasks), 'workers': n_workers, 'n_jobs': n_jobs,
+            'wall_seconds': time.perf_counter() - start,
+            'task_seconds': sum(r['seconds'] for r in results)
+        }
+
+        cv = []
+        for model, targets in groups:
+            for config in configs:
+                scores = [r['score'] for r in results
+                          if r['model'] == model and r['targets'] == targets and r['params'] == config]
+                cv.append({'model': model, 'targets': targets, 'params': config,
+                           'mean': float(np.mean(scores)), 'std': float(np.std(scores))})
+            if len(configs) == 1:
+                continue
+            candidates = [c for c in cv if c['model'] == model and c['targets'] == targets]
+            # Lowest MAE for prices, highest accuracy for crops
+            chosen = (min if model == 'price' else max)(candidates, key=lambda c: c['mean'])
+            best[(model, str(targets))] = chosen['params']
+        report['cross_validation'] = cv
+
+    # Phase 2: final fits with the chosen configuration
+    tasks = [
+        {'model': model, 'targets': targets, 'params': best.get((model, str(targets)), configs[0]),
+         'mode': mode, 'fold': None}
+        for model, targets in groups
+    ]
+    n_workers, n_jobs = budget(cores, tasks, workers)
+    for task in tasks:
+        task['n_jobs'] = n_jobs
+    start = time.perf_counter()
+    results = run_tasks(tasks, n_workers)
+    report['phases']['final'] = {
+        'tasks': len(tasks), 'workers': n_workers, 'n_jobs': n_jobs,
+        'wall_seconds': time.perf_counter() - start,
+        'task_seconds': sum(r['seconds'] for r in results)
+    }
+    report['final'] = [{key: r[key] for key in ('model', 'targets', 'params', 'score', 'seconds')} for r in results]
+    report['estimators'] = [(r['model'], r['estimator']) for r in results]
+    report['schema'] = (le, feature_columns, target_columns)
+    return report
+
+
+def sequential_baseline(models, mode, grid, folds, cores):
+    """The same fits one after another, each forest using every core"""
+    start = time.perf_counter()
+    orchestrate(models, mode, grid, folds, cores=cores, workers=1)
+    return time.perf_counter() - start
+
+
+def save_models(report):
+    """Publish the final models like train_price_model / train_crop_model"""
+    le, feature_columns, target_columns = report['schema']
+    price_models = {}
+    for model, estimator in report['estimators']:
+        if model == 'price':
+            price_models.update(estimator)
+        else:
+            atomic_dump(estimator, MODEL_PATH)
+            print(f"Model saved to {MODEL_PATH}")
+    if price_models:
+        save_price_models(price_models, le, feature_columns, target_columns, report['mode'])
+
+
+def parse_grid(items):
+    """['n_estimators=50,100', 'max_depth=10,20'] -> {'n_estimators': [50, 100], ...}"""
+    grid = {}
+    for item in items or []:
+        name, values = item.split('=', 1)
+        grid[name] = [None if value == 'None' else int(value) for value in values.split(',')]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--models', default='price,crop', help='Comma-separated models to train (price, crop)')
+    parser.add_argument('--mode', help='Price model mode (default: PRICE_MODEL_MODE)')
+    parser.add_argument('--cores', type=int, default=TRAINING_CORES, help='Core budget (default: TRAINING_CORES or all)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: as many as the budget and tasks allow)')
+    parser.add_argument('--grid', nargs='*', help='Hyperparameter grid, e.g. n_estimators=50,100 max_depth=10,20')
+    parser.add_argument('--folds', type=int, default=5, help='Cross-validation folds for the grid')
+    parser.add_argument('--compare-sequential', action='store_true', help='Also time the same fits run sequentially')
+    parser.add_argument('--save', action='store_true', help='Publish the final models')
+    parser.add_argument('--output', help='Write the report as JSON to this file')
+    args = parser.parse_args()
+
+    models = [m.strip() for m in args.models.split(',') if m.strip()]
+    grid = parse_grid(args.grid)
+
+    start = time.perf_counter()
+    report = orchestrate(models, args.mode, grid, args.folds, args.cores, args.workers)
+    report['wall_seconds'] = time.perf_counter() - start
+
+    for phase, stats in report['phases'].items():
+        print(f"{phase}: {stats['tasks']} tasks on {stats['workers']} workers x {stats['n_jobs']} jobs, "
+              f"{stats['wall_seconds']:.2f}s wall, {stats['task_seconds']:.2f}s of fits")
+    for c in report.get('cross_validation', []):
+        print(f"  cv {c['model']} {c['targets'] or ''} {c['params']}: {c['mean']:.4f} ± {c['std']:.4f}")
+    for r in report['final']:
+        metric = 'MAE' if r['model'] == 'price' else 'accuracy'
+        print(f"  final {r['model']} {r['targets'] or ''} {r['params']}: {metric} {r['score']:.4f}")
+
+    if args.compare_sequential:
+        report['sequential_wall_seconds'] = sequential_baseline(models, args.mode, grid, args.folds, args.cores)
+        report['speedup'] = report['sequential_wall_seconds'] / report['wall_seconds']
+        print(f"Parallel {report['wall_seconds']:.2f}s vs sequential {report['sequential_wall_seconds']:.2f}s: "
+              f"{report['speedup']:.2f}x speedup")
+    else:
+        print(f"Total {report['wall_seconds']:.2f}s")
+
+    if args.save:
+        save_models(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({k: v for k, v in report.items() if k not in ('estimators', 'schema')}, f, indent=2, default=str)
+        print(f"Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
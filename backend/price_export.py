@@ -0,0 +1,69 @@
+import numpy as np
+import json
+import csv
+import io
+from serializers import market_price_fields, nullable_floats
+
+# Rows formatted per chunk; memory use is bounded by this, not by the range size
+EXPORT_CHUNK_ROWS = 5000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_rows(prices, start=None, end=None, vegetables=None):
+    """Row positions to export, sorted by date
+
+    Single vegetables and the full range are index slices; several
+    vegetables are merged by date.
+    """
+    if not vegetables:
+        return prices.select_range(start, end)
+    if len(vegetables) == 1:
+        return prices.select_range(start, end, vegetables[0])
+
+    rows = np.concatenate([prices.select_range(start, end, vegetable) for vegetable in vegetables])
+    return rows[np.lexsort((rows, prices.date_key[rows]))]
+
+
+def iter_chunks(prices, rows, fields):
+    """Yield (dates, vegetables, {field: values}) for consecutive chunks of rows"""
+    columns = market_price_fields(prices.price_columns)
+    for start in range(0, len(rows), EXPORT_CHUNK_ROWS):
+        chunk = np.asarray(rows[start:start + EXPORT_CHUNK_ROWS])
+        keys = prices.date_key[chunk]
+        dates = [f"{k // 10000:04d}-{k // 100 % 100:02d}-{k % 100:02d}" for k in keys.tolist()]
+        names = prices.vegetable_names[prices.vegetable_code[chunk]].tolist()
+        values = {field: nullable_floats(prices.prices[columns[field]][chunk]) for field in fields}
+        yield dates, names, values
+
+
+def generate_ndjson(prices, rows, fields):
+    """One JSON object per line"""
+    for dates, names, values in iter_chunks(prices, rows, fields):
+        columns = [dates, names] + [values[field] for field in fields]
+        keys = ['date', 'vegetable'] + list(fields)
+        yield ''.join(json.dumps(dict(zip(keys, row))) + '\n' for row in zip(*columns))
+
+
+def generate_csv(prices, rows, fields):
+    """CSV with a header row; missing prices are empty cells"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['date', 'vegetable'] + list(fields))
+    yield buffer.getvalue()
+
+    for dates, names, values in iter_chunks(prices, rows, fields):
+        buffer.seek(0)
+        buffer.truncate()
+        columns = [dates, names] + [['' if v is None else v for v in values[field]] for field in fields]
+        writer.writerows(zip(*columns))
+        yield buffer.getvalue()
+
+
+def generate_export(prices, rows, fields, fmt):
+    if fmt == 'csv':
+        return generate_csv(prices, rows, fields)
+    return generate_ndjson(prices, rows, fields)
@@ -0,0 +1,147 @@
+"""Response cache for the read-only price endpoints
+
+A cached endpoint's JSON body is kept per path, normalized query string
+and dataset version (the price data's mtime and row count, plus the
+version of any model it reads). Responses carry an ETag and Last-Modified
+header; a request whose If-None-Match / If-Modified-Since still matches the
+current version gets 304 Not Modified without running the endpoint. When
+the workbook, the updates file or a model changes, the version changes
+and old entries are no longer hit; they age out of the byte-bounded LRU.
+"""
+from collections import OrderedDict
+from datetime import datetime, timezone
+import functools
+import hashlib
+import os
+import threading
+
+from flask import current_app, make_response, request
+from werkzeug.http import is_resource_modified
+
+from model_registry import registry
+
+# Memory bound of the cached response bodies, in bytes (0 disables the cache)
+RESPONSE_CACHE_BYTES = int(os.environ.get('RESPONSE_CACHE_BYTES', 32 * 1024 * 1024))
+
+
+class ResponseCache:
+    """Thread-safe LRU of response bodies, bounded by their total size in bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return (True, (body, mimetype)) on a hit, (False, None) on a miss"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key, body, mimetype):
+        # A body larger than the whole bound would only evict everything else
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old[0])
+            self._data[key] = (body, mimetype)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                _, (evicted, _) = self._data.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_BYTES)
+
+
+def normalized_query(args):
+    """Query parameters as a sorted tuple, so their order doesn't split entries"""
+    return tuple(sorted((key, tuple(values)) for key, values in args.lists()))
+
+
+def entity_tag(key):
+    return hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+
+
+def cached_response(data_version, models=()):
+    """Cache a GET endpoint's 200 JSON responses per query and dataset version
+
+    data_version() returns (version, last modified datetime) of the data
+    the endpoint reads, or None to skip caching (e.g. no data file); the
+    versions of the registered models named in models are added to it.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            current = data_version() if response_cache.max_bytes > 0 else None
+            if current is None:
+                return view(*args, **kwargs)
+
+            version, last_modified = current
+            version = (version, tuple(registry.version(name) for name in models))
+            key = (request.path, normalized_query(request.args), version)
+            etag = entity_tag(key)
+
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response_cache.count_not_modified()
+                response = current_app.response_class(status=304)
+            else:
+                found, value = response_cache.get(key)
+                if found:
+                    body, mimetype = value
+                    response = current_app.response_class(body, mimetype=mimetype)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or not response.is_json:
+                        return response
+                    response_cache.put(key, response.get_data(), response.mimetype)
+
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            # Browsers may store the response but revalidate it on every use
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def mtime_datetime(*mtimes):
+    """Latest of several file mtimes (None ignored) as an aware UTC datetime"""
+    return datetime.fromtimestamp(max(mtime for mtime in mtimes if mtime is not None), timezone.utc)
@@ -0,0 +1,117 @@
+import numpy as np
+from price_store import PRICE_COLUMNS, parse_price_column
+from price_rollups import period_bounds, period_labels
+
+
+def price_field(column):
+    """Response key of a price column: Wholesale_Pettah(RS) -> wholesale_pettah"""
+    parsed = parse_price_column(column)
+    return f"{parsed[0]}_{parsed[1]}" if parsed else column
+
+
+def market_price_fields(columns):
+    """Response keys for the market price table, mapped to their price columns"""
+    return {price_field(column): column for column in columns if parse_price_column(column)}
+
+
+def trend_price_fields(columns):
+    """Response keys for the price trend chart: Wholesale_Pettah(RS) -> pettah_wholesale"""
+    fields = {}
+    for column in columns:
+        parsed = parse_price_column(column)
+        if parsed:
+            fields[f"{parsed[1]}_{parsed[0]}"] = column
+    return fields
+
+
+# Keys of the original four price columns, always present in responses
+MARKET_PRICE_FIELDS = market_price_fields(PRICE_COLUMNS)
+
+
+def nullable_floats(values):
+    """Column of floats as a list with NaN replaced by None"""
+    values = np.asarray(values, dtype=np.float64)
+    result = values.astype(object)
+    result[np.isnan(values)] = None
+    return result.tolist()
+
+
+def format_dates(dates, fmt='%Y-%m-%d'):
+    """Format a datetime column as strings"""
+    import pandas as pd
+    return pd.Series(dates).dt.strftime(fmt).tolist()
+
+
+def to_records(columns):
+    """Turn a dict of equal-length column lists into a list of row dicts"""
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+
+def latest_per_vegetable(df):
+    """Last row for each vegetable, in order of first appearance"""
+    import pandas as pd
+    first_seen, _ = pd.factorize(df['vegetable name'])
+    latest = df.assign(_first_seen=first_seen).groupby('_first_seen', sort=False).tail(1)
+    return latest.sort_values('_first_seen').drop(columns='_first_seen')
+
+
+def market_price_records(df):
+    """Rows for /api/market-prices: the latest entry per vegetable"""
+    latest = latest_per_vegetable(df)
+    columns = {'vegetable': latest['vegetable name'].astype(str).str.strip().tolist()}
+    for key, column in market_price_fields(df.columns).items():
+        columns[key] = nullable_floats(latest[column])
+    return to_records(columns)
+
+
+def trend_records(df):
+    """Rows for /api/price-trend from a date-sorted frame"""
+    columns = {
+        'date': format_dates(df['full_date']),
+        'day': [f"Day {i}" for i in range(1, len(df) + 1)],
+    }
+    for key, column in trend_price_fields(df.columns).items():
+        columns[key] = nullable_floats(df[column])
+    return to_records(columns)
+
+
+def rollup_price_stats(stats, i, series, fields):
+    """{key: {min, max, mean, first, last, count}} for merged rollup bucket i
+
+    fields maps response keys to price columns; series lists the columns
+    of the rollup arrays. Keys without prices in the bucket are left out.
+    """
+    result = {}
+    for key, column in fields.items():
+        s = series.index(column)
+        count = int(stats['count'][i, s])
+        if count == 0:
+            continue
+        result[key] = {
+            'min': float(stats['min'][i, s]),
+            'max': float(stats['max'][i, s]),
+            'mean': round(float(stats['sum'][i, s]) / count, 2),
+            'first': float(stats['first'][i, s]),
+            'last': float(stats['last'][i, s]),
+            'count': count
+        }
+    return result
+
+
+def rollup_records(periods, stats, granularity, series):
+    """Rows for /api/price-rollups: one per period with its price statistics"""
+    starts, ends = period_bounds(periods, granularity)
+    starts = np.datetime_as_string(starts.astype('datetime64[D]')).tolist()
+    ends = np.datetime_as_string(ends.astype('datetime64[D]')).tolist()
+    fields = market_price_fields(series)
+    records = []
+    for i, label in enumerate(period_labels(periods, granularity)):
+        records.append({
+            'period': label,
+            'start_date': starts[i],
+            'end_date': ends[i],
+            'rows': int(stats['rows'][i]),
+            'prices': rollup_price_stats(stats, i, series, fields)
+        })
+    return records
@@ -0,0 +1,126 @@
+"""Crop lookup table: model-aligned grid edges and served answers"""
+import json
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import crop_lookup
+from crop_lookup import DEFAULT_GRID, EXACT, CropLookup, build_table, load_crop_lookup, split_edges
+from crop_model import CSV_FILE_PATH, FEATURE_COLUMNS
+from flat_forest import FlatForest
+from training_jobs import TrainingJobManager
+
+GRID = {name: (low, high, 5) for name, (low, high, _) in DEFAULT_GRID.items()}
+
+
+@pytest.fixture(scope='module')
+def lookup(tmp_path_factory):
+    df = pd.read_csv(CSV_FILE_PATH)
+    X = df[FEATURE_COLUMNS].to_numpy(np.float64)
+    model = FlatForest(RandomForestClassifier(n_estimators=10, random_state=0).fit(df[FEATURE_COLUMNS], df['label']))
+    edges = split_edges(model, GRID, X)
+    path = str(tmp_path_factory.mktemp('lookup') / 'crop_lookup-test.npy')
+    build_table(model, GRID, edges, 0.2, path)
+    meta = {
+        'grid': {name: list(GRID[name]) for name in FEATURE_COLUMNS},
+        'edges': edges,
+        'classes': [str(crop) for crop in model.classes_],
+        'table': 'crop_lookup-test.npy',
+    }
+    return CropLookup(np.load(path, mmap_mode='r'), meta), model, X
+
+
+def test_edges_are_inside_the_grid(lookup):
+    table, _, _ = lookup
+    for name, edges in zip(FEATURE_COLUMNS, table.edges):
+        low, high, cells = GRID[name]
+        assert len(edges) <= cells - 1
+        assert np.all(np.diff(edges) > 0)
+        assert np.all((edges > low) & (edges < high))
+    assert len(table.table) == np.prod(table.shape)
+
+
+def test_served_crops_are_the_cell_centre_crops(lookup):
+    table, model, X = lookup
+    cells = table.cells(X)
+    # Rows above the rainfall range are outside the grid
+    X, cells = X[cells >= 0], cells[cells >= 0]
+    served = table.table[cells] != EXACT
+    assert served.any()
+
+    bounds = [np.concatenate([[table.low[i]], edges, [table.high[i]]]) for i, edges in enumerate(table.edges)]
+    index = np.unravel_index(cells[served], table.shape)
+    centres = np.stack([(b[i] + b[i + 1]) / 2 for b, i in zip(bounds, index)], axis=1)
+    assert np.array_equal(table.table[cells[served]], model.predict_proba(centres).argmax(axis=1))
+
+    row = X[np.flatnonzero(served)[0]]
+    assert table.lookup(tuple(row)) == model.classes_[table.table[table.cells([row])[0]]]
+
+
+def test_inputs_outside_the_grid_use_the_exact_model(lookup):
+    table, _, X = lookup
+    row = X[0].copy()
+    row[FEATURE_COLUMNS.index('rainfall')] = GRID['rainfall'][1] + 1
+    assert table.cells([row])[0] == -1
+    assert table.lookup(tuple(row)) is None
+
+
+def test_the_metadata_names_its_table(lookup, tmp_path, monkeypatch):
+    table, _, _ = lookup
+    np.save(tmp_path / 'crop_lookup-test.npy', np.asarray(table.table))
+    # A table of the same size from another build is never picked up
+    np.save(tmp_path / 'crop_lookup-other.npy', np.zeros(len(table.table), dtype=np.uint8))
+    monkeypatch.setattr(crop_lookup, 'TABLE_DIR', str(tmp_path))
+    (tmp_path / 'meta.json').write_text(json.dumps(table.meta))
+    loaded = load_crop_lookup({'meta': str(tmp_path / 'meta.json')})
+    assert np.array_equal(loaded.table, table.table)
+
+
+@pytest.fixture
+def lookup_mode(lookup, monkeypatch):
+    table, model, _ = lookup
+    current = {'lookup': table}
+    monkeypatch.setattr(crop_lookup, 'CROP_RECOMMENDATION_MODE', 'lookup')
+    monkeypatch.setattr(crop_lookup, 'current_lookup', lambda: current['lookup'])
+    monkeypatch.setattr(crop_lookup, 'registry', SimpleNamespace(get=lambda name: object()))
+
+    def predict(*inputs):
+        proba = model.predict_proba(np.array([inputs]))[0]
+        top = proba.argsort()[-3:][::-1]
+        return model.classes_[top[0]], [{'crop': model.classes_[i], 'confidence': proba[i] * 100} for i in top]
+
+    monkeypatch.setattr(crop_lookup, 'predict_crop_cached', predict)
+    monkeypatch.setattr(crop_lookup, 'lookup_counts', {'served': 0, 'exact': 0})
+    return current, predict
+
+
+def test_recommendations_are_always_exact(lookup, lookup_mode):
+    table, _, X = lookup
+    _, predict = lookup_mode
+    for row in X[::10]:
+        assert crop_lookup.recommend_crop(*row) == predict(*row)
+    assert crop_lookup.lookup_counts['served'] > 0
+
+
+def test_failed_builds_are_not_retried_on_every_request(lookup, lookup_mode, monkeypatch):
+    _, _, X = lookup
+    current, _ = lookup_mode
+    current['lookup'] = None
+    jobs = TrainingJobManager(max_workers=1)
+    builds = []
+    jobs.register('crop_lookup', lambda: builds.append(1) or (None, None))
+    monkeypatch.setattr(crop_lookup, 'training_jobs', jobs)
+
+    crop_lookup.recommend_crop(*X[0])
+    deadline = time.monotonic() + 5
+    while jobs.latest('crop_lookup').active and time.monotonic() < deadline:
+        time.sleep(0.01)
+    for row in X[1:20]:
+        crop_lookup.recommend_crop(*row)
+    assert builds == [1]
+    assert jobs.latest('crop_lookup').status == 'failed'
+    assert crop_lookup.lookup_counts['exact'] == 20
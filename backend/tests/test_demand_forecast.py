@@ -0,0 +1,100 @@
+"""Demand from the price rollups matches classifying the rows directly"""
+import calendar
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from demand_forecast import DEMAND_COLUMNS, demand_prices, demand_records, forecast_demand_rollups
+from price_store import PriceSnapshot, build_indexes, row_columns
+
+VEGETABLES = ['beans', 'cabbage', 'carrot', 'leeks', 'tomato']
+
+
+def forecast_demand(df, period=None, date_format='%b %d'):
+    """Reference: demand from the rows themselves, in one stable sort and one groupby"""
+    df = df.dropna(subset=['full_date'])
+    if df.empty:
+        return []
+
+    frame = pd.DataFrame({
+        'vegetable': df['vegetable name'].astype(str).str.strip().to_numpy(),
+        'full_date': df['full_date'].to_numpy(),
+        'price': demand_prices(*(df[column].to_numpy() for column in DEMAND_COLUMNS))
+    })
+    keys = ['vegetable']
+    if period == 'month':
+        frame['period'] = frame['full_date'].dt.strftime('%Y-%m')
+        keys = ['period', 'vegetable']
+
+    # 'first'/'last' skip missing prices
+    frame = frame.sort_values('full_date', kind='stable')
+    stats = frame.groupby(keys, sort=False).agg(
+        rows=('full_date', 'size'),
+        start_date=('full_date', 'first'),
+        end_date=('full_date', 'last'),
+        prices=('price', 'count'),
+        first_price=('price', 'first'),
+        last_price=('price', 'last')
+    ).reset_index()
+
+    return demand_records(
+        stats['vegetable'].to_numpy(), stats['period'].to_numpy() if period == 'month' else None,
+        stats['rows'].to_numpy(), stats['prices'].to_numpy(),
+        stats['start_date'].to_numpy(), stats['end_date'].to_numpy(),
+        stats['first_price'].to_numpy(), stats['last_price'].to_numpy(), date_format
+    )
+
+
+@pytest.fixture(scope='module')
+def prices():
+    """Two years of daily rows with missing prices, skipped days and impossible dates"""
+    rng = np.random.default_rng(0)
+    rows = []
+    for day in pd.date_range('2023-01-01', '2024-12-31'):
+        for vegetable in VEGETABLES:
+            if rng.random() < 0.3:
+                continue
+            row = {'Year': day.year, 'Month': day.month, 'date': day.day, 'vegetable name': vegetable}
+            for column in DEMAND_COLUMNS:
+                row[column] = rng.uniform(50, 400) if rng.random() < 0.8 else np.nan
+            rows.append(row)
+    rows.append({'Year': 2024, 'Month': 2, 'date': 30, 'vegetable name': 'carrot', DEMAND_COLUMNS[0]: 999.0})
+    arrays, meta = row_columns(pd.DataFrame(rows))
+    arrays.update(build_indexes(arrays['year'], arrays['month'], arrays['day'], arrays['vegetable_code']))
+    return PriceSnapshot(arrays, meta, 0)
+
+
+def month_span(year, month):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+@pytest.mark.parametrize('year, month', [(2023, 1), (2024, 2), (2024, 12)])
+def test_month_matches_rows(prices, year, month):
+    rows = prices.frame(prices.select(year=year, month=month, order='date'))
+    assert forecast_demand_rollups(prices, *month_span(year, month)) == forecast_demand(rows)
+
+
+@pytest.mark.parametrize('start, end', [
+    (date(2023, 3, 17), date(2024, 5, 2)),
+    (date(2024, 12, 2), date(2024, 12, 31)),
+    (date(2022, 6, 1), date(2023, 1, 3)),
+])
+@pytest.mark.parametrize('period', [None, 'month'])
+def test_range_matches_rows(prices, start, end, period):
+    rows = prices.frame(prices.select_range(start, end))
+    expected = forecast_demand(rows, period=period, date_format='%b %d, %Y')
+    assert forecast_demand_rollups(prices, start, end, period=period, date_format='%b %d, %Y') == expected
+
+
+def test_vegetable_filter_matches_rows(prices):
+    start, end = date(2024, 1, 1), date(2024, 6, 30)
+    rows = prices.frame(prices.select_range(start, end, 'carrot'))
+    codes = prices.vegetable_codes('carrot')
+    assert forecast_demand_rollups(prices, start, end, codes, period='month') == forecast_demand(rows, period='month')
+
+
+def test_days_without_rows(prices):
+    start = date(2030, 1, 1)
+    assert forecast_demand_rollups(prices, start, start + timedelta(days=30)) == []
@@ -0,0 +1,88 @@
+"""FlatForest reproduces scikit-learn's forests bit for bit"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+from crop_model import CSV_FILE_PATH, FEATURE_COLUMNS
+from flat_forest import FlatForest
+from price_features import FEATURE_COLUMNS as PRICE_FEATURE_COLUMNS, build_features
+
+
+@pytest.fixture(scope='module')
+def crop_data():
+    df = pd.read_csv(CSV_FILE_PATH)
+    return df[FEATURE_COLUMNS], df['label']
+
+
+@pytest.fixture(scope='module')
+def price_data():
+    """Price model features for random days and vegetables, with seasonal prices per market"""
+    rng = np.random.default_rng(0)
+    dates = np.datetime64('2020-01-01') + rng.integers(0, 5 * 365, 3000)
+    codes = rng.integers(0, 20, 3000)
+    X = pd.DataFrame(build_features(dates, codes), columns=PRICE_FEATURE_COLUMNS)
+    season = np.sin(2 * np.pi * X['day_of_year'] / 365)
+    y = np.stack([100 + 10 * codes + 30 * season * (i + 1) + rng.normal(0, 5, len(X)) for i in range(4)], axis=1)
+    return X, y
+
+
+@pytest.mark.parametrize('params', [
+    {},
+    {'max_depth': 6},
+    {'min_samples_leaf': 5, 'max_features': None},
+])
+def test_classifier_matches_sklearn(crop_data, params):
+    X, y = crop_data
+    forest = RandomForestClassifier(n_estimators=15, random_state=0, **params).fit(X, y)
+    flat = FlatForest(forest)
+    rows = X.to_numpy(np.float64)
+
+    expected = forest.predict_proba(X)
+    assert np.array_equal(flat.predict_proba(rows), expected)
+    assert np.array_equal(flat.predict(rows), forest.predict(X))
+
+    indices, proba = flat.top_k(rows)
+    assert np.array_equal(indices, expected.argsort(axis=1)[:, -3:][:, ::-1])
+    assert np.array_equal(proba, np.take_along_axis(expected, indices, axis=1))
+
+
+def test_classifier_matches_sklearn_off_the_data(crop_data):
+    """Inputs far from the training rows land on the same leaves"""
+    X, y = crop_data
+    forest = RandomForestClassifier(n_estimators=15, random_state=0).fit(X, y)
+    rows = np.random.default_rng(1).uniform(0, [200, 200, 200, 50, 100, 14, 300], (2000, 7))
+    expected = forest.predict_proba(pd.DataFrame(rows, columns=FEATURE_COLUMNS))
+    assert np.array_equal(FlatForest(forest).predict_proba(rows), expected)
+
+
+@pytest.mark.parametrize('params', [{}, {'max_depth': 8}, {'min_samples_leaf': 3}])
+def test_regressor_matches_sklearn(price_data, params):
+    X, y = price_data
+    forest = RandomForestRegressor(n_estimators=15, random_state=0, **params).fit(X, y[:, 0])
+    assert np.array_equal(FlatForest(forest).predict(X.to_numpy(np.float64)), forest.predict(X))
+
+
+def test_multi_output_regressor_matches_sklearn(price_data):
+    X, y = price_data
+    forest = RandomForestRegressor(n_estimators=15, random_state=0).fit(X, y)
+    predictions = FlatForest(forest).predict(X.to_numpy(np.float64))
+    assert predictions.shape == y.shape
+    assert np.array_equal(predictions, forest.predict(X))
+
+
+def test_matches_sklearn_across_chunks(price_data):
+    """More rows than one evaluation chunk"""
+    X, y = price_data
+    forest = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y[:, 1])
+    rows = pd.concat([X] * 2, ignore_index=True)
+    assert np.array_equal(FlatForest(forest).predict(rows.to_numpy(np.float64)), forest.predict(rows))
+
+
+def test_node_counts_match_decision_path(crop_data):
+    X, y = crop_data
+    forest = RandomForestClassifier(n_estimators=15, random_state=0).fit(X, y)
+    rows = pd.concat([X] * 2, ignore_index=True)
+    indicator, _ = forest.decision_path(rows)
+    expected = np.asarray(indicator.sum(axis=0)).ravel()
+    assert np.array_equal(FlatForest(forest).node_counts(rows.to_numpy(np.float64)), expected)
@@ -0,0 +1,45 @@
+"""Batch price predictions through the per-cell cache"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+import prediction_cache
+from prediction_cache import LRUCache, predict_prices_batch_cached
+
+TARGETS = ['Wholesale_Pettah(RS)', 'Retail_Pettah(RS)']
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    bundle = {'encoder': LabelEncoder().fit(['bean', 'carrot']), 'target_columns': TARGETS}
+    artifact = SimpleNamespace(value=bundle, version=1)
+    monkeypatch.setattr(prediction_cache, 'registry', SimpleNamespace(get=lambda name: artifact))
+
+    def predict(start_date, end_date, vegetable_names, bundle=None):
+        dates = np.arange(np.datetime64(start_date), np.datetime64(end_date) + 1)
+        return {'dates': [str(d) for d in dates], 'vegetables': vegetable_names, 'targets': TARGETS,
+                'prices': np.ones((len(dates), len(vegetable_names), len(TARGETS)))}
+
+    monkeypatch.setattr(prediction_cache, 'predict_prices_batch', predict)
+    monkeypatch.setattr(prediction_cache, 'PREDICTION_CACHE_MAX_GRID', 10)
+    cache = LRUCache(100)
+    monkeypatch.setattr(prediction_cache, 'price_cache', cache)
+    return cache
+
+
+def test_every_cell_is_counted(cache):
+    predict_prices_batch_cached('2025-09-01', '2025-09-03', ['bean', 'carrot'])
+    assert (cache.stats()['misses'], cache.stats()['size']) == (6, 6)
+
+    result = predict_prices_batch_cached('2025-09-01', '2025-09-03', ['bean', 'carrot'])
+    assert cache.stats()['hits'] == 6
+    assert result['prices'].shape == (3, 2, 2)
+
+
+def test_large_batches_bypass_the_cache(cache):
+    result = predict_prices_batch_cached('2025-09-01', '2025-09-06', ['bean', 'carrot'])
+    assert result['prices'].shape == (6, 2, 2)
+    stats = cache.stats()
+    assert (stats['size'], stats['hits'], stats['misses']) == (0, 0, 0)
@@ -0,0 +1,74 @@
+"""When ingestion extends the price forests and when it retrains them"""
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+
+import aiprediction_model
+from flat_forest import FlatForest
+from price_ingest import full_retrain_due
+
+TARGET = 'Wholesale_Pettah(RS)'
+
+
+def bundle(models):
+    return {'models': models, 'encoder': LabelEncoder().fit(['beans', 'carrot']), 'target_columns': [TARGET]}
+
+
+def forest():
+    rng = np.random.default_rng(0)
+    return RandomForestRegressor(n_estimators=5, random_state=0).fit(rng.random((50, 6)), rng.random(50))
+
+
+STATE = {'full_retrain_at': datetime.now().isoformat(), 'trees': 5, 'base_trees': 5}
+PRICES = SimpleNamespace(vegetable_names=['beans', 'carrot'], price_columns=[TARGET], prices={TARGET: np.ones(3)})
+
+
+def test_forests_are_extended():
+    assert full_retrain_due(STATE, bundle({TARGET: forest()}), PRICES) is None
+
+
+def test_compacted_models_are_retrained():
+    reason = full_retrain_due(STATE, bundle({TARGET: FlatForest(forest())}), PRICES)
+    assert reason is not None and 'FlatForest' in reason
+
+
+def test_new_vegetables_are_retrained():
+    prices = SimpleNamespace(**{**vars(PRICES), 'vegetable_names': ['beans', 'carrot', 'leeks']})
+    assert full_retrain_due(STATE, bundle({TARGET: forest()}), prices) == "new vegetables"
+
+
+@pytest.fixture
+def model_paths(tmp_path, monkeypatch):
+    for name in ('SCHEMA_PATH', 'ENCODER_PATH', 'MODELS_PATH', 'UPDATE_STATE_PATH'):
+        monkeypatch.setattr(aiprediction_model, name, str(tmp_path / name.lower()))
+    snapshot = SimpleNamespace(latest_date=lambda: (2025, 9, 1))
+    monkeypatch.setattr(aiprediction_model, 'get_price_store', lambda: SimpleNamespace(snapshot=lambda: snapshot))
+    return tmp_path
+
+
+def saved_state():
+    with open(aiprediction_model.UPDATE_STATE_PATH) as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize('model', [forest, lambda: FlatForest(forest())])
+def test_publishing_models_resets_the_update_state(model_paths, model):
+    """Models saved by training, the orchestrator or compaction start a new schedule"""
+    b = bundle({TARGET: model()})
+    aiprediction_model.save_price_models(b['models'], b['encoder'], [], [TARGET])
+    state = saved_state()
+    assert (state['base_trees'], state['trees'], state['updates']) == (5, 5, 0)
+    assert state['data_through'] == '2025-09-01'
+    assert state['full_retrain_at'] == state['updated_at']
+
+
+def test_warm_updates_keep_their_state(model_paths):
+    b = bundle({TARGET: forest()})
+    state = {**STATE, 'trees': 15, 'updates': 2}
+    aiprediction_model.save_price_models(b['models'], b['encoder'], [], [TARGET], state=state)
+    assert saved_state() == state
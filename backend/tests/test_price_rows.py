@@ -0,0 +1,51 @@
+"""Validation of ingested price rows"""
+import pandas as pd
+import pytest
+
+from price_ingest import RowErrors, check_rows
+
+PRICE = 'Wholesale_Pettah(RS)'
+
+
+def rows(*overrides):
+    base = {'Year': 2025, 'Month': 9, 'date': 1, 'vegetable name': 'Carrot', PRICE: 250.0}
+    return pd.DataFrame([{**base, **override} for override in overrides])
+
+
+def errors(df):
+    with pytest.raises(RowErrors) as raised:
+        check_rows(df)
+    return {error['row']: error['errors'] for error in raised.value.errors}
+
+
+def test_valid_rows_get_integer_dates():
+    checked = check_rows(rows({}, {'Year': '2025', 'date': 2.0, PRICE: None}, {PRICE: ''}))
+    assert checked['Year'].tolist() == [2025] * 3
+    assert checked['date'].tolist() == [1, 2, 1]
+    assert str(checked['date'].dtype) == 'int64'
+
+
+@pytest.mark.parametrize('override, message', [
+    ({'Year': 40000}, "Year must be a whole number from 1900 to 2100"),
+    ({'Year': 'abc'}, "Year must be a whole number from 1900 to 2100"),
+    ({'date': 1.5}, "date must be a whole number from 1 to 31"),
+    ({'Month': 13}, "Month must be a whole number from 1 to 12"),
+    ({'Month': 2, 'date': 30}, "Year, Month and date are not a calendar date"),
+    ({'vegetable name': None}, "vegetable name is required"),
+    ({'vegetable name': '  '}, "vegetable name is required"),
+    ({PRICE: 'cheap'}, f"{PRICE} must be a non-negative number or empty"),
+    ({PRICE: -5}, f"{PRICE} must be a non-negative number or empty"),
+])
+def test_bad_rows_are_reported(override, message):
+    assert errors(rows({}, override)) == {2: [message]}
+
+
+def test_every_problem_of_a_row_is_reported():
+    assert errors(rows({'Year': None, 'vegetable name': None})) == {
+        1: ["Year must be a whole number from 1900 to 2100", "vegetable name is required"]
+    }
+
+
+def test_missing_columns_are_rejected():
+    with pytest.raises(ValueError, match="Missing columns: vegetable name"):
+        check_rows(rows({}).drop(columns=['vegetable name']))
@@ -0,0 +1,29 @@
+"""Prediction endpoints reject malformed dates with a 400"""
+import pytest
+
+import app
+
+BAD_DATE = {"error": "Invalid date format. Use YYYY-MM-DD"}
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+@pytest.mark.parametrize('body', [
+    {'start_date': 20250115, 'vegetables': ['bean']},
+    {'start_date': '2025-01-15', 'end_date': ['2025-01-16'], 'vegetables': ['bean']},
+    {'start_date': '15/01/2025', 'vegetables': ['bean']},
+])
+def test_batch_dates(client, body):
+    response = client.post('/api/predict/batch', json=body)
+    assert response.status_code == 400
+    assert response.get_json() == BAD_DATE
+
+
+@pytest.mark.parametrize('date', [20250115, {'year': 2025}, '2025-13-01'])
+def test_single_date(client, date):
+    response = client.post('/api/predict', json={'date': date, 'vegetables': ['bean']})
+    assert response.status_code == 400
+    assert response.get_json() == BAD_DATE
@@ -0,0 +1,48 @@
+"""Importing the app stays light: no training or loader modules, no models, no jobs"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import BACKEND_DIR
+
+# Seconds `import app` may take in a fresh interpreter
+IMPORT_BUDGET_SECONDS = float(os.environ.get('STARTUP_IMPORT_BUDGET_SECONDS', 2.0))
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, '.')
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'modules': [m for m in ('sklearn', 'scipy', 'pandas', 'joblib') if m in sys.modules],
+    'models': sorted(app.registry._artifacts),
+    'jobs': [job.model for job in app.training_jobs.jobs()],
+}))
+"""
+
+
+@pytest.fixture(scope='module')
+def imported():
+    """What a fresh `import app` took and loaded"""
+    env = {key: value for key, value in os.environ.items() if key != 'PREDICTION_CACHE_WARM_DAYS'}
+    output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_import_within_budget(imported):
+    assert imported['seconds'] < IMPORT_BUDGET_SECONDS
+
+
+def test_import_loads_no_training_or_loader_modules(imported):
+    assert imported['modules'] == []
+
+
+def test_import_loads_no_models_and_starts_no_training(imported):
+    assert imported['models'] == []
+    assert imported['jobs'] == []
@@ -0,0 +1,47 @@
+"""Retry backoff and the cross-process lock of training jobs"""
+import fcntl
+import time
+
+import pytest
+
+from training_jobs import TrainingJobManager
+
+
+def finished(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while job.active and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+@pytest.fixture
+def manager():
+    return TrainingJobManager(max_workers=1)
+
+
+def test_failed_jobs_are_not_retried_until_retry_after(manager):
+    runs = []
+    manager.register('model', lambda: runs.append(1) or (None,))
+    job = finished(manager.submit('model'))
+    assert job.status == 'failed' and job.retry_after > job.finished_at
+    assert job.to_dict()['retry_after'] is not None
+
+    assert manager.submit('model') is job
+    assert len(runs) == 1
+
+    retried = finished(manager.submit('model', force=True))
+    assert retried is not job and len(runs) == 2
+
+
+def test_jobs_are_skipped_while_another_process_holds_the_lock(manager, tmp_path):
+    lock_path = str(tmp_path / 'model.lock')
+    runs = []
+    manager.register('model', lambda: runs.append(1) or ('model',), lock_path)
+
+    with open(lock_path, 'a') as other:
+        fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        job = finished(manager.submit('model'))
+    assert job.status == 'skipped' and runs == []
+
+    job = finished(manager.submit('model', force=True))
+    assert job.status == 'succeeded' and runs == [1]
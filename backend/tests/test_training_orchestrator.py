@@ -0,0 +1,16 @@
+"""Training orchestrator: cross-validation and final fits"""
+from training_orchestrator import orchestrate
+
+
+def test_a_single_configuration_is_still_cross_validated():
+    report = orchestrate(models=('crop',), grid={'n_estimators': [5]}, folds=2, cores=1)
+    assert report['phases']['cross_validation']['tasks'] == 2
+    assert [c['params'] for c in report['cross_validation']] == [{'n_estimators': 5}]
+    assert report['final'][0]['params'] == {'n_estimators': 5}
+
+
+def test_the_best_configuration_is_fitted():
+    report = orchestrate(models=('crop',), grid={'n_estimators': [1, 10]}, folds=2, cores=1)
+    assert report['phases']['cross_validation']['tasks'] == 4
+    best = max(report['cross_validation'], key=lambda c: c['mean'])
+    assert report['final'][0]['params'] == best['params']
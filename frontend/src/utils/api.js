@@ -4,10 +4,14 @@ const API_BASE_URL = 'http://localhost:5000/api'
 
 /**
  * Make a GET request to the API
+ *
+ * Price endpoints send an ETag; 'no-cache' makes the browser revalidate its
+ * stored copy (If-None-Match), so unchanged data comes back as a 304
+ * without the body being recomputed or resent.
  */
 export async function get(endpoint) {
   try {
-    const response = await fetch(`${API_BASE_URL}${endpoint}`)
+    const response = await fetch(`${API_BASE_URL}${endpoint}`, { cache: 'no-cache' })
     if (!response.ok) {
       // Try to parse error response as JSON
       let errorData
@@ -74,6 +78,20 @@ export async function getPricePrediction(date, vegetables) {
   })
 }
 
+/**
+ * Get predictions for every date in a range and every vegetable in one call
+ * @param {string} startDate - First date (YYYY-MM-DD)
+ * @param {string} endDate - Last date (YYYY-MM-DD)
+ * @param {string[]} vegetables - Vegetable names
+ */
+export async function getBatchPricePrediction(startDate, endDate, vegetables) {
+  return post('/predict/batch', {
+    start_date: startDate,
+    end_date: endDate,
+    vegetables,
+  })
+}
+
 /**
  * Test backend connection
  */
@@ -123,6 +141,21 @@ export async function getDemandForecast(month = null, vegetable = null) {
   return get(`/demand-forecast${queryString ? `?${queryString}` : ''}`)
 }
 
+/**
+ * Build the download URL for the streaming price history export
+ * @param {object} options - Optional format ('ndjson' or 'csv'), start, end, vegetable, columns
+ */
+export function getPriceExportUrl({ format = 'csv', start, end, vegetable, columns } = {}) {
+  const params = new URLSearchParams()
+  params.append('format', format)
+  if (start) params.append('start', start)
+  if (end) params.append('end', end)
+  if (vegetable) params.append('vegetable', vegetable)
+  if (columns) params.append('columns', columns)
+  
+  return `${API_BASE_URL}/export/prices?${params.toString()}`
+}
+
 /**
  * Get crop recommendation based on soil and weather conditions
  * @param {object} data - Object with N, P, K, temperature, humidity, ph, rainfall
@@ -131,3 +164,11 @@ export async function getCropRecommendation(data) {
   return post('/crop-recommendation', data)
 }
 
+
+/**
+ * Get crop recommendations for many soil samples at once
+ * @param {Array<object>} samples - Objects with N, P, K, temperature, humidity, ph, rainfall
+ */
+export async function getBatchCropRecommendation(samples) {
+  return post('/crop-recommendation/batch', samples)
+}